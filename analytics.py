@@ -0,0 +1,216 @@
+"""
+各标签页的分析计算
+
+均为纯函数：输入筛选后的聚合立方体（及其中的新品部分），返回DataFrame，
+不依赖Streamlit，可单独调用、缓存和性能分析。
+"""
+import numpy as np
+import pandas as pd
+
+import cooccurrence
+import segmentation
+from cooccurrence import build_incidence, co_occurrence_matrix
+from cube import mean_price_by
+from time_index import NAT_ORDINAL, month_ordinals
+
+
+# ==== 销售概览 ====
+def region_sales(cube):
+    """各区域销售总额，按销售额降序"""
+    result = cube.groupby('所属区域', observed=True)['销售额'].sum().reset_index()
+    return result.sort_values(by='销售额', ascending=False)
+
+
+def packaging_sales(cube):
+    """各包装类型销售额，按销售额降序"""
+    result = cube.groupby('包装类型', observed=True)['销售额'].sum().reset_index()
+    return result.sort_values(by='销售额', ascending=False)
+
+
+def applicant_performance(cube):
+    """申请人销售额、服务客户数和销售产品种类数"""
+    result = cube.groupby('申请人', observed=True).agg({
+        '销售额': 'sum',
+        '客户简称': pd.Series.nunique,
+        '产品代码': pd.Series.nunique
+    }).reset_index()
+
+    result.columns = ['申请人', '销售额', '服务客户数', '销售产品种类数']
+    return result.sort_values('销售额', ascending=False)
+
+
+# ==== 新品分析 ====
+def new_product_sales(new_cube):
+    """各新品销售额，按销售额降序"""
+    result = new_cube.groupby(['产品代码', '简化产品名称'], observed=True)['销售额'].sum().reset_index()
+    return result.sort_values('销售额', ascending=False)
+
+
+def region_new_product_sales(new_cube):
+    """各区域各新品销售额"""
+    return new_cube.groupby(['所属区域', '简化产品名称'], observed=True)['销售额'].sum().reset_index()
+
+
+def region_new_sales_ratio(cube, new_cube):
+    """各区域新品销售占比，按占比降序"""
+    region_total_sales = cube.groupby('所属区域', observed=True)['销售额'].sum().reset_index()
+    region_new_sales = new_cube.groupby('所属区域', observed=True)['销售额'].sum().reset_index()
+
+    result = pd.merge(region_total_sales, region_new_sales, on='所属区域', how='left',
+                      suffixes=('_total', '_new'))
+    result['new_ratio'] = result['销售额_new'].fillna(0) / result['销售额_total'] * 100
+    return result.sort_values('new_ratio', ascending=False)
+
+
+# ==== 客户细分 ====
+def customer_features(cube, new_cube):
+    """计算客户特征及新品占比分类"""
+    features = cube.groupby('客户简称', observed=True).agg({
+        '销售额': 'sum',  # 总销售额
+        '产品代码': 'nunique',  # 购买的不同产品数量
+        '数量（箱）': 'sum'  # 总购买数量
+    })
+    features['单价（箱）'] = mean_price_by(cube, '客户简称')  # 平均单价
+    features = features.reset_index()
+
+    # 添加新品购买指标
+    new_products_by_customer = new_cube.groupby('客户简称', observed=True)['销售额'].sum().reset_index()
+    features = features.merge(new_products_by_customer, on='客户简称', how='left', suffixes=('', '_新品'))
+    features['销售额_新品'] = features['销售额_新品'].fillna(0)
+    features['新品占比'] = features['销售额_新品'] / features['销售额'] * 100
+
+    # 简单客户分类
+    features['客户类型'] = pd.cut(
+        features['新品占比'],
+        bins=[0, 10, 30, 100],
+        labels=['保守型客户', '平衡型客户', '创新型客户']
+    )
+    return features
+
+
+def fit_customer_segments(cube, is_new, k=None):
+    """
+    在客户特征矩阵上拟合 mini-batch k-means 客群模型（k 为 None 时自动选择），客户过少时返回 None；
+    最近购买间隔以立方体的最后月份为基准，该月份记录在模型中
+    """
+    reference_month = segmentation.latest_month(cube)
+    features = segmentation.customer_feature_matrix(cube, is_new, reference_month)
+    return segmentation.fit_segments(features, k, reference_month=reference_month)
+
+
+def customer_clusters(cube, new_cube, is_new, model):
+    """
+    客户特征，客户类型列为按聚类模型分配的客群，并附加距最近一次购买的月数
+    （与拟合时相同，以模型记录的基准月份计算，不随筛选的月份范围变化）
+    """
+    features = customer_features(cube, new_cube)
+    matrix = model.features(cube, is_new)
+    customers = features['客户简称'].astype(object)
+    features['客户类型'] = pd.Categorical(model.assign(matrix).reindex(customers).to_numpy(), categories=model.names)
+    features['最近购买间隔（月）'] = matrix['最近购买间隔（月）'].reindex(customers).to_numpy()
+    return features
+
+
+def customer_segments(features):
+    """各客户类型的客户数量、平均销售额和平均新品占比"""
+    result = features.groupby('客户类型', observed=False).agg({
+        '客户简称': 'count',
+        '销售额': 'mean',
+        '新品占比': 'mean'
+    }).reset_index()
+
+    result.columns = ['客户类型', '客户数量', '平均销售额', '平均新品占比']
+    return result
+
+
+# ==== 产品组合 ====
+def co_occurrence(cube):
+    """客户×产品购买矩阵和产品共现矩阵，返回 (购买矩阵, 客户, 产品, 共现矩阵)"""
+    incidence, customers, products = build_incidence(cube)
+    return incidence, customers, products, co_occurrence_matrix(incidence, products)
+
+
+def association_rules(cube, focus=None, min_support=0.02, min_confidence=0.1, max_size=2):
+    """产品关联规则（支持度、置信度、提升度），focus 不为 None 时只挖掘包含其中产品的规则"""
+    incidence, _, products = build_incidence(cube)
+    return cooccurrence.association_rules(incidence, products, min_support, min_confidence, max_size, focus)
+
+
+# ==== 市场渗透率 ====
+# 分组数×客户数不超过该值时用布尔位图对 (分组, 客户) 去重，否则排序去重
+PAIR_BITMAP_LIMIT = 50_000_000
+
+
+def fused_penetration(cube, is_new, group_codes, group_count):
+    """
+    一次遍历按分组同时计算客户总数、购买新品客户数、销售额和新品销售额
+
+    group_codes 为每行所属分组的编号（0..group_count-1，负数表示不参与统计），
+    is_new 为立方体各行是否为新品的布尔数组（通常直接取自“是否新品”列），无需先拆出新品子集再合并。
+    返回 (客户总数, 购买新品客户数, 销售额, 新品销售额) 四个长度为 group_count 的数组
+    """
+    valid = group_codes >= 0
+    group_codes = group_codes[valid]
+    is_new = np.asarray(is_new, dtype=bool)[valid]
+    sales = cube['销售额'].to_numpy(dtype='float64')[valid]
+    customer_codes, customers = pd.factorize(cube['客户简称'][valid])
+    customer_count = max(len(customers), 1)
+
+    # (分组, 客户) 组合去重后按分组计数即为各分组的客户数
+    pairs = group_codes.astype(np.int64) * customer_count + customer_codes
+    if group_count * customer_count <= PAIR_BITMAP_LIMIT:
+        seen = np.zeros((group_count, customer_count), dtype=bool)
+        seen.ravel()[pairs] = True
+        customers_per_group = seen.sum(axis=1)
+        seen[:] = False
+        seen.ravel()[pairs[is_new]] = True
+        new_customers_per_group = seen.sum(axis=1)
+    else:
+        customers_per_group = np.bincount(np.unique(pairs) // customer_count, minlength=group_count)
+        new_customers_per_group = np.bincount(np.unique(pairs[is_new]) // customer_count, minlength=group_count)
+
+    total_sales = np.bincount(group_codes, weights=sales, minlength=group_count)
+    new_sales = np.bincount(group_codes, weights=np.where(is_new, sales, 0.0), minlength=group_count)
+    return customers_per_group, new_customers_per_group, total_sales, new_sales
+
+
+def region_penetration(cube, is_new):
+    """各区域新品渗透率和新品销售额，返回 (渗透率表, 渗透率与销售额合并表)"""
+    region_codes, regions = pd.factorize(cube['所属区域'], sort=True)
+    customers, new_customers, _, new_sales = fused_penetration(cube, is_new, region_codes, len(regions))
+
+    analysis = pd.DataFrame({
+        '所属区域': np.asarray(regions),
+        '客户总数': customers,
+        '购买新品客户数': new_customers,
+    })
+    analysis['渗透率'] = (analysis['购买新品客户数'] / analysis['客户总数'] * 100).round(2)
+    analysis['新品销售额'] = new_sales
+    return analysis.drop(columns='新品销售额'), analysis
+
+
+def monthly_penetration(cube, is_new):
+    """月度新品渗透率和销售占比，月份之间没有数据的月份也保留（客户数和销售额为0）"""
+    ordinals = month_ordinals(cube['发运月份'])
+    valid = ordinals != NAT_ORDINAL
+    if not valid.any():
+        return pd.DataFrame(columns=['月份', '客户总数', '购买新品客户数', '销售额总计', '新品销售额', '渗透率', '销售占比'])
+
+    first = ordinals[valid].min()
+    month_count = int(ordinals[valid].max() - first) + 1
+    month_codes = np.where(valid, ordinals - first, -1)
+    customers, new_customers, total_sales, new_sales = fused_penetration(cube, is_new, month_codes, month_count)
+
+    monthly_data = pd.DataFrame({
+        # 与 pd.Grouper(freq='M') 一致，以月末日期标记月份
+        '月份': pd.PeriodIndex.from_ordinals(np.arange(month_count) + first, freq='M').to_timestamp(how='end').normalize(),
+        '客户总数': customers,
+        '购买新品客户数': new_customers,
+        '销售额总计': total_sales,
+        '新品销售额': new_sales,
+    })
+
+    # 计算渗透率和销售占比
+    monthly_data['渗透率'] = (monthly_data['购买新品客户数'] / monthly_data['客户总数'] * 100).round(2)
+    monthly_data['销售占比'] = (monthly_data['新品销售额'] / monthly_data['销售额总计'] * 100).round(2)
+    return monthly_data
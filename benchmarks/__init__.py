@@ -0,0 +1 @@
+"""性能基准脚本，在仓库根目录下以 python -m benchmarks.<脚本名> 运行"""
@@ -0,0 +1,77 @@
+"""
+分析报告导出基准
+
+生成合成数据，先计算全部结果表（相当于仪表盘的分析缓存已命中），再分别计时：
+pandas ExcelWriter 逐表 to_excel（整个工作簿保留在内存中）、xlsxwriter constant_memory 流式写出、
+CSV 和 Parquet 压缩包。耗时与峰值内存分两轮测量（tracemalloc 会显著拖慢写出）。
+
+用法: python -m benchmarks.bench_export --rows 1000000 --customers 100000
+"""
+import argparse
+import io
+import time
+import tracemalloc
+
+import pandas as pd
+
+import report_export
+import sales_api
+from benchmarks.synthetic import SalesDataSpec, make_sales_frame
+from ingest import prepare_sales_frame
+
+
+def pandas_excel(tables):
+    """对照：pandas ExcelWriter 逐表写出"""
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer) as writer:
+        for name, df in tables:
+            report_export.plain_frame(df).to_excel(writer, sheet_name=name, index=False)
+    return buffer.getvalue()
+
+
+def measure(export, tables):
+    """返回 (耗时, 峰值内存字节数, 文件字节数)"""
+    start = time.perf_counter()
+    size = len(export(tables))
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    export(tables)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return seconds, peak, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--customers', type=int, default=100_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    df = sales_api.prepare_frame(prepare_sales_frame(
+        make_sales_frame(args.rows, SalesDataSpec(customers=args.customers, seed=args.seed))))
+    dataset = sales_api.SalesDataset(df)
+    sales = dataset.filter()
+    start = time.perf_counter()
+    tables = list(sales_api.report_tables(lambda func, **params: func(sales, **params),
+                                          dataset.product_names, sales_api.customer_segment_model(dataset)))
+    cells = sum(table.size for _, table in tables)
+    print(f"行数: {len(df):,}，结果表: {len(tables)} 张，{cells:,} 个单元格，计算耗时 {time.perf_counter() - start:.2f}s")
+
+    exports = [
+        ('pandas to_excel', pandas_excel),
+        ('xlsxwriter constant_memory', lambda t: report_export.export_bytes(t, 'xlsx')),
+        ('CSV（ZIP）', lambda t: report_export.export_bytes(t, 'csv')),
+        ('Parquet（ZIP）', lambda t: report_export.export_bytes(t, 'parquet')),
+    ]
+    rows = []
+    for name, export in exports:
+        seconds, peak, size = measure(export, tables)
+        rows.append({'方式': name, '耗时(秒)': round(seconds, 2), '峰值内存(MB)': round(peak / 1024 / 1024, 1),
+                     '文件大小(MB)': round(size / 1024 / 1024, 2)})
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+"""
+散点图分层抽样的基准及正确性校验
+
+在对数正态/正态分布的合成点上计时 downsample_points，并校验：抽样后的点数不超过上限，
+原数据中每个非空网格都至少保留一个点（稀疏区域和离群点不被丢弃），同一种子结果稳定。
+
+用法: python -m benchmarks.bench_figures --points 200000 --limit 5000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from figure_data import MAX_SCATTER_POINTS, downsample_points, grid_cells
+
+
+def check_cells(df, sample, limit):
+    """抽样点数不超过 limit，且覆盖原数据的全部非空网格"""
+    cells = grid_cells(df, 'x', 'y')
+    occupied = np.unique(cells)
+    kept = np.unique(cells[sample.index.to_numpy()])
+    assert len(sample) <= limit, (len(sample), limit)
+    assert np.array_equal(occupied, kept), f"丢失 {len(occupied) - len(kept)} / {len(occupied)} 个非空网格"
+    return len(occupied)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=200_000)
+    parser.add_argument('--limit', type=int, default=MAX_SCATTER_POINTS)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    df = pd.DataFrame({'x': rng.lognormal(3, 1, args.points), 'y': rng.normal(0, 1, args.points)})
+
+    rows, samples = [], []
+    for seed in range(5):
+        start = time.perf_counter()
+        sample, total = downsample_points(df, 'x', 'y', args.limit, seed)
+        seconds = time.perf_counter() - start
+        occupied = check_cells(df, sample, args.limit)
+        samples.append(sample)
+        rows.append({'种子': seed, '原点数': total, '抽样点数': len(sample), '非空网格': occupied,
+                     '耗时(秒)': round(seconds, 3)})
+    assert downsample_points(df, 'x', 'y', args.limit, 0)[0].index.equals(samples[0].index)
+
+    # 名额少于非空网格数时每个网格仍保留一个点
+    few = downsample_points(df, 'x', 'y', 10)[0]
+    check_cells(df, few, len(np.unique(grid_cells(df, 'x', 'y'))))
+
+    print(pd.DataFrame(rows).to_string(index=False))
+    print("校验通过：抽样点数不超过上限，全部非空网格均保留，同一种子结果稳定")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""
+多工作簿导入的性能基准
+
+生成若干个合成工作簿（每个工作簿可含多个工作表），分别以单进程和多个工作进程导入，
+输出各文件/工作表的耗时和总耗时，并校验两种方式合并后的数据一致。
+源文件总大小低于 PARALLEL_MIN_BYTES（SALES_PARALLEL_INGEST_MB）时 load_files 串行导入，
+可设置 SALES_PARALLEL_INGEST_MB=0 强制并行以测量阈值。
+另外校验数据目录中的文件全部导入失败时，增量数据集读出并预处理后为空表而不是报错；
+任务参数无法序列化、异常无法反序列化时记为该任务的错误，其余任务照常完成而不是卡住。
+
+用法: python -m benchmarks.bench_ingest --files 8 --rows 50000 --sheets 2 --workers 8
+"""
+import argparse
+import os
+import pickle
+import tempfile
+import threading
+import time
+
+import pandas as pd
+
+import dataset_store
+import sales_api
+from benchmarks.synthetic import SalesDataSpec, make_sales_frame
+from ingest import iter_sales_chunks
+from ingest_worker import _outcome_message
+from parallel_ingest import INGEST_WORKERS, PARALLEL_MIN_BYTES, load_files, parallel_workers, read_sheet, run_tasks
+
+
+def write_workbooks(work_dir, files, rows, sheets, spec):
+    """生成 files 个工作簿，每个工作簿 sheets 个工作表、共 rows 行"""
+    data = make_sales_frame(files * rows, spec)
+    paths = []
+    for i in range(files):
+        path = os.path.join(work_dir, f"sales_{i:02d}.xlsx")
+        part = data.iloc[i * rows:(i + 1) * rows]
+        sheet_rows = -(-rows // sheets)
+        with pd.ExcelWriter(path, engine='xlsxwriter') as writer:
+            for j, start in enumerate(range(0, rows, sheet_rows)):
+                part.iloc[start:start + sheet_rows].to_excel(writer, sheet_name=f"Sheet{j + 1}", index=False)
+        paths.append(path)
+    return paths
+
+
+def timed_load(paths, workers):
+    start = time.perf_counter()
+    df, timings = load_files(paths, workers)
+    return df, timings, time.perf_counter() - start
+
+
+class SheetError(Exception):
+    """构造函数需要两个参数的异常：可以序列化，但反序列化时按一个参数重建会报错"""
+
+    def __init__(self, path, reason):
+        super().__init__(f"{path}: {reason}")
+
+
+def check_worker_errors(paths):
+    """无法序列化的任务参数记为该任务的错误，工作进程重新启动后其余任务照常完成"""
+    tasks = [(threading.Lock(), None)] + [(path, None) for path in paths]
+    outcomes = {id(task): (frame, error) for task, frame, error, _, _ in run_tasks(read_sheet, tasks, 2)}
+    assert len(outcomes) == len(tasks)
+    assert outcomes[id(tasks[0])][1] is not None
+    assert all(outcomes[id(task)][1] is None for task in tasks[1:]), outcomes
+
+    error = _outcome_message((None, SheetError('a.xlsx', '格式错误'), [], 0.0))[1]
+    assert isinstance(pickle.loads(pickle.dumps(error)), RuntimeError) and 'a.xlsx' in str(error), error
+
+
+def check_invalid_store(work_dir):
+    """数据目录中只有无法导入的文件时，读出的分区为空，预处理后仍为空表"""
+    data_dir = os.path.join(work_dir, 'invalid')
+    store_dir = os.path.join(work_dir, 'invalid_store')
+    os.makedirs(data_dir)
+    with open(os.path.join(data_dir, 'bad.csv'), 'w', encoding='utf-8') as f:
+        f.write('列A,列B\n1,2\n')
+    messages = []
+    manifest = dataset_store.sync_store(data_dir, iter_sales_chunks, store_dir, warn=messages.append)
+    assert messages and all(entry.get('error') for entry in manifest['sources'].values()), messages
+    df = sales_api.prepare_frame(dataset_store.read_partitions(manifest, store_dir=store_dir))
+    assert df.empty, df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--files', type=int, default=8)
+    parser.add_argument('--rows', type=int, default=50_000, help='每个工作簿的行数')
+    parser.add_argument('--sheets', type=int, default=1, help='每个工作簿的工作表数')
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix='sales_ingest_') as work_dir:
+        print(f"生成 {args.files} 个工作簿（每个 {args.rows:,} 行、{args.sheets} 个工作表）...")
+        paths = write_workbooks(work_dir, args.files, args.rows, args.sheets, SalesDataSpec(seed=args.seed))
+
+        total_mb = sum(os.path.getsize(path) for path in paths) / 1024 / 1024
+        workers = parallel_workers(paths, args.workers)
+        print(f"源文件共 {total_mb:.1f} MB，并行阈值 {PARALLEL_MIN_BYTES / 1024 / 1024:.1f} MB，"
+              f"实际使用 {workers} 个进程")
+        serial, _, serial_seconds = timed_load(paths, 1)
+        parallel, timings, parallel_seconds = timed_load(paths, args.workers)
+        check_worker_errors(paths)
+        if dataset_store.STORE_AVAILABLE:
+            check_invalid_store(work_dir)
+
+    print(timings.to_string(index=False))
+    print(f"\n单进程: {serial_seconds:.2f}s  {workers} 进程: {parallel_seconds:.2f}s  "
+          f"加速比: {serial_seconds / parallel_seconds:.2f}x")
+    pd.testing.assert_frame_equal(serial, parallel)
+    print("两种方式的导入结果一致，任务错误不会阻塞导入" + ("，无有效文件的数据集读出为空表" if dataset_store.STORE_AVAILABLE else ""))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""
+市场渗透率区域与月度汇总的性能基准
+
+对比原有实现（新品子集上分别 groupby 后多次 merge）与按新品标记一次遍历的
+fused_penetration，并校验两者输出一致。
+
+用法: python -m benchmarks.bench_penetration --rows 1000000
+"""
+import argparse
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from analytics import monthly_penetration, region_penetration
+from schema import compact_frame
+
+REGIONS = ['东', '南', '西', '北', '中']
+
+
+def make_frame(rows, customers=5000, products=600, months=12, seed=0):
+    """生成指定行数的合成订单数据，客户和产品分布带有长尾"""
+    rng = np.random.default_rng(seed)
+
+    def zipf_choice(count):
+        weights = 1.0 / np.arange(1, count + 1)
+        return rng.choice(count, size=rows, p=weights / weights.sum())
+
+    customer_ids = zipf_choice(customers)
+    df = pd.DataFrame({
+        '所属区域': np.array(REGIONS, dtype=object)[customer_ids % len(REGIONS)],
+        '客户简称': np.array([f"客户{i:05d}" for i in range(customers)], dtype=object)[customer_ids],
+        '产品代码': np.array([f"F{i:04d}" for i in range(products)], dtype=object)[zipf_choice(products)],
+        '发运月份': pd.period_range('2024-01', periods=months, freq='M')[rng.integers(0, months, rows)]
+        .to_timestamp(),
+        '销售额': rng.gamma(2.0, 500.0, rows).round(2),
+    })
+    return compact_frame(df)
+
+
+def legacy_region(cube, new_cube):
+    """原有实现：三次 groupby 和两次 merge"""
+    region_customers = cube.groupby('所属区域', observed=True)['客户简称'].nunique().reset_index()
+    region_customers.columns = ['所属区域', '客户总数']
+
+    new_region_customers = new_cube.groupby('所属区域', observed=True)['客户简称'].nunique().reset_index()
+    new_region_customers.columns = ['所属区域', '购买新品客户数']
+
+    penetration = region_customers.merge(new_region_customers, on='所属区域', how='left')
+    penetration['购买新品客户数'] = penetration['购买新品客户数'].fillna(0)
+    penetration['渗透率'] = penetration['购买新品客户数'] / penetration['客户总数'] * 100
+    penetration['渗透率'] = penetration['渗透率'].round(2)
+
+    region_new_sales = new_cube.groupby('所属区域', observed=True)['销售额'].sum().reset_index()
+    region_new_sales.columns = ['所属区域', '新品销售额']
+
+    analysis = penetration.merge(region_new_sales, on='所属区域', how='left')
+    analysis['新品销售额'] = analysis['新品销售额'].fillna(0)
+    return penetration, analysis
+
+
+def legacy_monthly(cube, new_cube):
+    """原有实现：四次 pd.Grouper 分组和三次 merge"""
+    cube = cube.assign(发运月份=cube['发运月份'].dt.to_timestamp())
+    new_cube = new_cube.assign(发运月份=new_cube['发运月份'].dt.to_timestamp())
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', FutureWarning)
+        monthly_customers = cube.groupby(pd.Grouper(key='发运月份', freq='M'))['客户简称'].nunique().reset_index()
+        monthly_customers.columns = ['月份', '客户总数']
+        monthly_new_customers = new_cube.groupby(pd.Grouper(key='发运月份', freq='M'))[
+            '客户简称'].nunique().reset_index()
+        monthly_new_customers.columns = ['月份', '购买新品客户数']
+        monthly_sales = cube.groupby(pd.Grouper(key='发运月份', freq='M'))['销售额'].sum().reset_index()
+        monthly_sales.columns = ['月份', '销售额总计']
+        monthly_new_sales = new_cube.groupby(pd.Grouper(key='发运月份', freq='M'))['销售额'].sum().reset_index()
+        monthly_new_sales.columns = ['月份', '新品销售额']
+
+    monthly_data = monthly_customers.merge(monthly_new_customers, on='月份', how='left')
+    monthly_data = monthly_data.merge(monthly_sales, on='月份', how='left')
+    monthly_data = monthly_data.merge(monthly_new_sales, on='月份', how='left')
+    monthly_data['购买新品客户数'] = monthly_data['购买新品客户数'].fillna(0)
+    monthly_data['新品销售额'] = monthly_data['新品销售额'].fillna(0)
+    monthly_data['渗透率'] = (monthly_data['购买新品客户数'] / monthly_data['客户总数'] * 100).round(2)
+    monthly_data['销售占比'] = (monthly_data['新品销售额'] / monthly_data['销售额总计'] * 100).round(2)
+    return monthly_data
+
+
+def best_of(func, repeat):
+    """多次运行取最短耗时，返回 (耗时, 最后一次结果)"""
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--new-products', type=int, default=20, help='前多少个产品视为新品')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows)
+    new_products = [f"F{i:04d}" for i in range(args.new_products)]
+    print(f"行数: {len(df):,}，客户: {df['客户简称'].nunique():,}，新品: {len(new_products)}")
+
+    def legacy():
+        # 原有流程需要先拆出新品子集
+        new_df = df[df['产品代码'].isin(new_products)]
+        return legacy_region(df, new_df), legacy_monthly(df, new_df)
+
+    def fused():
+        is_new = df['产品代码'].isin(new_products).to_numpy()
+        return region_penetration(df, is_new), monthly_penetration(df, is_new)
+
+    legacy_seconds, (expected_region, expected_monthly) = best_of(legacy, args.repeat)
+    fused_seconds, (result_region, result_monthly) = best_of(fused, args.repeat)
+
+    for expected, result in zip(expected_region, result_region):
+        pd.testing.assert_frame_equal(
+            expected.astype({'所属区域': str}), result.astype({'所属区域': str}), check_dtype=False
+        )
+    pd.testing.assert_frame_equal(expected_monthly, result_monthly, check_dtype=False)
+
+    print(f"原有实现: {legacy_seconds:.3f}s")
+    print(f"单遍汇总: {fused_seconds:.3f}s")
+    print(f"加速比: {legacy_seconds / fused_seconds:.1f}x，输出一致")
+
+
+if __name__ == '__main__':
+    main()
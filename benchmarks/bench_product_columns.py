@@ -0,0 +1,75 @@
+"""
+简化产品名称与包装类型派生列的性能基准
+
+对比逐行 apply 的参考实现与按唯一产品向量化的 add_product_columns，
+并校验两者输出完全一致。
+
+用法: python -m benchmarks.bench_product_columns --rows 1000000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from product_utils import add_product_columns, extract_packaging, get_simplified_product_name
+
+# 覆盖各类命名规则及边界情况的产品名称
+PRODUCT_NAMES = [
+    '口力酸小虫250G分享装袋装-中国', '口力可乐瓶250G分享装袋装-中国', '口力比萨XXL45G盒装-中国',
+    '口力比萨68G袋装-中国', '口力午餐袋77G袋装-中国', '口力汉堡108G袋装-中国',
+    '口力扭扭虫2KG迷你包-中国', '口力字节软糖2KG迷你包-中国', '口力西瓜1.5KG随手包-中国',
+    '口力七彩熊1.5KG随手包-中国', '口力西瓜45G+赠7G袋装-中国', '口力海洋动物（鲨鱼造型）100G袋装-中国',
+    '口力软糖新品A-中国', '口力果汁分享装盒装-中国', '口力薄荷糖瓶装-中国', '口力散糖1KG-中国',
+    '口力软糖200G-中国', '口力软糖80G-中国', '口力软糖30G-中国', '口力 - 中国', '口力123-中国',
+    '其他品牌软糖50G袋装', '普通产品', 'nan',
+]
+
+
+def make_frame(rows, products=600, seed=0):
+    """生成指定行数的合成订单数据，产品分布带有长尾"""
+    rng = np.random.default_rng(seed)
+    codes = np.array([f"F{i:04d}{chr(65 + i % 26)}" for i in range(products)], dtype=object)
+    names = np.array([PRODUCT_NAMES[i % len(PRODUCT_NAMES)] for i in range(products)], dtype=object)
+    weights = 1.0 / np.arange(1, products + 1)
+    picks = rng.choice(products, size=rows, p=weights / weights.sum())
+    return pd.DataFrame({'产品代码': codes[picks], '产品名称': names[picks]})
+
+
+def rowwise(df):
+    """原有的逐行实现"""
+    simplified = df.apply(
+        lambda row: get_simplified_product_name(row['产品代码'], row['产品名称']),
+        axis=1
+    )
+    packaging = df['产品名称'].apply(extract_packaging)
+    return simplified, packaging
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--products', type=int, default=600)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.products)
+    print(f"行数: {len(df):,}，唯一产品: {df['产品代码'].nunique():,}")
+
+    start = time.perf_counter()
+    expected_simplified, expected_packaging = rowwise(df)
+    rowwise_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = add_product_columns(df.copy())
+    vectorized_seconds = time.perf_counter() - start
+
+    assert (result['简化产品名称'].to_numpy() == expected_simplified.to_numpy()).all(), '简化产品名称不一致'
+    assert (result['包装类型'].to_numpy() == expected_packaging.to_numpy()).all(), '包装类型不一致'
+
+    print(f"逐行实现: {rowwise_seconds:.3f}s")
+    print(f"向量化实现: {vectorized_seconds:.3f}s")
+    print(f"加速比: {rowwise_seconds / vectorized_seconds:.1f}x，输出一致")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""
+客户聚类分群的性能基准
+
+生成指定客户规模的合成数据，分别计时：原有的按客户 lambda 计算产品种类数的客户特征、
+向量化的客户特征矩阵、mini-batch k-means 拟合（自动选择 k）以及为全部客户分配客群；
+并校验按月份筛选后分配客群时，最近购买间隔仍以拟合时（全部数据）的最后月份为基准。
+
+用法: python -m benchmarks.bench_segmentation --rows 2000000 --customers 100000
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+import sales_api
+import segmentation
+from benchmarks.synthetic import SalesDataSpec, make_sales_frame
+from ingest import prepare_sales_frame
+
+
+def timed(label, func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    print(f"  {label:<36s}{time.perf_counter() - start:>8.3f}s")
+    return result
+
+
+def legacy_features(cube):
+    """原有实现：按客户用 lambda 计算购买的不同产品数量"""
+    return cube.groupby('客户简称', observed=True).agg({
+        '销售额': 'sum',
+        '产品代码': lambda x: len(set(x)),
+        '数量（箱）': 'sum',
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=2_000_000)
+    parser.add_argument('--customers', type=int, default=100_000)
+    parser.add_argument('--k', type=int, help='客群数，默认自动选择')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    spec = SalesDataSpec(customers=args.customers, seed=args.seed)
+    df = sales_api.prepare_frame(prepare_sales_frame(make_sales_frame(args.rows, spec)))
+    dataset = sales_api.SalesDataset(df)
+    sales = dataset.filter()
+    print(f"行数: {len(df):,}，立方体: {len(sales.cube):,} 行，客户: {df['客户简称'].nunique():,}")
+
+    legacy = timed('原有客户特征（lambda）', legacy_features, sales.cube)
+    features = timed('向量化客户特征矩阵', segmentation.customer_feature_matrix, sales.cube, sales.is_new)
+    reference_month = segmentation.latest_month(sales.cube)
+    model = timed('mini-batch k-means 拟合', segmentation.fit_segments, features, args.k,
+                  reference_month=reference_month)
+    labels = timed('分配客群', model.assign, features)
+
+    assert np.array_equal(legacy['产品代码'].to_numpy(), features.loc[legacy.index, '产品种类数'].to_numpy())
+    # 只含较早月份时，最近购买间隔仍距全部数据的最后月份计算
+    months = dataset.row_time_index.labels()
+    early = dataset.filter({'发运月份': (months[0], months[len(months) // 2])})
+    clusters = sales_api.customer_clusters(early, model=model).set_index('客户简称')
+    early_last = early.cube.groupby('客户简称', observed=True)['发运月份'].max()
+    expected = reference_month - pd.PeriodIndex(early_last, freq='M').asi8
+    assert np.array_equal(clusters.loc[early_last.index, '最近购买间隔（月）'].to_numpy(), expected)
+    print(f"\nk={model.k}，轮廓系数 {model.silhouette:.3f}，产品种类数与原有实现一致，"
+          f"筛选月份后最近购买间隔以拟合时的最后月份为基准")
+    print(pd.Series(labels).value_counts().sort_index().to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+多会话内存占用基准
+
+st.cache_data 每次命中缓存都反序列化出新的副本，每个会话各持有一份订单数据和数据集；
+改用 st.cache_resource 后进程内只保存一个只读数据集（启用写时复制），会话只持有筛选结果的视图。
+模拟多个会话分别按两种方式获取数据集并执行仪表盘的默认筛选（全部区域），
+用 tracemalloc 统计每个会话新增的内存和耗时。
+
+用法: python -m benchmarks.bench_sessions --rows 1000000 --sessions 10
+"""
+import argparse
+import gc
+import pickle
+import time
+import tracemalloc
+
+import pandas as pd
+
+import sales_api
+from benchmarks.synthetic import SalesDataSpec, make_sales_frame
+from ingest import prepare_sales_frame
+
+
+def default_filters(dataset):
+    """仪表盘的默认筛选：选中全部区域，其他维度不限"""
+    return {'所属区域': list(dataset.row_index.values('所属区域').astype(str))}
+
+
+def copied_session(df, dataset):
+    """st.cache_data：数据框和数据集各反序列化一份副本"""
+    session_df = pickle.loads(pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL))
+    session_dataset = pickle.loads(pickle.dumps(dataset, protocol=pickle.HIGHEST_PROTOCOL))
+    return session_df, session_dataset.filter(default_filters(session_dataset))
+
+
+def shared_session(df, dataset):
+    """st.cache_resource：直接使用共享的数据集"""
+    return df, dataset.filter(default_filters(dataset))
+
+
+def measure(session, sessions, df, dataset):
+    """创建 sessions 个会话并保持引用，返回 (每会话新增字节数, 每会话耗时)"""
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    held = [session(df, dataset) for _ in range(sessions)]
+    seconds = time.perf_counter() - start
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    del held
+    return allocated / sessions, seconds / sessions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--sessions', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    # 与仪表盘一致启用写时复制，共享数据只读
+    pd.set_option('mode.copy_on_write', True)
+    df = sales_api.prepare_frame(prepare_sales_frame(make_sales_frame(args.rows, SalesDataSpec(seed=args.seed))))
+    dataset = sales_api.SalesDataset(df)
+    shared_bytes = df.memory_usage(deep=True).sum() + dataset.cube.memory_usage(deep=True).sum()
+    print(f"行数: {len(df):,}，订单数据+立方体: {shared_bytes / 1024 / 1024:.1f} MB，会话数: {args.sessions}")
+
+    rows = []
+    for name, session in [('cache_data（每会话副本）', copied_session), ('cache_resource（共享只读）', shared_session)]:
+        per_session, seconds = measure(session, args.sessions, df, dataset)
+        rows.append({'方式': name, '每会话内存(MB)': round(per_session / 1024 / 1024, 2),
+                     '每会话耗时(秒)': round(seconds, 4)})
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False))
+
+    before, after = report['每会话内存(MB)']
+    print(f"\n{args.sessions} 个会话合计: {before * args.sessions:.1f} MB → {after * args.sessions:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
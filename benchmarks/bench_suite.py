@@ -0,0 +1,148 @@
+"""
+端到端性能基准
+
+对每个数据规模生成合成CSV数据，依次计时：数据加载（冷启动与磁盘缓存命中）、
+构建数据集（聚合立方体与索引）、筛选，以及各标签页的分析计算，结果写入JSON报告。
+指定 --baseline 时与上一次的报告逐项对比，耗时增长超过阈值的阶段视为性能回退，
+以非零状态码退出。
+
+用法: python -m benchmarks.bench_suite --sizes 10000 100000 1000000 --output bench_report.json
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import data_cache
+import sales_api
+from benchmarks.synthetic import SalesDataSpec, write_csv
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+# 各标签页对应的分析函数
+TAB_STAGES = {
+    '销售概览': [sales_api.kpis, sales_api.region_sales, sales_api.packaging_sales, sales_api.applicant_performance],
+    '新品分析': [sales_api.new_product_sales, sales_api.region_new_product_sales, sales_api.region_new_sales_ratio],
+    '客户细分': [sales_api.customer_features, sales_api.customer_segments],
+    '产品组合': [sales_api.co_occurrence, sales_api.association_rules],
+    '市场渗透率': [sales_api.penetration, sales_api.monthly_penetration],
+}
+
+
+def timed(results, stage, func, *args):
+    """执行 func 并记录耗时（秒）"""
+    start = time.perf_counter()
+    value = func(*args)
+    results[stage] = round(time.perf_counter() - start, 6)
+    print(f"  {stage:<40s}{results[stage]:>10.3f}s")
+    return value
+
+
+def sample_filters(dataset):
+    """代表性的筛选条件：前两个区域、中间一半的月份"""
+    regions = list(dataset.row_index.values('所属区域').astype(str))[:2]
+    months = dataset.row_time_index.labels()
+    date_range = (months[len(months) // 4], months[max(len(months) * 3 // 4 - 1, 0)]) if months else (None, None)
+    return {'所属区域': regions, '发运月份': date_range}
+
+
+def run_size(rows, spec, work_dir):
+    """对一个数据规模运行全部阶段，返回 {阶段: 耗时}"""
+    print(f"\n== {rows:,} 行 ==")
+    results = {}
+    csv_path = os.path.join(work_dir, f"sales_{rows}.csv")
+    timed(results, 'generate_csv', write_csv, csv_path, rows, spec)
+
+    # 数据加载：冷启动（流式导入并写入缓存）与缓存命中
+    data_cache.CACHE_DIR = os.path.join(work_dir, 'cache')
+    timed(results, 'load_data.cold', sales_api.load_sales, csv_path)
+    df = timed(results, 'load_data.warm', sales_api.load_sales, csv_path)
+    os.remove(csv_path)
+
+    dataset = timed(results, 'build_dataset', sales_api.SalesDataset, df)
+    del df
+    filters = sample_filters(dataset)
+    timed(results, 'filter.none', dataset.filter, None)
+    sales = timed(results, 'filter.regions_months', dataset.filter, filters)
+
+    for tab, funcs in TAB_STAGES.items():
+        for func in funcs:
+            timed(results, f"{tab}.{func.__name__}", func, sales)
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(report, baseline, threshold):
+    """与基线报告逐项对比，返回回退的阶段列表"""
+    regressions = []
+    for size, stages in report['results'].items():
+        base_stages = baseline.get('results', {}).get(size, {})
+        for stage, seconds in stages.items():
+            base = base_stages.get(stage)
+            # 过短的阶段受计时噪声影响大，不参与判断
+            if base and max(base, seconds) >= 0.01 and seconds > base * threshold:
+                regressions.append((size, stage, base, seconds))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--customers', type=int, default=5000)
+    parser.add_argument('--products', type=int, default=800)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_report.json', help='JSON报告路径')
+    parser.add_argument('--baseline', help='用于对比的上一次JSON报告')
+    parser.add_argument('--threshold', type=float, default=1.25, help='耗时超过基线该倍数视为回退')
+    args = parser.parse_args()
+
+    spec = SalesDataSpec(customers=args.customers, products=args.products, months=args.months, seed=args.seed)
+    report = {
+        'meta': {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'git_revision': git_revision(),
+            'python': sys.version.split()[0],
+            'pandas': pd.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'spec': vars(spec),
+        },
+        'results': {},
+    }
+    with tempfile.TemporaryDirectory(prefix='sales_bench_') as work_dir:
+        for rows in args.sizes:
+            report['results'][str(rows)] = run_size(rows, spec, work_dir)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n报告已写入 {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for size, stage, base, seconds in regressions:
+            print(f"性能回退: {int(size):,} 行 {stage} {base:.3f}s → {seconds:.3f}s（{seconds / base:.2f}x）")
+        if regressions:
+            sys.exit(1)
+        print("未发现性能回退")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+"""
+合成销售数据生成器
+
+按给定的客户、产品、区域、申请人和月份规模生成与源工作簿结构一致的订单数据：
+产品热度服从 Zipf 分布，产品名称沿用 “口力+品名+规格+包装-中国” 的命名方式，
+每个客户固定归属一个区域和申请人。相同参数和随机种子生成完全相同的数据。
+
+用法: python -m benchmarks.synthetic --rows 100000 --output synthetic.csv
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from ingest import REQUIRED_COLUMNS
+from product_catalog import DEFAULT_NEW_PRODUCTS
+
+FLAVORS = ['酸小虫', '可乐瓶', '比萨', '午餐袋', '汉堡', '扭扭虫', '字节软糖', '西瓜', '七彩熊', '薯条',
+           '酸恐龙', '烘焙袋', '大眼仔爆浆软糖', '星球爆浆软糖', '海洋动物（鲨鱼造型）', '幻彩蜥蜴', '水果软糖', '果汁']
+SIZES = ['45G', '68G', '77G', '100G', '108G', '250G', '1.5KG', '2KG', 'XXL45G', '45G+赠7G']
+PACKAGES = ['袋装', '盒装', '分享装袋装', '迷你包', '随手包', '礼盒装', '罐装', '瓶装']
+CITIES = ['广州', '深圳', '河南', '长沙', '武汉', '成都', '杭州', '南京', '济南', '沈阳', '西安', '昆明', '福州', '南宁']
+SHOP_WORDS = ['佳成行', '甜丰號', '食品', '商贸', '百货', '贸易行', '副食', '批发部']
+SURNAMES = ['梁', '胡', '王', '李', '张', '刘', '陈', '杨', '赵', '黄', '周', '吴']
+GIVEN_NAMES = ['洪泽', '斌', '伟', '芳', '敏', '静', '磊', '洋', '勇', '艳', '杰', '涛']
+REGIONS = ['东', '南', '西', '北', '中']
+ORDER_TYPES = ['订单-正常产品', '订单-正常产品', '订单-正常产品', '订单-TT产品']
+
+
+class SalesDataSpec:
+    """合成数据的规模参数"""
+
+    def __init__(self, customers=2000, products=600, regions=5, applicants=40, months=12,
+                 start_month='2025-01', zipf_a=1.1, seed=0):
+        self.customers = customers
+        self.products = products
+        self.regions = regions
+        self.applicants = applicants
+        self.months = months
+        self.start_month = start_month
+        self.zipf_a = zipf_a
+        self.seed = seed
+
+
+def _catalog(spec, rng):
+    """产品目录：代码、名称、单价和 Zipf 热度权重（新品代码位于热度靠前的位置）"""
+    codes = [f"F{i // 26:04X}{chr(65 + i % 26)}" for i in range(spec.products)]
+    codes = [f"G{code[1:]}" if code in DEFAULT_NEW_PRODUCTS else code for code in codes]
+    for i, code in enumerate(DEFAULT_NEW_PRODUCTS[:spec.products]):
+        codes[min((i + 1) * max(spec.products // 60, 1), spec.products - 1)] = code
+    names = [
+        f"口力{FLAVORS[i % len(FLAVORS)]}{SIZES[(i // len(FLAVORS)) % len(SIZES)]}"
+        f"{PACKAGES[(i * 7) % len(PACKAGES)]}-中国"
+        for i in range(spec.products)
+    ]
+    prices = rng.uniform(90, 260, spec.products).round(2)
+    weights = 1.0 / np.arange(1, spec.products + 1) ** spec.zipf_a
+    return np.array(codes, dtype=object), np.array(names, dtype=object), prices, weights / weights.sum()
+
+
+def _customers(spec, rng):
+    """客户名称及其所属区域和申请人"""
+    names = [
+        f"{CITIES[i % len(CITIES)]}{SHOP_WORDS[(i // len(CITIES)) % len(SHOP_WORDS)]}"
+        f"{'' if i < len(CITIES) * len(SHOP_WORDS) else i}"
+        for i in range(spec.customers)
+    ]
+    applicants = np.array([
+        f"{SURNAMES[i % len(SURNAMES)]}{GIVEN_NAMES[(i // len(SURNAMES)) % len(GIVEN_NAMES)]}"
+        f"{'' if i < len(SURNAMES) * len(GIVEN_NAMES) else i}"
+        for i in range(spec.applicants)
+    ], dtype=object)
+    regions = np.array(REGIONS[:spec.regions] + [f"区域{i}" for i in range(len(REGIONS), spec.regions)],
+                       dtype=object)
+    # 大客户订单更多：客户活跃度同样服从 Zipf 分布
+    weights = 1.0 / np.arange(1, spec.customers + 1) ** 0.8
+    return (np.array(names, dtype=object), regions[rng.integers(0, len(regions), spec.customers)],
+            applicants[rng.integers(0, len(applicants), spec.customers)], weights / weights.sum())
+
+
+def iter_sales_frames(rows, spec=None, chunk_rows=1_000_000):
+    """逐块产出共 rows 行的合成订单数据（列与源工作簿一致），生成大数据集时内存只保留一块"""
+    spec = spec or SalesDataSpec()
+    rng = np.random.default_rng(spec.seed)
+    codes, names, prices, product_weights = _catalog(spec, rng)
+    customers, customer_regions, customer_applicants, customer_weights = _customers(spec, rng)
+    months = pd.period_range(spec.start_month, periods=spec.months, freq='M').to_timestamp()
+
+    produced = 0
+    while produced < rows:
+        size = min(chunk_rows, rows - produced)
+        product = rng.choice(spec.products, size=size, p=product_weights)
+        customer = rng.choice(spec.customers, size=size, p=customer_weights)
+        yield pd.DataFrame({
+            '客户简称': customers[customer],
+            '所属区域': customer_regions[customer],
+            '发运月份': months[rng.integers(0, spec.months, size)],
+            '申请人': customer_applicants[customer],
+            '产品代码': codes[product],
+            '产品名称': names[product],
+            '订单类型': np.array(ORDER_TYPES, dtype=object)[rng.integers(0, len(ORDER_TYPES), size)],
+            '单价（箱）': prices[product],
+            '数量（箱）': rng.geometric(0.08, size),
+        }, columns=REQUIRED_COLUMNS)
+        produced += size
+
+
+def make_sales_frame(rows, spec=None):
+    """生成 rows 行的合成订单数据"""
+    return pd.concat(list(iter_sales_frames(rows, spec)), ignore_index=True)
+
+
+def write_csv(path, rows, spec=None):
+    """将合成数据分块写入CSV文件（编码与导入时一致）"""
+    for i, chunk in enumerate(iter_sales_frames(rows, spec)):
+        chunk.to_csv(path, mode='w' if i == 0 else 'a', header=i == 0, index=False,
+                     encoding='utf-8-sig' if i == 0 else 'utf-8', date_format='%Y-%m-%d')
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--customers', type=int, default=2000)
+    parser.add_argument('--products', type=int, default=600)
+    parser.add_argument('--regions', type=int, default=5)
+    parser.add_argument('--applicants', type=int, default=40)
+    parser.add_argument('--months', type=int, default=12)
+    parser.add_argument('--zipf-a', type=float, default=1.1, help='产品热度 Zipf 分布参数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', required=True, help='输出文件，.csv 或 .xlsx')
+    args = parser.parse_args()
+
+    spec = SalesDataSpec(args.customers, args.products, args.regions, args.applicants, args.months,
+                         zipf_a=args.zipf_a, seed=args.seed)
+    if args.output.lower().endswith('.csv'):
+        write_csv(args.output, args.rows, spec)
+    else:
+        make_sales_frame(args.rows, spec).to_excel(args.output, index=False)
+    print(f"已生成 {args.rows:,} 行合成数据: {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""
+产品共现分析
+
+由（客户简称, 产品代码）组合构建稀疏的 客户×产品 购买矩阵 X，
+一次矩阵乘法 Xᵀ·X 即得到全部产品两两之间的共同购买客户数。
+在此基础上按最小支持度剪枝挖掘关联规则（支持度、置信度、提升度）。
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def build_incidence(df, customer_col='客户简称', product_col='产品代码', value_col='销售额'):
+    """
+    构建客户×产品的二值购买矩阵
+
+    与 groupby().sum().unstack() 后按"销售额 > 0"二值化的结果一致：
+    行为排序后的全部客户，列为排序后的全部产品。
+    返回 (稀疏矩阵, 客户Index, 产品Index)
+    """
+    pair_sales = df.groupby([customer_col, product_col], observed=True)[value_col].sum()
+
+    customer_ids, customers = pd.factorize(pair_sales.index.get_level_values(0), sort=True)
+    product_ids, products = pd.factorize(pair_sales.index.get_level_values(1), sort=True)
+
+    bought = pair_sales.to_numpy() > 0
+    incidence = sparse.csr_matrix(
+        (np.ones(bought.sum(), dtype=np.int32), (customer_ids[bought], product_ids[bought])),
+        shape=(len(customers), len(products))
+    )
+    customers = pd.Index(customers, name=customer_col)
+    products = pd.Index(products, name=product_col)
+    return incidence, customers, products
+
+
+def co_occurrence_matrix(incidence, products):
+    """计算产品共现矩阵（共同购买的客户数），对角线为0"""
+    counts = (incidence.T @ incidence).toarray().astype(np.int64)
+    np.fill_diagonal(counts, 0)
+    return pd.DataFrame(counts, index=products, columns=products)
+
+
+def products_per_customer(incidence, customers):
+    """每个客户购买的不同产品数"""
+    return pd.Series(np.asarray(incidence.sum(axis=1)).ravel(), index=customers)
+
+
+def customers_with_any(incidence, products, selected_products):
+    """购买过所选产品中任意一个的客户数"""
+    columns = products.get_indexer(selected_products)
+    columns = columns[columns >= 0]
+    if len(columns) == 0:
+        return 0
+    return int((incidence[:, columns].getnnz(axis=1) > 0).sum())
+
+
+def top_k_indices(values, k):
+    """
+    返回数值最大的k个位置，按数值降序排列，数值相同时保持原有顺序
+
+    使用 np.partition 找到第k大的值，只对候选元素排序，避免整行全排序
+    """
+    values = np.asarray(values)
+    n = len(values)
+    if k <= 0 or n == 0:
+        return np.array([], dtype=np.intp)
+    if k >= n:
+        return np.argsort(-values, kind='stable')
+
+    kth_value = np.partition(values, n - k)[n - k]
+    above = np.flatnonzero(values > kth_value)
+    ties = np.flatnonzero(values == kth_value)[:k - len(above)]
+    candidates = np.concatenate([above, ties])
+    return candidates[np.argsort(-values[candidates], kind='stable')]
+
+
+def top_co_occurring(co_occurrence, product, k):
+    """查询与指定产品共现次数最高的k个产品"""
+    row = co_occurrence.loc[product]
+    positions = top_k_indices(row.to_numpy(), k)
+    return row.iloc[positions]
+
+
+# ==== 关联规则 ====
+RULE_COLUMNS = ['前项', '后项', '项数', '客户数', '支持度', '置信度', '提升度']
+
+
+def _pair_counts(incidence):
+    """频繁项之间两两共同购买的客户数（稀疏上三角矩阵）"""
+    counts = (incidence.T @ incidence).tocsr()
+    counts.setdiag(0)
+    counts.eliminate_zeros()
+    return sparse.triu(counts, k=1).tocsr()
+
+
+def _rules_frame(antecedents, consequents, counts, antecedent_counts, consequent_counts, n_customers):
+    """由各规则的 前项/后项/共同客户数 计算支持度、置信度和提升度"""
+    support = counts / n_customers
+    confidence = counts / antecedent_counts
+    lift = confidence / (consequent_counts / n_customers)
+    return pd.DataFrame({
+        '前项': antecedents,
+        '后项': consequents,
+        '项数': [len(items) + 1 for items in antecedents],
+        '客户数': counts.astype(np.int64),
+        '支持度': support,
+        '置信度': confidence,
+        '提升度': lift,
+    }, columns=RULE_COLUMNS)
+
+
+def association_rules(incidence, products, min_support=0.02, min_confidence=0.1, max_size=2, focus=None):
+    """
+    基于客户×产品购买矩阵挖掘关联规则 前项 → 后项
+
+    支持度为同时购买前项和后项的客户占比，置信度为购买前项的客户中同时购买后项的比例，
+    提升度为置信度与后项支持度之比（大于1表示正相关，可消除热门产品带来的偏差）。
+    按最小支持度逐层剪枝（Apriori 性质：非频繁项集的超集不可能频繁）：先筛选频繁单品，
+    两项集由一次稀疏矩阵乘法得到；max_size 为 3 时，对每个频繁单品只在购买它的客户中
+    计算其频繁伙伴之间的共现数得到三项集。指定 focus（产品代码列表）时只挖掘包含其中
+    至少一个产品的项集，三项集的搜索范围随之大幅缩小。前项为产品代码元组，按提升度降序返回
+    """
+    n_customers = incidence.shape[0]
+    if n_customers == 0:
+        return pd.DataFrame(columns=RULE_COLUMNS)
+    min_count = max(int(np.ceil(min_support * n_customers)), 1)
+    codes = np.asarray(products, dtype=object)
+
+    # 频繁单品
+    item_counts = np.asarray(incidence.getnnz(axis=0)).ravel()
+    frequent = np.flatnonzero(item_counts >= min_count)
+    matrix = incidence.tocsc()[:, frequent].tocsr()
+    counts1 = item_counts[frequent].astype(np.float64)
+    focused = np.ones(len(frequent), dtype=bool) if focus is None else np.isin(codes[frequent], list(focus))
+
+    # 频繁两项集（上三角 a<b）
+    pairs = _pair_counts(matrix)
+    pairs.data[pairs.data < min_count] = 0
+    pairs.eliminate_zeros()
+
+    def pair_count(x, y):
+        # 空索引时 scipy 返回稀疏矩阵而非数组，直接返回空数组
+        if len(x) == 0:
+            return np.empty(0, dtype=np.float64)
+        x, y = np.minimum(x, y), np.maximum(x, y)
+        return np.asarray(pairs[x, y]).ravel().astype(np.float64)
+
+    # 每个两项集 (a, b) 产生 a→b 和 b→a 两条规则
+    a, b = pairs.nonzero()
+    keep = focused[a] | focused[b]
+    a, b = a[keep], b[keep]
+    antecedents, consequents = np.concatenate([a, b]), np.concatenate([b, a])
+    frames = [_rules_frame(
+        [(code,) for code in codes[frequent[antecedents]]],
+        codes[frequent[consequents]],
+        np.concatenate([pair_count(a, b)] * 2),
+        counts1[antecedents],
+        counts1[consequents],
+        n_customers
+    )]
+
+    if max_size >= 3 and pairs.nnz:
+        # 频繁三项集：在购买 i 的客户中计算 i 的频繁伙伴两两共现数，伙伴之间也须是频繁两项集。
+        # 不限定 focus 时只取大于 i 的伙伴（i<j<k，每个三项集只计算一次），否则以各 focus 产品为起点再去重
+        symmetric = (pairs + pairs.T).tolil().rows if focus is not None else pairs.tolil().rows
+        found = []
+        for i in np.flatnonzero(focused):
+            row = np.asarray(symmetric[i])
+            if len(row) < 2:
+                continue
+            buyers = matrix[:, i].nonzero()[0]
+            sub = matrix[buyers][:, row]
+            within = sparse.triu((sub.T @ sub).tocsr(), k=1).tocoo()
+            j, k = row[within.row], row[within.col]
+            keep = (within.data >= min_count) & (pair_count(j, k) > 0)
+            found.append(np.column_stack([np.full(keep.sum(), i), j[keep], k[keep], within.data[keep]]))
+
+        triples = np.concatenate(found) if found else np.empty((0, 4), dtype=np.int64)
+        if len(triples):
+            items = np.sort(triples[:, :3], axis=1)
+            items, first = np.unique(items, axis=0, return_index=True)
+            count = triples[first, 3].astype(np.float64)
+            i, j, k = items.T
+            # 每个三项集产生三条规则：{i,j}→k、{i,k}→j、{j,k}→i
+            left, right = np.concatenate([i, i, j]), np.concatenate([j, k, k])
+            frames.append(_rules_frame(
+                list(zip(codes[frequent[left]], codes[frequent[right]])),
+                codes[frequent[np.concatenate([k, j, i])]],
+                np.concatenate([count] * 3),
+                pair_count(left, right),
+                counts1[np.concatenate([k, j, i])],
+                n_customers
+            ))
+
+    rules = pd.concat(frames, ignore_index=True)
+    rules = rules[rules['置信度'] >= min_confidence]
+    return rules.sort_values(['提升度', '客户数'], ascending=False, kind='stable').reset_index(drop=True)
+
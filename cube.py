@@ -0,0 +1,41 @@
+"""
+销售聚合立方体
+
+按（所属区域, 客户简称, 申请人, 产品代码, 发运月份）粒度预先汇总销售额、数量和单价的和与计数。
+各标签页的指标（KPI、区域销售、包装销售、申请人业绩、月度趋势等）均可由立方体回答，
+筛选条件变化时只需扫描维度组合而非全部订单行。
+"""
+
+# 立方体粒度
+CUBE_DIMENSIONS = ['所属区域', '客户简称', '申请人', '产品代码', '发运月份']
+# 由产品（是否新品由产品和发运月份）决定的属性列，随维度一起保留以便按名称、包装和新品分组
+CUBE_ATTRIBUTES = ['简化产品名称', '包装类型', '是否新品']
+
+PRICE_SUM = '单价合计'
+PRICE_COUNT = '单价计数'
+ROW_COUNT = '订单行数'
+
+
+def build_cube(df):
+    """将订单行汇总为聚合立方体"""
+    keys = [col for col in CUBE_DIMENSIONS + CUBE_ATTRIBUTES if col in df.columns]
+    cube = df.groupby(keys, dropna=False, observed=True, sort=False).agg(**{
+        '销售额': ('销售额', 'sum'),
+        '数量（箱）': ('数量（箱）', 'sum'),
+        PRICE_SUM: ('单价（箱）', 'sum'),
+        PRICE_COUNT: ('单价（箱）', 'count'),
+        ROW_COUNT: ('单价（箱）', 'size'),
+    }).reset_index()
+    return cube
+
+
+def average_price(cube):
+    """按订单行计算的平均单价"""
+    count = cube[PRICE_COUNT].sum()
+    return cube[PRICE_SUM].sum() / count if count > 0 else float('nan')
+
+
+def mean_price_by(cube, keys):
+    """按指定维度分组的平均单价（等价于在订单行上求均值）"""
+    grouped = cube.groupby(keys, observed=True)[[PRICE_SUM, PRICE_COUNT]].sum()
+    return grouped[PRICE_SUM] / grouped[PRICE_COUNT]
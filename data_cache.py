@@ -0,0 +1,241 @@
+"""
+销售数据列式磁盘缓存
+
+将预处理完成的销售数据（含销售额、简化产品名称、包装类型、解析后的发运月份）
+以 Arrow IPC 格式持久化，读取时使用内存映射，重复启动时完全跳过Excel解析。
+缓存键由源文件路径、修改时间、文件大小和内容哈希共同决定，工作簿变化后自动重新导入。
+大文件可通过 load_cached_stream 逐块写入缓存，导入时不需要在内存中保留整个数据集。
+上传的文件没有路径，按内容哈希寻址缓存（load_cached_upload），目录总大小有上限，
+超过时按最近使用时间淘汰。
+"""
+import hashlib
+import os
+import glob
+import threading
+import uuid
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+except ImportError:  # pyarrow 未安装时缓存自动失效，直接解析源文件
+    pa = None
+
+# 派生列的计算逻辑发生变化时递增，使旧缓存失效
+CACHE_VERSION = 2
+
+# 缓存目录，可通过环境变量覆盖
+CACHE_DIR = os.environ.get(
+    'SALES_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sales_cache')
+)
+
+# 上传文件的缓存目录及总大小上限，可通过环境变量配置
+UPLOAD_CACHE_DIR = os.path.join(CACHE_DIR, 'uploads')
+UPLOAD_CACHE_BYTES = int(float(os.environ.get('SALES_UPLOAD_CACHE_MB', 512)) * 1024 * 1024)
+
+# 进程内的内容哈希记录：(路径, 修改时间, 大小) -> 内容哈希，避免重复读取整个文件
+_content_hashes = {}
+
+
+def file_content_hash(file_path, chunk_size=1024 * 1024):
+    """分块计算文件内容的SHA-256哈希"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def file_fingerprint(file_path, variant=''):
+    """根据路径、修改时间、大小和内容哈希生成缓存键，variant 区分同一文件的不同导入方式"""
+    abs_path = os.path.abspath(file_path)
+    stat = os.stat(abs_path)
+    stat_key = (abs_path, stat.st_mtime_ns, stat.st_size)
+
+    content_hash = _content_hashes.get(stat_key)
+    if content_hash is None:
+        content_hash = file_content_hash(abs_path)
+        _content_hashes[stat_key] = content_hash
+
+    raw_key = f"{abs_path}|{stat.st_mtime_ns}|{stat.st_size}|{content_hash}|v{CACHE_VERSION}|{variant}"
+    return hashlib.sha256(raw_key.encode('utf-8')).hexdigest()
+
+
+def _path_prefix(file_path):
+    """同一源文件的缓存共享前缀，用于清理过期缓存"""
+    return hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+
+
+def _cache_path(file_path, key):
+    return os.path.join(CACHE_DIR, f"{_path_prefix(file_path)}-{key[:32]}.arrow")
+
+
+def temp_path(path):
+    """与目标文件同目录的唯一临时文件名（进程号、线程号和随机后缀），并发写入互不覆盖"""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.{uuid.uuid4().hex[:8]}.tmp"
+
+
+def read_frame(cache_path):
+    """以内存映射方式读取Arrow IPC缓存文件"""
+    source = pa.memory_map(cache_path, 'r')
+    table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas()
+
+
+def write_frame(df, cache_path):
+    """将DataFrame原子地写入Arrow IPC缓存文件"""
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    tmp_path = temp_path(cache_path)
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def write_chunks(chunks, cache_path):
+    """
+    将逐块产出的DataFrame依次写入同一个Arrow IPC文件，任一时刻内存中只保留一块数据
+
+    各块的列类型以第一块为准，其后的块按该结构转换
+    """
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = temp_path(cache_path)
+    schema = None
+    writer = None
+    try:
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            for chunk in chunks:
+                if schema is None:
+                    schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                    # 首块中全为空的列无法推断类型，按字符串处理
+                    schema = pa.schema([
+                        field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                        for field in schema
+                    ])
+                    writer = pa.ipc.new_file(sink, schema)
+                writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            if writer is None:
+                raise ValueError("文件中没有数据行")
+            writer.close()
+        os.replace(tmp_path, cache_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _remove_stale(file_path, keep_path):
+    """删除同一源文件的旧版本缓存"""
+    for path in glob.glob(os.path.join(CACHE_DIR, f"{_path_prefix(file_path)}-*.arrow")):
+        if path != keep_path:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def load_cached_frame(file_path, builder):
+    """
+    读取源文件对应的列式缓存；缓存不存在或源文件已变化时调用 builder(file_path)
+    重新解析，并将结果写入缓存
+    """
+    if pa is None:
+        return builder(file_path)
+
+    cache_path = _cache_path(file_path, file_fingerprint(file_path))
+    if os.path.exists(cache_path):
+        try:
+            return read_frame(cache_path)
+        except Exception as e:
+            print(f"读取缓存失败，重新解析源文件: {str(e)}")
+
+    df = builder(file_path)
+
+    try:
+        write_frame(df, cache_path)
+        _remove_stale(file_path, cache_path)
+    except Exception as e:
+        # 缓存写入失败不影响数据加载
+        print(f"写入缓存失败: {str(e)}")
+
+    return df
+
+
+def load_cached_stream(file_path, chunk_source):
+    """
+    流式版本的 load_cached_frame：缓存失效时由 chunk_source(file_path) 逐块产出数据，
+    直接写入缓存文件后再以内存映射方式读回
+    """
+    if pa is None:
+        return pd.concat(list(chunk_source(file_path)), ignore_index=True)
+
+    cache_path = _cache_path(file_path, file_fingerprint(file_path, variant='stream'))
+    if not os.path.exists(cache_path):
+        write_chunks(chunk_source(file_path), cache_path)
+        _remove_stale(file_path, cache_path)
+    return read_frame(cache_path)
+
+
+# ==== 上传文件缓存 ====
+def bytes_content_hash(data):
+    """上传内容的缓存键：内容的SHA-256哈希（含缓存版本）"""
+    digest = hashlib.sha256(data)
+    digest.update(f"|v{CACHE_VERSION}".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def _prune_uploads(keep_path, max_bytes=UPLOAD_CACHE_BYTES):
+    """上传缓存目录超过大小上限时，按最近使用时间从旧到新删除（保留 keep_path）"""
+    entries = []
+    for path in glob.glob(os.path.join(UPLOAD_CACHE_DIR, '*.arrow')):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if path == keep_path:
+            continue
+        try:
+            os.remove(path)
+            total -= size
+        except OSError:
+            pass
+
+
+def load_cached_upload(content_hash, builder):
+    """
+    读取内容哈希为 content_hash 的上传文件的列式缓存，未命中时调用 builder() 解析并写入缓存；
+    相同内容的上传无论来自哪个会话、服务是否重启过都只解析一次
+    """
+    if pa is None:
+        return builder()
+
+    cache_path = os.path.join(UPLOAD_CACHE_DIR, f"{content_hash[:32]}.arrow")
+    if os.path.exists(cache_path):
+        try:
+            df = read_frame(cache_path)
+            # 修改时间记录最近使用时间，供按LRU淘汰
+            os.utime(cache_path)
+            return df
+        except Exception as e:
+            print(f"读取缓存失败，重新解析上传文件: {str(e)}")
+
+    df = builder()
+
+    try:
+        write_frame(df, cache_path)
+        _prune_uploads(cache_path)
+    except Exception as e:
+        print(f"写入缓存失败: {str(e)}")
+
+    return df
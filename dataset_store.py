@@ -0,0 +1,346 @@
+"""
+增量销售数据集
+
+数据目录中的每个工作簿（或CSV）只导入一次，按发运月份拆分写入分区目录
+（month=YYYY-MM/<源文件>.arrow）。清单文件记录每个源文件的修改时间、大小、内容哈希
+和所含月份：新增文件只导入新文件，修改过的文件只重写它自己的分区，删除的文件
+同时删除其分区。需要导入的多个文件在多个工作进程中并行导入，各自写入自己的分区文件。
+读取时只打开所选月份范围内的分区文件。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+from data_cache import file_content_hash, temp_path
+from parallel_ingest import INGEST_WORKERS, parallel_workers, run_tasks
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401
+except ImportError:  # pyarrow 未安装时不提供增量数据集，仍可按单个文件加载
+    pa = None
+
+try:
+    import fcntl
+except ImportError:  # 非 POSIX 平台只在进程内加锁
+    fcntl = None
+
+STORE_AVAILABLE = pa is not None
+
+# 分区格式或派生列逻辑变化时递增，使已有分区全部重新导入
+STORE_VERSION = 2
+
+# 分区存放目录，可通过环境变量覆盖
+STORE_DIR = os.environ.get(
+    'SALES_STORE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), '.sales_store')
+)
+
+SOURCE_EXTENSIONS = ('.xlsx', '.xls', '.csv')
+MONTH_COLUMN = '发运月份'
+# 发运月份为空或无法解析的行所在的分区
+UNKNOWN_MONTH = 'unknown'
+
+MANIFEST_NAME = 'manifest.json'
+LOCK_NAME = '.lock'
+
+# 同一进程内的各会话（线程）依次同步，跨进程再由存储目录下的文件锁互斥
+_SYNC_LOCK = threading.Lock()
+
+
+def list_source_files(data_dir):
+    """数据目录下的全部工作簿和CSV文件（按文件名排序，忽略Excel临时文件）"""
+    if not data_dir or not os.path.isdir(data_dir):
+        return []
+    return sorted(
+        os.path.join(data_dir, name) for name in os.listdir(data_dir)
+        if name.lower().endswith(SOURCE_EXTENSIONS) and not name.startswith('~$')
+    )
+
+
+def _source_id(file_path):
+    """源文件在分区目录中的文件名"""
+    return hashlib.sha1(os.path.abspath(file_path).encode('utf-8')).hexdigest()[:16]
+
+
+def _partition_dir(store_dir, month):
+    return os.path.join(store_dir, f"month={month}")
+
+
+def _partition_path(store_dir, month, source_id):
+    return os.path.join(_partition_dir(store_dir, month), f"{source_id}.arrow")
+
+
+@contextmanager
+def _store_lock(store_dir):
+    """独占存储目录：进程内的线程锁加上目录下的文件锁，保护清单的读取-修改-写入及分区的替换"""
+    with _SYNC_LOCK:
+        os.makedirs(store_dir, exist_ok=True)
+        with open(os.path.join(store_dir, LOCK_NAME), 'a') as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def month_keys(months):
+    """将发运月份转为分区键 YYYY-MM，无法解析的记为 unknown"""
+    parsed = pd.to_datetime(months, errors='coerce')
+    keys = parsed.dt.strftime('%Y-%m')
+    return keys.fillna(UNKNOWN_MONTH)
+
+
+# ==== 清单 ====
+def load_manifest(store_dir=STORE_DIR):
+    """读取清单；清单不存在、损坏或版本不符时返回空清单"""
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'version': STORE_VERSION, 'sources': {}}
+    if manifest.get('version') != STORE_VERSION:
+        return {'version': STORE_VERSION, 'sources': {}}
+    return manifest
+
+
+def save_manifest(manifest, store_dir=STORE_DIR):
+    """原子地写入清单"""
+    os.makedirs(store_dir, exist_ok=True)
+    path = os.path.join(store_dir, MANIFEST_NAME)
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def manifest_version(manifest):
+    """清单内容指纹，分区有任何变化时随之改变，用作读取结果的缓存键"""
+    raw = json.dumps(manifest.get('sources', {}), ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+
+def available_months(manifest):
+    """数据集中已有的全部月份（升序，不含 unknown）"""
+    months = set()
+    for entry in manifest.get('sources', {}).values():
+        months.update(entry.get('months', []))
+    months.discard(UNKNOWN_MONTH)
+    return sorted(months)
+
+
+# ==== 写入分区 ====
+class _PartitionWriter:
+    """将一个源文件的数据块按月份追加到各自的分区文件，完成后原子地替换旧分区"""
+
+    def __init__(self, store_dir, source_id):
+        self.store_dir = store_dir
+        self.source_id = source_id
+        self.schema = None
+        self.rows = 0
+        self._writers = {}  # 月份 -> (sink, writer, 临时文件路径)
+
+    def _writer(self, month):
+        if month not in self._writers:
+            path = _partition_path(self.store_dir, month, self.source_id)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = temp_path(path)
+            sink = pa.OSFile(tmp_path, 'wb')
+            self._writers[month] = (sink, pa.ipc.new_file(sink, self.schema), tmp_path)
+        return self._writers[month][1]
+
+    def write(self, chunk):
+        if self.schema is None:
+            schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+            # 首块中全为空的列无法推断类型，按字符串处理
+            self.schema = pa.schema([
+                field.with_type(pa.string()) if pa.types.is_null(field.type) else field
+                for field in schema
+            ])
+        keys = month_keys(chunk[MONTH_COLUMN])
+        for month, part in chunk.groupby(keys.to_numpy(), sort=False):
+            self._writer(month).write_table(pa.Table.from_pandas(part, schema=self.schema, preserve_index=False))
+        self.rows += len(chunk)
+
+    def commit(self):
+        """关闭所有分区文件并替换为正式文件，返回写入的月份"""
+        for month, (sink, writer, tmp_path) in self._writers.items():
+            writer.close()
+            sink.close()
+            os.replace(tmp_path, _partition_path(self.store_dir, month, self.source_id))
+        months = sorted(self._writers)
+        self._writers = {}
+        return months
+
+    def abort(self):
+        for sink, writer, tmp_path in self._writers.values():
+            try:
+                writer.close()
+                sink.close()
+            except Exception:
+                pass
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self._writers = {}
+
+
+def _remove_partitions(store_dir, source_id, months):
+    """删除某源文件在指定月份中的分区文件，空的分区目录一并删除"""
+    for month in months:
+        path = _partition_path(store_dir, month, source_id)
+        if os.path.exists(path):
+            os.remove(path)
+        month_dir = _partition_dir(store_dir, month)
+        if os.path.isdir(month_dir) and not os.listdir(month_dir):
+            shutil.rmtree(month_dir, ignore_errors=True)
+
+
+def ingest_file(file_path, chunk_source, store_dir=STORE_DIR, warn=print):
+    """
+    导入单个源文件：chunk_source(file_path, warn=warn) 逐块产出已计算派生列的DataFrame，
+    各块按月份写入分区，返回 (写入的月份, 行数)
+    """
+    writer = _PartitionWriter(store_dir, _source_id(file_path))
+    try:
+        for chunk in chunk_source(file_path, warn=warn):
+            writer.write(chunk)
+        if writer.schema is None:
+            raise ValueError("文件中没有数据行")
+        return writer.commit(), writer.rows
+    except BaseException:
+        writer.abort()
+        raise
+
+
+def sync_store(data_dir, chunk_source, store_dir=STORE_DIR, progress=None, warn=print,
+               max_workers=INGEST_WORKERS):
+    """
+    将数据目录同步到分区数据集：只导入新增或内容变化的文件，删除已移除文件的分区
+
+    修改时间和大小未变的文件直接跳过，不读取文件内容；需要导入的文件最多使用 max_workers
+    个进程并行导入（总大小低于 PARALLEL_MIN_BYTES 时串行），chunk_source 须为模块级函数
+    （如 ingest.iter_sales_chunks）。
+    progress(已导入文件数, 待导入文件数, 刚完成的文件路径) 在每个文件导入完成后调用，
+    全部完成后以文件路径 None 调用一次。返回更新后的清单，每个文件的导入耗时记录在 seconds 中
+    """
+    if not STORE_AVAILABLE:
+        raise RuntimeError("增量数据集需要安装 pyarrow")
+    # 多个会话同时同步时依次进行，后进入的会话读到已更新的清单，通常无需再导入
+    with _store_lock(store_dir):
+        return _sync_store(data_dir, chunk_source, store_dir, progress, warn, max_workers)
+
+
+def _sync_store(data_dir, chunk_source, store_dir, progress, warn, max_workers):
+    """sync_store 的实现，调用方须持有存储目录的锁"""
+    manifest = load_manifest(store_dir)
+    sources = manifest['sources']
+    files = list_source_files(data_dir)
+    current = {os.path.abspath(path): path for path in files}
+    changed = False
+
+    # 删除已不在数据目录中的源文件的分区
+    for abs_path in [path for path in sources if path not in current]:
+        entry = sources.pop(abs_path)
+        _remove_partitions(store_dir, _source_id(abs_path), entry.get('months', []))
+        changed = True
+
+    pending = {}  # 绝对路径 -> 新清单条目
+    for abs_path in current:
+        stat = os.stat(abs_path)
+        entry = sources.get(abs_path)
+        if entry and entry['mtime_ns'] == stat.st_mtime_ns and entry['size'] == stat.st_size:
+            continue
+
+        content_hash = file_content_hash(abs_path)
+        if entry and entry['sha256'] == content_hash:
+            # 仅修改时间变化，内容相同，无需重新导入
+            entry['mtime_ns'] = stat.st_mtime_ns
+            changed = True
+            continue
+        pending[abs_path] = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': content_hash}
+
+    tasks = [(current[abs_path], chunk_source, store_dir) for abs_path in pending]
+    results = run_tasks(ingest_file, tasks, parallel_workers([task[0] for task in tasks], max_workers))
+    for done, (task, result, error, warnings, seconds) in enumerate(results, 1):
+        path = task[0]
+        abs_path = os.path.abspath(path)
+        for message in warnings:
+            warn(message)
+        new_entry = pending[abs_path]
+        new_entry['seconds'] = round(seconds, 3)
+        if error is None:
+            months, rows = result
+            new_entry.update(months=months, rows=rows)
+        else:
+            # 记录失败的文件，内容不变时不再反复尝试导入
+            warn(f"导入文件 {os.path.basename(path)} 失败: {str(error)}")
+            months = []
+            new_entry.update(months=[], rows=0, error=str(error))
+
+        # 新分区已替换同月份的旧文件，只需删除源文件不再包含的月份
+        old_months = sources[abs_path].get('months', []) if abs_path in sources else []
+        _remove_partitions(store_dir, _source_id(abs_path), [m for m in old_months if m not in months])
+        sources[abs_path] = new_entry
+        changed = True
+        if progress:
+            progress(done, len(tasks), path)
+
+    if progress:
+        progress(len(tasks), len(tasks), None)
+    if changed:
+        save_manifest(manifest, store_dir)
+    return manifest
+
+
+def sources_frame(manifest):
+    """清单中各源文件的导入情况：行数、月份数、导入耗时和错误信息"""
+    return pd.DataFrame([{
+        '文件': os.path.basename(abs_path),
+        '行数': entry.get('rows', 0),
+        '月份数': len([m for m in entry.get('months', []) if m != UNKNOWN_MONTH]),
+        '导入耗时(秒)': entry.get('seconds'),
+        '错误': entry.get('error', ''),
+    } for abs_path, entry in sorted(manifest.get('sources', {}).items())],
+        columns=['文件', '行数', '月份数', '导入耗时(秒)', '错误'])
+
+
+# ==== 读取分区 ====
+def partition_files(manifest, months=None, store_dir=STORE_DIR):
+    """所选月份（None 表示全部，含 unknown）对应的分区文件，按月份和源文件排序"""
+    wanted = None if months is None else set(months)
+    paths = []
+    for abs_path in sorted(manifest.get('sources', {})):
+        source_id = _source_id(abs_path)
+        for month in manifest['sources'][abs_path].get('months', []):
+            if wanted is None or month in wanted:
+                paths.append((month, abs_path, _partition_path(store_dir, month, source_id)))
+    return [path for _, _, path in sorted(paths)]
+
+
+def read_partitions(manifest, months=None, store_dir=STORE_DIR):
+    """以内存映射方式读取所选月份的分区并合并为一个DataFrame"""
+    tables = []
+    for path in partition_files(manifest, months, store_dir):
+        source = pa.memory_map(path, 'r')
+        tables.append(pa.ipc.open_file(source).read_all())
+    if not tables:
+        return pd.DataFrame()
+    table = pa.concat_tables(tables, promote_options='permissive')
+    return table.to_pandas()
+
+
+def month_range(months, start, end):
+    """available_months 中位于 [start, end] 之间的月份"""
+    return [month for month in months if start <= month <= end]
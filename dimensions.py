@@ -0,0 +1,47 @@
+"""
+产品和客户维度表
+
+构建数据集时对订单行按产品代码、客户简称各分组一次，得到：
+产品维度（产品代码 → 简化产品名称、包装类型、是否新品）和
+客户维度（客户简称 → 所属区域、申请人）。
+维度表随数据集一起缓存，各标签页和侧边栏按代码查找标签为字典查找，不再扫描订单行。
+"""
+import pandas as pd
+
+from product_catalog import NEW_FLAG
+
+PRODUCT_KEY = '产品代码'
+PRODUCT_ATTRIBUTES = ['简化产品名称', '包装类型']
+CUSTOMER_KEY = '客户简称'
+CUSTOMER_ATTRIBUTES = ['所属区域', '申请人']
+
+
+def build_dimension(df, key, attributes, flags=()):
+    """
+    按 key 分组一次：属性列取第一个非空值，flags 中的布尔列取“任一为真”，
+    返回以 key 为索引的维度表（行顺序与 key 首次出现的顺序一致）
+    """
+    aggregations = {col: (col, 'first') for col in attributes if col in df.columns}
+    aggregations.update({col: (col, 'any') for col in flags if col in df.columns})
+    if key not in df.columns or not aggregations:
+        return pd.DataFrame(columns=list(aggregations), index=pd.Index([], name=key))
+    return df.groupby(key, observed=True, sort=False).agg(**aggregations)
+
+
+def product_dimension(df):
+    """产品维度：简化产品名称、包装类型，以及是否在任一发运月份为新品"""
+    return build_dimension(df, PRODUCT_KEY, PRODUCT_ATTRIBUTES, flags=[NEW_FLAG])
+
+
+def customer_dimension(df):
+    """客户维度：所属区域、申请人（同一客户有多个取值时取首次出现的）"""
+    return build_dimension(df, CUSTOMER_KEY, CUSTOMER_ATTRIBUTES)
+
+
+def label_map(dimension, column):
+    """维度键 → 某列取值的字典（键和取值均为字符串），缺少该列或取值为空时以键本身作为标签"""
+    keys = dimension.index.astype(str)
+    if column not in dimension.columns:
+        return dict(zip(keys, keys))
+    values = dimension[column].astype(object)
+    return {key: key if pd.isna(value) else str(value) for key, value in zip(keys, values)}
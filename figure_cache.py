@@ -0,0 +1,57 @@
+"""
+图表缓存
+
+图表由构建函数根据聚合后的数据生成，按（图表名称, 数据指纹）缓存序列化后的图表JSON。
+数据未变化时直接从JSON还原图表，跳过 plotly express 的构建过程。缓存的是不可变的
+JSON字符串，各会话还原出各自的图表对象，互不影响。
+
+构建函数只能依赖传入的数据参数（DataFrame、Series、数组或可repr的标量/列表），
+标题中的计数等其他取值也须作为参数传入，否则缓存的图表不会随之更新。
+"""
+import hashlib
+import os
+
+import numpy as np
+import pandas as pd
+import plotly.io as pio
+
+from profiler import stage
+from result_cache import ResultCache
+
+# 图表JSON的进程级缓存，容量可通过环境变量配置
+FIGURE_CACHE = ResultCache(
+    max_entries=int(os.environ.get('SALES_FIGURE_CACHE_ENTRIES', 256)),
+    ttl=float(os.environ.get('SALES_FIGURE_CACHE_TTL', 3600)),
+    max_bytes=int(float(os.environ.get('SALES_FIGURE_CACHE_MB', 128)) * 1024 * 1024),
+)
+
+
+def data_fingerprint(*values):
+    """数据内容的哈希：DataFrame/Series 按列名、类型和逐行哈希计算，其他值按repr计算"""
+    digest = hashlib.sha1()
+    for value in values:
+        if isinstance(value, pd.DataFrame):
+            digest.update(repr((list(value.columns), list(map(str, value.dtypes)))).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        elif isinstance(value, pd.Series):
+            digest.update(repr((value.name, str(value.dtype))).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(value, index=True).to_numpy().tobytes())
+        elif isinstance(value, np.ndarray):
+            digest.update(repr((value.dtype.str, value.shape)).encode('utf-8'))
+            digest.update(np.ascontiguousarray(value).tobytes() if value.dtype != object
+                          else repr(value.tolist()).encode('utf-8'))
+        else:
+            digest.update(repr(value).encode('utf-8'))
+        digest.update(b'\x00')
+    return digest.hexdigest()[:20]
+
+
+def cached_figure(name, build, *data):
+    """返回 build(*data) 生成的图表，数据未变化时从缓存的JSON还原"""
+    with stage(f"figure.{name}"):
+        key = (name, data_fingerprint(*data))
+        spec = FIGURE_CACHE.get(key)
+        if spec is None:
+            spec = build(*data).to_json()
+            FIGURE_CACHE.set(key, spec)
+        return pio.from_json(spec)
@@ -0,0 +1,105 @@
+"""
+图表数据精简
+
+分类柱状图只保留前N个类别，其余合并为“其他”；散点图超过点数上限时按二维网格
+分层抽样，每个非空网格至少保留一个点，在减少点数的同时保留分布形状和离群点。
+精简后在图表标题中注明显示的数量，避免浏览器接收和渲染过大的图表数据。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+# 分类柱状图最多显示的类别数（含“其他”），可通过环境变量配置
+MAX_BAR_CATEGORIES = int(os.environ.get('SALES_CHART_MAX_CATEGORIES', 30))
+# 散点图最多显示的点数，可通过环境变量配置
+MAX_SCATTER_POINTS = int(os.environ.get('SALES_CHART_MAX_POINTS', 5000))
+# 超过该点数的散点图使用 WebGL 渲染
+WEBGL_POINTS = 1000
+
+OTHER_LABEL = '其他'
+
+# 分层抽样的网格大小（每个方向的分箱数）
+GRID_BINS = 64
+
+
+def top_categories(df, category_col, sort_col, limit=MAX_BAR_CATEGORIES, other_agg=None):
+    """
+    按 sort_col 降序保留前 limit-1 个类别，其余合并为“其他”一行
+
+    other_agg 为 {列名: 聚合方式}，指定“其他”行各列的计算方式（默认对 sort_col 求和，
+    未指定的列留空）；类别数不超过 limit 时原样返回。返回 (精简后的数据, 原类别数)
+    """
+    total = len(df)
+    if total <= limit:
+        return df, total
+
+    ordered = df.sort_values(sort_col, ascending=False)
+    top, rest = ordered.iloc[:limit - 1], ordered.iloc[limit - 1:]
+    other = {category_col: f"{OTHER_LABEL}（{len(rest)}项）"}
+    for col, agg in (other_agg or {sort_col: 'sum'}).items():
+        other[col] = rest[col].agg(agg)
+    result = pd.concat([top, pd.DataFrame([other])], ignore_index=True)
+    # 分类列可能是 category 类型，合并后统一为字符串以便显示“其他”
+    result[category_col] = result[category_col].astype(str)
+    return result, total
+
+
+def grid_cells(df, x, y):
+    """各点所在的 (x, y) 二维网格编号（GRID_BINS × GRID_BINS，非有限值归入第一个分箱）"""
+    def bins(values):
+        values = pd.to_numeric(values, errors='coerce').to_numpy(dtype='float64')
+        finite = values[np.isfinite(values)]
+        if len(finite) == 0:
+            return np.zeros(len(values), dtype=np.int64)
+        lo, hi = finite.min(), finite.max()
+        scaled = (values - lo) / (hi - lo) * GRID_BINS if hi > lo else np.zeros(len(values))
+        return np.clip(np.nan_to_num(scaled, nan=0), 0, GRID_BINS - 1).astype(np.int64)
+
+    return bins(df[x]) * GRID_BINS + bins(df[y])
+
+
+def downsample_points(df, x, y, limit=MAX_SCATTER_POINTS, seed=0):
+    """
+    点数超过 limit 时按 (x, y) 二维网格分层抽样到至多 limit 个点
+
+    每个非空网格保留一个点，剩余名额按点数比例分配，稀疏区域和离群点不会被丢弃。
+    返回 (抽样后的数据, 原点数)
+    """
+    total = len(df)
+    if total <= limit:
+        return df, total
+
+    cells = grid_cells(df, x, y)
+    counts = np.bincount(cells, minlength=GRID_BINS * GRID_BINS)
+    occupied = np.count_nonzero(counts)
+    # 每个网格先保留一个点，剩余名额按点数比例分配
+    ratio = max(limit - occupied, 0) / total
+    quota = np.minimum(np.floor(counts * ratio).astype(np.int64) + 1, counts)
+
+    # 网格内按随机键排序，保留前 quota 个点（固定种子，同一数据结果稳定）
+    keys = np.random.default_rng(seed).random(total)
+    order = np.lexsort((keys, cells))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.arange(total, dtype=np.int64) - starts[cells[order]]
+    keep = np.zeros(total, dtype=bool)
+    keep[order[rank < quota[cells[order]]]] = True
+    return df.iloc[np.flatnonzero(keep)], total
+
+
+def item_count(df, category_col):
+    """top_categories 结果中的实际类别数，不计合并的“其他（N项）”行"""
+    is_other = df[category_col].astype(str).str.startswith(f"{OTHER_LABEL}（")
+    return len(df) - int(is_other.sum())
+
+
+def limited_title(title, shown, total, unit):
+    """数据经过精简时在标题中注明显示数量（shown 为实际显示的项数，不含“其他”行）"""
+    if shown >= total:
+        return title
+    return f"{title}（显示 {shown:,} / {total:,} {unit}）"
+
+
+def scatter_render_mode(points):
+    """点数较多的散点图使用 WebGL 渲染"""
+    return 'webgl' if points > WEBGL_POINTS else 'svg'
@@ -0,0 +1,87 @@
+"""
+侧边栏筛选索引
+
+加载数据时对所属区域、客户简称、产品代码、申请人做一次字典编码，并为每个取值保存
+行号倒排列表。筛选时按整数编码查表得到行掩码，各维度间按位与组合，
+不再对字符串列反复哈希，也无需复制整个数据框。
+"""
+import numpy as np
+import pandas as pd
+
+FILTER_COLUMNS = ['所属区域', '客户简称', '产品代码', '申请人']
+
+# 选中的行数低于总行数的该比例时，直接用倒排列表置位，否则按编码查表
+SPARSE_RATIO = 1 / 8
+
+
+class FilterIndex:
+    """维度列的字典编码与按取值的行号倒排列表"""
+
+    def __init__(self, df, columns=FILTER_COLUMNS):
+        self.size = len(df)
+        self.categories = {}
+        self.codes = {}
+        self._offsets = {}
+        self._positions = {}
+
+        for col in columns:
+            if col not in df.columns:
+                continue
+            codes, uniques = pd.factorize(df[col], sort=True, use_na_sentinel=False)
+            codes = codes.astype(np.int32)
+            self.categories[col] = pd.Index(uniques)
+            self.codes[col] = codes
+            # 按编码稳定排序后的行号即为各取值的倒排列表，offsets 记录每个取值的起止位置
+            self._positions[col] = np.argsort(codes, kind='stable').astype(np.int32)
+            self._offsets[col] = np.concatenate(
+                [[0], np.cumsum(np.bincount(codes, minlength=len(uniques)))]
+            )
+
+    def values(self, column):
+        """某一维度的全部取值（已排序）"""
+        return self.categories[column]
+
+    def _selected(self, column, values):
+        """values 中存在的取值编码及其覆盖的行数"""
+        selected = self.categories[column].get_indexer(pd.Index(list(values)).unique())
+        selected = selected[selected >= 0]
+        offsets = self._offsets[column]
+        return selected, int((offsets[selected + 1] - offsets[selected]).sum())
+
+    def value_mask(self, column, values):
+        """取值属于 values 的行掩码"""
+        mask = np.zeros(self.size, dtype=bool)
+        selected, selected_rows = self._selected(column, values)
+        if len(selected) == 0:
+            return mask
+
+        offsets = self._offsets[column]
+        if selected_rows < self.size * SPARSE_RATIO:
+            positions = self._positions[column]
+            for code in selected:
+                mask[positions[offsets[code]:offsets[code + 1]]] = True
+        else:
+            lookup = np.zeros(len(self.categories[column]), dtype=bool)
+            lookup[selected] = True
+            mask = lookup[self.codes[column]]
+        return mask
+
+    def mask(self, selections):
+        """
+        按 {列名: 选中取值} 计算行掩码，未选择或选中全部取值的维度不做限制；
+        没有任何限制时返回 None（调用方可直接使用原数据，不做复制）
+        """
+        mask = None
+        for column, values in selections.items():
+            if not values or self._selected(column, values)[1] == self.size:
+                continue
+            column_mask = self.value_mask(column, values)
+            mask = column_mask if mask is None else mask & column_mask
+        return mask
+
+    @staticmethod
+    def take(df, mask):
+        """按行掩码取出数据，没有筛选时直接返回原数据框，不做复制"""
+        if mask is None:
+            return df
+        return df.iloc[np.flatnonzero(mask)]
@@ -0,0 +1,196 @@
+"""
+销售数据导入
+
+read_sales_file 一次性读取整个工作簿；iter_sales_chunks 以流式方式
+（openpyxl 只读模式逐行读取，或CSV分块读取）按块校验必要列、计算派生列，
+配合 data_cache.load_cached_stream 逐块写入列式缓存，峰值内存与文件大小无关。
+工作簿中所有包含必要列的工作表都会导入，其他工作表（如说明、汇总页）跳过。
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+from product_utils import add_product_columns
+
+REQUIRED_COLUMNS = ['客户简称', '所属区域', '发运月份', '申请人', '产品代码', '产品名称',
+                    '订单类型', '单价（箱）', '数量（箱）']
+STRING_COLUMNS = ['客户简称', '所属区域', '申请人', '产品代码', '产品名称', '订单类型']
+
+# 流式导入每块的行数
+DEFAULT_CHUNK_ROWS = 50000
+# 超过该大小的工作簿自动使用流式导入，CSV文件始终流式导入
+STREAMING_THRESHOLD_BYTES = int(float(os.environ.get('SALES_STREAMING_THRESHOLD_MB', 20)) * 1024 * 1024)
+
+
+class MissingColumnsError(ValueError):
+    """源文件缺少必要的列"""
+
+    def __init__(self, missing_columns):
+        super().__init__(', '.join(missing_columns))
+        self.missing_columns = missing_columns
+
+
+def validate_columns(columns):
+    """检查必要列是否齐全，缺失时抛出 MissingColumnsError"""
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        raise MissingColumnsError(missing_columns)
+
+
+def prepare_sales_frame(df, warn=print):
+    """计算派生列（销售额、简化产品名称、包装类型）并规范列类型"""
+    # 计算销售额
+    df['销售额'] = df['单价（箱）'] * df['数量（箱）']
+
+    # 确保发运月份是日期类型
+    try:
+        df['发运月份'] = pd.to_datetime(df['发运月份'])
+    except Exception as e:
+        warn(f"转换日期格式时出错: {str(e)}。月份分析功能可能受影响。")
+
+    # 确保所有的字符串列都是字符串类型
+    for col in STRING_COLUMNS:
+        df[col] = df[col].astype(str)
+
+    # 添加简化产品名称和包装类型列（按唯一产品计算后广播）
+    add_product_columns(df)
+
+    return df
+
+
+def read_sales_file(file_path, warn=print):
+    """一次性解析Excel文件中包含必要列的全部工作表并计算派生列"""
+    sheets = pd.read_excel(file_path, sheet_name=None)
+    frames = [df for df in sheets.values() if all(col in df.columns for col in REQUIRED_COLUMNS)]
+    if not frames:
+        # 确保所有必要的列都存在（按第一个工作表报告缺少的列）
+        validate_columns(next(iter(sheets.values())).columns if sheets else [])
+    df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    return prepare_sales_frame(df, warn)
+
+
+# ==== 流式导入 ====
+def is_csv(file_path):
+    return str(file_path).lower().endswith('.csv')
+
+
+def should_stream(file_path, threshold_bytes=STREAMING_THRESHOLD_BYTES):
+    """CSV文件或超过大小阈值的工作簿使用流式导入"""
+    return is_csv(file_path) or os.path.getsize(file_path) > threshold_bytes
+
+
+def _sheet_header(sheet):
+    return [str(cell) if cell is not None else '' for cell in next(sheet.iter_rows(max_row=1, values_only=True), ())]
+
+
+def sales_sheets(file_path):
+    """
+    文件中包含必要列的工作表名称；CSV文件返回 [None]。
+    没有任何工作表包含必要列时按第一个工作表抛出 MissingColumnsError
+    """
+    if is_csv(file_path):
+        return [None]
+    import openpyxl
+
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        headers = {sheet.title: _sheet_header(sheet) for sheet in workbook.worksheets}
+    finally:
+        workbook.close()
+    names = [name for name, header in headers.items() if all(col in header for col in REQUIRED_COLUMNS)]
+    if not names:
+        validate_columns(next(iter(headers.values()), []))
+    return names
+
+
+def _iter_excel_frames(file_path, chunk_rows, progress, sheet_name=None):
+    """
+    以 openpyxl 只读模式逐行读取工作表（sheet_name 为 None 时依次读取所有包含必要列的工作表），
+    每 chunk_rows 行产出一个只含必要列的DataFrame
+    """
+    import openpyxl
+
+    sheet_names = [sheet_name] if sheet_name is not None else sales_sheets(file_path)
+    workbook = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        sheets = [workbook[name] for name in sheet_names]
+        total_rows = sum(sheet.max_row - 1 for sheet in sheets) if all(sheet.max_row for sheet in sheets) \
+            else None
+        rows_read = 0
+        for sheet in sheets:
+            rows = sheet.iter_rows(values_only=True)
+            header = [str(cell) if cell is not None else '' for cell in next(rows, ())]
+            validate_columns(header)
+
+            positions = [header.index(col) for col in REQUIRED_COLUMNS]
+            buffer = []
+            for row in rows:
+                values = [row[i] if i < len(row) else None for i in positions]
+                if all(value is None for value in values):
+                    continue  # 跳过空行
+                buffer.append(values)
+                if len(buffer) >= chunk_rows:
+                    rows_read += len(buffer)
+                    yield pd.DataFrame(buffer, columns=REQUIRED_COLUMNS)
+                    buffer = []
+                    if progress:
+                        progress(rows_read, total_rows)
+
+            if buffer:
+                rows_read += len(buffer)
+                yield pd.DataFrame(buffer, columns=REQUIRED_COLUMNS)
+        if progress:
+            progress(rows_read, rows_read)
+    finally:
+        workbook.close()
+
+
+def _iter_csv_frames(file_path, chunk_rows, progress, encoding='utf-8-sig'):
+    """分块读取CSV文件中的必要列"""
+    header = pd.read_csv(file_path, nrows=0, encoding=encoding).columns
+    validate_columns(header)
+
+    rows_read = 0
+    reader = pd.read_csv(file_path, usecols=REQUIRED_COLUMNS, dtype={col: str for col in STRING_COLUMNS},
+                         chunksize=chunk_rows, encoding=encoding)
+    for chunk in reader:
+        rows_read += len(chunk)
+        yield chunk.reindex(columns=REQUIRED_COLUMNS)
+        if progress:
+            progress(rows_read, None)
+    if progress:
+        progress(rows_read, rows_read)
+
+
+def _normalize_chunk(chunk, warn):
+    """统一各块的列类型，保证所有块写入同一列式结构"""
+    chunk['单价（箱）'] = pd.to_numeric(chunk['单价（箱）'], errors='coerce').astype('float64')
+    chunk['数量（箱）'] = pd.to_numeric(chunk['数量（箱）'], errors='coerce').astype('Int64')
+
+    months = pd.to_datetime(chunk['发运月份'], errors='coerce')
+    invalid = months.isna() & chunk['发运月份'].notna()
+    if invalid.any():
+        warn(f"有 {int(invalid.sum())} 行发运月份无法解析为日期，已置为空值。")
+    chunk['发运月份'] = months.astype('datetime64[ns]')
+    return chunk
+
+
+def iter_sales_chunks(file_path, chunk_rows=DEFAULT_CHUNK_ROWS, progress=None, warn=print, sheet_name=None):
+    """
+    流式读取销售数据，逐块产出已计算派生列的DataFrame
+
+    progress(已读取行数, 总行数或None) 在每块读取后调用；sheet_name 指定只读取一个工作表
+    """
+    frames = _iter_csv_frames(file_path, chunk_rows, progress) if is_csv(file_path) \
+        else _iter_excel_frames(file_path, chunk_rows, progress, sheet_name)
+
+    for chunk in frames:
+        chunk = _normalize_chunk(chunk, warn)
+        chunk['销售额'] = chunk['单价（箱）'] * chunk['数量（箱）'].astype('float64')
+        for col in STRING_COLUMNS:
+            # 空单元格按整表读取时的方式统一转换为 'nan'
+            chunk[col] = chunk[col].fillna(np.nan).astype(str)
+        add_product_columns(chunk)
+        yield chunk
@@ -0,0 +1,78 @@
+"""
+导入工作进程入口
+
+parallel_ingest 以 `python -m ingest_worker` 启动独立的解释器作为工作进程，而不是从
+Streamlit 服务进程 fork：多线程进程 fork 后子进程可能继承处于持有状态的锁。
+也不经过 multiprocessing 的 spawn/forkserver，它们会在子进程中按 __main__.__file__
+重新执行主模块，而 Streamlit 把仪表盘脚本注册为 __main__。
+
+工作进程从标准输入逐个读取 pickle 序列化的 (函数, 参数元组)，执行 func(*args, warn=...)，
+将 (结果, 异常, 警告列表, 耗时) 写回标准输出，直到标准输入关闭。任务中的 print 输出到标准错误，
+不会混入结果。
+"""
+import os
+import pickle
+import struct
+import sys
+import time
+
+_HEADER = struct.Struct('>Q')
+
+
+def send(stream, value):
+    """写入一条带长度前缀的 pickle 消息"""
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    stream.write(_HEADER.pack(len(data)))
+    stream.write(data)
+    stream.flush()
+
+
+def receive(stream):
+    """读取一条消息，对端已关闭时抛出 EOFError"""
+    header = stream.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise EOFError("工作进程已退出")
+    size, = _HEADER.unpack(header)
+    data = stream.read(size)
+    if len(data) < size:
+        raise EOFError("工作进程已退出")
+    return pickle.loads(data)
+
+
+def run_task(func, args):
+    """执行 func(*args, warn=...)，返回 (结果, 异常, 警告列表, 耗时)"""
+    warnings = []
+    start = time.perf_counter()
+    try:
+        result, error = func(*args, warn=warnings.append), None
+    except Exception as e:
+        result, error = None, e
+    return result, error, warnings, time.perf_counter() - start
+
+
+def _outcome_message(outcome):
+    """异常无法序列化或反序列化（如构造函数需要额外参数）时改为携带相同信息的 RuntimeError"""
+    result, error, warnings, seconds = outcome
+    try:
+        pickle.loads(pickle.dumps(error))
+    except Exception:
+        error = RuntimeError(f"{type(error).__name__}: {error}")
+    return result, error, warnings, seconds
+
+
+def main():
+    requests = sys.stdin.buffer
+    # 协议独占原标准输出，任务中的输出（含扩展模块直接写入的）改写到标准错误
+    responses = os.fdopen(os.dup(1), 'wb')
+    os.dup2(2, 1)
+    sys.stdout = sys.stderr
+    while True:
+        try:
+            func, args = receive(requests)
+        except EOFError:
+            break
+        send(responses, _outcome_message(run_task(func, args)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,161 @@
+"""
+多文件并行导入
+
+openpyxl 解析工作簿只能使用单核，多个工作簿（或一个工作簿的多个工作表）按文件/工作表
+拆分为独立任务，在多个工作进程中并行解析、计算派生列并压缩列类型，再在主进程合并为一个
+紧凑DataFrame，同时记录每个任务的行数和耗时。源文件总大小低于 PARALLEL_MIN_BYTES 时串行导入。
+
+工作进程是以 ingest_worker 为入口的独立解释器（不从多线程的服务进程 fork，也不重新执行仪表盘脚本）。
+任务函数和参数须可序列化（模块级函数）；任务中的警告先收集，回到主进程后再通过 warn 输出。
+"""
+import os
+import queue
+import subprocess
+import sys
+import threading
+
+import pandas as pd
+
+from ingest import iter_sales_chunks, sales_sheets
+from ingest_worker import receive, run_task, send
+from schema import compact_frame, concat_compact
+
+# 并行导入的进程数，可通过环境变量配置，默认使用全部CPU核心
+INGEST_WORKERS = int(os.environ.get('SALES_INGEST_WORKERS', os.cpu_count() or 1))
+# 源文件总大小低于该值时串行导入：启动工作进程（导入 pandas 等）的开销超过并行解析节省的时间
+PARALLEL_MIN_BYTES = int(float(os.environ.get('SALES_PARALLEL_INGEST_MB', 8)) * 1024 * 1024)
+
+_PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def parallel_workers(file_paths, max_workers=INGEST_WORKERS, min_bytes=PARALLEL_MIN_BYTES):
+    """按源文件总大小决定导入的进程数：低于 min_bytes 时为 1（串行）"""
+    total = sum(os.path.getsize(path) for path in set(file_paths) if os.path.exists(path))
+    return 1 if total < min_bytes else max(max_workers or 1, 1)
+
+
+def _start_worker():
+    """启动一个独立解释器运行 ingest_worker（见该模块说明），可导入本目录下的模块"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join([_PACKAGE_DIR] + [p for p in sys.path if p])
+    return subprocess.Popen([sys.executable, '-m', 'ingest_worker'], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, env=env, cwd=os.getcwd())
+
+
+def _serve(func, pending, results):
+    """
+    工作线程：独占一个工作进程，依次取出任务交给它执行。工作进程异常退出、任务参数或结果
+    无法序列化等任何错误都记为该任务的错误并重新启动工作进程，每个任务都会产出一条结果
+    """
+    worker = None
+    try:
+        while True:
+            try:
+                task = pending.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                if worker is None:
+                    worker = _start_worker()
+                send(worker.stdin, (func, task))
+                outcome = receive(worker.stdout)
+            except Exception as e:
+                if worker is not None:
+                    worker.kill()
+                    worker.wait()
+                    worker = None
+                if isinstance(e, (EOFError, OSError)):
+                    error = RuntimeError(f"导入工作进程异常退出: {e}")
+                else:
+                    error = RuntimeError(f"导入任务无法在工作进程中执行: {type(e).__name__}: {e}")
+                outcome = (None, error, [], 0.0)
+            results.put((task,) + tuple(outcome))
+    finally:
+        if worker is not None:
+            worker.stdin.close()
+            worker.wait()
+
+
+def run_tasks(func, tasks, max_workers=INGEST_WORKERS, progress=None):
+    """
+    对每个参数元组执行 func(*task, warn=...)，按完成顺序产出 (task, 结果, 异常, 警告列表, 耗时)
+
+    只有一个任务或 max_workers 为 1 时在当前进程中依次执行，否则启动至多 max_workers 个
+    工作进程（每个由一个线程驱动，逐个领取任务）。func 和任务参数须可序列化（模块级函数）。
+    progress(已完成任务数, 任务总数) 在每个任务完成后调用
+    """
+    tasks = list(tasks)
+    workers = max(1, min(max_workers or 1, len(tasks)))
+    if workers == 1:
+        for done, task in enumerate(tasks, 1):
+            outcome = run_task(func, task)
+            if progress:
+                progress(done, len(tasks))
+            yield (task,) + outcome
+        return
+
+    pending, results = queue.Queue(), queue.Queue()
+    for task in tasks:
+        pending.put(task)
+    threads = [threading.Thread(target=_serve, args=(func, pending, results), daemon=True) for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    try:
+        for done in range(1, len(tasks) + 1):
+            outcome = results.get()
+            if progress:
+                progress(done, len(tasks))
+            yield outcome
+    finally:
+        # 提前结束迭代时丢弃尚未开始的任务，等待各工作进程退出
+        while True:
+            try:
+                pending.get_nowait()
+            except queue.Empty:
+                break
+        for thread in threads:
+            thread.join()
+
+
+def read_sheet(file_path, sheet_name=None, warn=print):
+    """读取一个工作表（CSV文件为整个文件），返回计算派生列并压缩列类型后的DataFrame"""
+    chunks = [compact_frame(chunk) for chunk in iter_sales_chunks(file_path, warn=warn, sheet_name=sheet_name)]
+    return concat_compact(chunks)
+
+
+def load_files(file_paths, max_workers=INGEST_WORKERS, progress=None, warn=print):
+    """
+    并行读取多个文件中包含必要列的全部工作表并合并，返回 (紧凑DataFrame, 各任务耗时表)
+
+    单个文件或工作表导入失败时通过 warn 提示并跳过，耗时表中记录错误信息
+    """
+    tasks = []
+    for path in file_paths:
+        try:
+            tasks.extend((path, sheet) for sheet in sales_sheets(path))
+        except Exception as e:
+            warn(f"读取文件 {os.path.basename(path)} 失败: {str(e)}")
+
+    frames = {}
+    timings = {}
+    workers = parallel_workers([path for path, _ in tasks], max_workers)
+    for task, frame, error, warnings, seconds in run_tasks(read_sheet, tasks, workers, progress):
+        path, sheet = task
+        for message in warnings:
+            warn(f"{os.path.basename(path)}: {message}")
+        if error is not None:
+            warn(f"导入文件 {os.path.basename(path)} 失败: {str(error)}")
+        else:
+            frames[task] = frame
+        timings[task] = {
+            '文件': os.path.basename(path),
+            '工作表': sheet or '',
+            '行数': 0 if frame is None else len(frame),
+            '耗时(秒)': round(seconds, 3),
+            '错误': '' if error is None else str(error),
+        }
+
+    # 按任务顺序合并，结果与完成顺序无关
+    df = concat_compact([frames[task] for task in tasks if task in frames])
+    return df, pd.DataFrame([timings[task] for task in tasks if task in timings],
+                            columns=['文件', '工作表', '行数', '耗时(秒)', '错误'])
@@ -0,0 +1,121 @@
+"""
+新品目录
+
+新品及其上市月份登记在目录文件中（CSV，列为 产品代码、上市月份、新品期（月）），
+按文件修改时间缓存，只加载一次。导入数据时按产品代码和发运月份连接目录，预先计算
+“是否新品”布尔列，各处判断新品只需读取该列，不必对产品代码字符串反复 isin。
+
+产品只在 [上市月份, 上市月份 + 新品期) 内的发运记录计为新品，滚动的上市日历中同一产品
+会随发运月份由新品转为老品。上市月份为空表示始终为新品，新品期为空时使用默认新品期；
+发运月份为空的记录只按是否登记在目录中判断。
+"""
+import hashlib
+import os
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from time_index import MONTH_COLUMN, NAT_ORDINAL, month_ordinals
+
+# 新品目录文件，可通过环境变量配置
+CATALOG_PATH = os.environ.get('SALES_PRODUCT_CATALOG',
+                              os.path.join(os.path.dirname(os.path.abspath(__file__)), 'new_products.csv'))
+# 未填写新品期时产品自上市月份起计为新品的月数，可通过环境变量配置
+DEFAULT_NEW_MONTHS = int(os.environ.get('SALES_NEW_PRODUCT_MONTHS', 12))
+
+# 目录文件不存在时使用的新品产品代码（始终为新品）
+DEFAULT_NEW_PRODUCTS = ['F0110C', 'F0183F', 'F01K8A', 'F0183K', 'F0101P']
+
+NEW_FLAG = '是否新品'
+CODE_COLUMN = '产品代码'
+LAUNCH_COLUMN = '上市月份'
+PERIOD_COLUMN = '新品期（月）'
+
+_NO_END = np.iinfo(np.int64).max
+
+
+class ProductCatalog:
+    """新品目录：各产品代码的上市月份和新品期"""
+
+    def __init__(self, table):
+        table = table.drop_duplicates(CODE_COLUMN, keep='last').reset_index(drop=True)
+        self.table = table
+        self.codes = table[CODE_COLUMN].tolist()
+        self._index = pd.Index(self.codes)
+
+        # 各产品计为新品的月度序号区间 [起始, 结束)，未填写上市月份时不限
+        launch = month_ordinals(table[LAUNCH_COLUMN])
+        unbounded = launch == NAT_ORDINAL
+        months = table[PERIOD_COLUMN].to_numpy(dtype='int64')
+        self._start = launch
+        self._end = np.where(unbounded, _NO_END, launch + months)
+
+        # 目录内容的指纹，用作缓存键的一部分
+        digest = hashlib.sha1(table.to_csv(index=False).encode('utf-8'))
+        self.version = digest.hexdigest()[:16]
+
+    def flags(self, df):
+        """每行是否为新品（布尔数组），由产品代码和发运月份决定；没有产品代码列时（如没有导入任何文件）全部为老品"""
+        if CODE_COLUMN not in df.columns:
+            return np.zeros(len(df), dtype=bool)
+        codes = df[CODE_COLUMN]
+        if isinstance(codes.dtype, pd.CategoricalDtype):
+            row_codes, uniques = codes.cat.codes.to_numpy(), codes.cat.categories
+        else:
+            row_codes, uniques = pd.factorize(codes)
+        # 先在各不同代码上查找目录位置，再按行展开（缺失代码的编号 -1 对应末尾的 -1）
+        positions = np.append(self._index.get_indexer(uniques.astype(str)), -1)[row_codes]
+        listed = positions >= 0
+        if MONTH_COLUMN not in df.columns or not listed.any():
+            # 空目录或没有登记的产品时全部为老品（此时不能按位置 -1 取区间）
+            return listed
+
+        months = month_ordinals(df[MONTH_COLUMN])
+        start, end = self._start[positions], self._end[positions]
+        in_window = (months >= start) & (months < end)
+        return listed & (in_window | (months == NAT_ORDINAL))
+
+    def annotate(self, df):
+        """返回增加“是否新品”列的新DataFrame（列共享数据，不复制）"""
+        return df.assign(**{NEW_FLAG: self.flags(df)})
+
+
+@lru_cache(maxsize=1)
+def _default_catalog():
+    """目录文件不存在时的默认目录：DEFAULT_NEW_PRODUCTS 始终为新品"""
+    return ProductCatalog(pd.DataFrame({
+        CODE_COLUMN: DEFAULT_NEW_PRODUCTS,
+        LAUNCH_COLUMN: pd.PeriodIndex([None] * len(DEFAULT_NEW_PRODUCTS), freq='M'),
+        PERIOD_COLUMN: DEFAULT_NEW_MONTHS,
+    }))
+
+
+@lru_cache(maxsize=4)
+def _read_catalog(path, mtime):
+    """读取目录文件（mtime 仅用于在文件变化后使缓存失效）"""
+    table = pd.read_csv(path, dtype=str, keep_default_na=False)
+    if CODE_COLUMN not in table.columns:
+        raise ValueError(f"新品目录 {path} 缺少必要的列: {CODE_COLUMN}")
+    table[CODE_COLUMN] = table[CODE_COLUMN].str.strip()
+    table = table[table[CODE_COLUMN] != '']
+
+    launch = table.get(LAUNCH_COLUMN, pd.Series('', index=table.index)).str.strip()
+    months = pd.to_datetime(launch.where(launch != ''), errors='coerce')
+    invalid = launch[(launch != '') & months.isna()]
+    if len(invalid):
+        raise ValueError(f"新品目录 {path} 中无法解析的上市月份: {', '.join(invalid.unique()[:5])}")
+
+    period = pd.to_numeric(table.get(PERIOD_COLUMN, pd.Series('', index=table.index)).str.strip(), errors='coerce')
+    return ProductCatalog(pd.DataFrame({
+        CODE_COLUMN: table[CODE_COLUMN].to_numpy(),
+        LAUNCH_COLUMN: months.dt.to_period('M').array,
+        PERIOD_COLUMN: period.fillna(DEFAULT_NEW_MONTHS).astype('int64').to_numpy(),
+    }))
+
+
+def load_catalog(path=CATALOG_PATH):
+    """加载新品目录，文件不存在时使用默认新品列表；文件未变化时返回同一对象"""
+    if not path or not os.path.exists(path):
+        return _default_catalog()
+    return _read_catalog(os.path.abspath(path), os.path.getmtime(path))
@@ -0,0 +1,213 @@
+"""
+产品名称相关的派生列计算
+
+extract_packaging / get_simplified_product_name 为逐行计算的参考实现；
+add_product_columns 只在唯一的（产品代码, 产品名称）组合上用向量化字符串操作计算，
+再按分类编码广播回所有行，结果与逐行实现完全一致。
+"""
+import re
+
+import numpy as np
+import pandas as pd
+
+
+# ==== 逐行参考实现 ====
+def extract_packaging(product_name):
+    """从产品名称中提取包装类型"""
+    try:
+        # 确保输入是字符串
+        if not isinstance(product_name, str):
+            return "其他"
+
+        # 检查组合类型（优先级最高）
+        if re.search(r'分享装袋装', product_name):
+            return '分享装袋装'
+        elif re.search(r'分享装盒装', product_name):
+            return '分享装盒装'
+
+        # 按包装大小分类（从大到小）
+        elif re.search(r'随手包', product_name):
+            return '随手包'
+        elif re.search(r'迷你包', product_name):
+            return '迷你包'
+        elif re.search(r'分享装', product_name):
+            return '分享装'
+
+        # 按包装形式分类
+        elif re.search(r'袋装', product_name):
+            return '袋装'
+        elif re.search(r'盒装', product_name):
+            return '盒装'
+        elif re.search(r'瓶装', product_name):
+            return '瓶装'
+
+        # 处理特殊规格
+        kg_match = re.search(r'(\d+(?:\.\d+)?)\s*KG', product_name, re.IGNORECASE)
+        if kg_match:
+            weight = float(kg_match.group(1))
+            if weight >= 1.5:
+                return '大包装'
+            return '散装'
+
+        g_match = re.search(r'(\d+(?:\.\d+)?)\s*G', product_name)
+        if g_match:
+            weight = float(g_match.group(1))
+            if weight <= 50:
+                return '小包装'
+            elif weight <= 100:
+                return '中包装'
+            else:
+                return '大包装'
+
+        # 默认分类
+        return '其他'
+    except Exception as e:
+        print(f"提取包装类型时出错: {str(e)}, 产品名称: {product_name}")
+        return '其他'  # 捕获任何异常并返回默认值
+
+
+# 创建产品代码到简化产品名称的映射函数
+def get_simplified_product_name(product_code, product_name):
+    """从产品名称中提取简化产品名称"""
+    try:
+        # 确保输入是字符串类型
+        if not isinstance(product_name, str):
+            return str(product_code)  # 返回产品代码作为备选
+
+        if '口力' in product_name:
+            # 提取"口力"之后的产品类型
+            name_parts = product_name.split('口力')
+            if len(name_parts) > 1:
+                name_part = name_parts[1]
+                if '-' in name_part:
+                    name_part = name_part.split('-')[0].strip()
+
+                # 进一步简化，只保留主要部分（去掉规格和包装形式）
+                for suffix in ['G分享装袋装', 'G盒装', 'G袋装', 'KG迷你包', 'KG随手包']:
+                    if suffix in name_part:
+                        name_part = name_part.split(suffix)[0]
+                        break
+
+                # 去掉可能的数字和单位
+                simple_name = re.sub(r'\d+\w*\s*', '', name_part).strip()
+
+                if simple_name:  # 确保简化名称不为空
+                    return f"{simple_name} ({product_code})"
+
+        # 如果无法提取或处理中出现错误，则返回产品代码
+        return str(product_code)
+    except Exception as e:
+        # 捕获任何异常，确保函数始终返回一个字符串
+        print(f"简化产品名称时出错: {e}，产品代码: {product_code}")
+        return str(product_code)
+
+
+# ==== 向量化实现 ====
+# 包装关键字，按优先级排列
+PACKAGING_KEYWORDS = ['分享装袋装', '分享装盒装', '随手包', '迷你包', '分享装', '袋装', '盒装', '瓶装']
+NAME_SUFFIXES = ['G分享装袋装', 'G盒装', 'G袋装', 'KG迷你包', 'KG随手包']
+
+KG_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*KG', re.IGNORECASE)
+G_PATTERN = re.compile(r'(\d+(?:\.\d+)?)\s*G')
+DIGIT_UNIT_PATTERN = re.compile(r'\d+\w*\s*')
+
+
+def _string_mask(values):
+    """标记哪些唯一值是字符串"""
+    return np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+
+
+def packaging_types(unique_names):
+    """对唯一产品名称批量计算包装类型，与 extract_packaging 逐个调用的结果一致"""
+    result = np.full(len(unique_names), '其他', dtype=object)
+    is_str = _string_mask(unique_names)
+    names = pd.Series(np.asarray(unique_names, dtype=object)[is_str], dtype=object)
+    if names.empty:
+        return result
+
+    packaging = pd.Series(None, index=names.index, dtype=object)
+
+    # 关键字按优先级依次匹配，已命中的名称不再参与后续匹配
+    for keyword in PACKAGING_KEYWORDS:
+        pending = packaging.isna()
+        if not pending.any():
+            break
+        hit = pending & names.str.contains(keyword, regex=False)
+        packaging[hit] = keyword
+
+    # 按KG规格分类
+    pending = packaging.isna()
+    kg_weight = names[pending].str.extract(KG_PATTERN, expand=False).astype(float)
+    kg_weight = kg_weight.dropna()
+    packaging[kg_weight.index] = np.where(kg_weight >= 1.5, '大包装', '散装')
+
+    # 按G规格分类
+    pending = packaging.isna()
+    g_weight = names[pending].str.extract(G_PATTERN, expand=False).astype(float)
+    g_weight = g_weight.dropna()
+    packaging[g_weight.index] = np.select(
+        [g_weight <= 50, g_weight <= 100], ['小包装', '中包装'], default='大包装'
+    )
+
+    result[is_str] = packaging.fillna('其他').to_numpy()
+    return result
+
+
+def simplified_product_names(unique_codes, unique_names):
+    """对唯一的（产品代码, 产品名称）组合批量计算简化名称，与 get_simplified_product_name 结果一致"""
+    code_str = np.array([str(code) for code in unique_codes], dtype=object)
+    result = code_str.copy()
+
+    is_str = _string_mask(unique_names)
+    names = pd.Series(np.asarray(unique_names, dtype=object)[is_str], dtype=object)
+    if names.empty:
+        return result
+
+    has_brand = names.str.contains('口力', regex=False)
+    # 取第一个与第二个"口力"之间的部分
+    name_part = names.str.partition('口力')[2].str.partition('口力')[0]
+
+    has_dash = name_part.str.contains('-', regex=False)
+    name_part = name_part.where(~has_dash, name_part.str.partition('-')[0].str.strip())
+
+    # 去掉规格和包装形式，只按第一个命中的后缀截断
+    matched = pd.Series(False, index=names.index)
+    for suffix in NAME_SUFFIXES:
+        hit = ~matched & name_part.str.contains(suffix, regex=False)
+        name_part = name_part.where(~hit, name_part.str.partition(suffix)[0])
+        matched |= hit
+
+    simple_name = name_part.str.replace(DIGIT_UNIT_PATTERN, '', regex=True).str.strip()
+
+    valid = (has_brand & (simple_name != '')).to_numpy()
+    str_codes = code_str[is_str]
+    simplified = np.where(valid, simple_name.to_numpy(dtype=object) + ' (' + str_codes + ')', str_codes)
+    result[is_str] = simplified
+    return result
+
+
+def add_product_columns(df):
+    """
+    为销售数据添加简化产品名称和包装类型列
+
+    先将（产品代码, 产品名称）分解为整数编码，只对唯一值计算，再广播回所有行，
+    计算量与唯一产品数成正比而非与订单行数成正比
+    """
+    if df.empty:
+        df['简化产品名称'] = pd.Series(dtype=object)
+        df['包装类型'] = pd.Series(dtype=object)
+        return df
+
+    code_ids, code_uniques = pd.factorize(df['产品代码'], use_na_sentinel=False)
+    name_ids, name_uniques = pd.factorize(df['产品名称'], use_na_sentinel=False)
+
+    # 组合编码后再分解，得到唯一的（产品代码, 产品名称）组合
+    pair_ids, pair_uniques = pd.factorize(
+        code_ids.astype(np.int64) * len(name_uniques) + name_ids, use_na_sentinel=False
+    )
+    pair_codes = np.asarray(code_uniques, dtype=object)[pair_uniques // len(name_uniques)]
+    pair_names = np.asarray(name_uniques, dtype=object)[pair_uniques % len(name_uniques)]
+
+    df['简化产品名称'] = simplified_product_names(pair_codes, pair_names)[pair_ids]
+    df['包装类型'] = packaging_types(name_uniques)[name_ids]
+    return df
@@ -0,0 +1,165 @@
+"""
+运行耗时分析
+
+每次页面重新运行记录为一次 run，其中各阶段（数据加载、筛选、各分析计算、图表渲染等）
+记录耗时、输入输出行数和进程内存变化。通过 stage 上下文管理器或 profiled 装饰器埋点，
+当前线程没有进行中的 run 时埋点不做任何记录。最近若干次 run 保留在内存中供管理员面板展示，
+配置日志路径时每次 run 追加一行JSON到日志文件。
+"""
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from functools import wraps
+
+import pandas as pd
+
+# 耗时日志（JSON lines），可通过环境变量配置，未配置时不写日志
+PROFILE_LOG_PATH = os.environ.get('SALES_PROFILE_LOG')
+
+# Streamlit 的每个会话在各自的线程中运行脚本，当前 run 按线程记录
+_local = threading.local()
+_log_lock = threading.Lock()
+
+
+def _rss_bytes():
+    """当前进程的常驻内存（字节），无法获取时返回 None"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def row_count(value):
+    """DataFrame、Series 等对象的行数，其他对象返回 None"""
+    if isinstance(value, (pd.DataFrame, pd.Series, pd.Index)):
+        return len(value)
+    if isinstance(value, tuple) and value and isinstance(value[0], (pd.DataFrame, pd.Series)):
+        return len(value[0])
+    if isinstance(getattr(value, 'rows', None), pd.DataFrame):
+        return len(value.rows)  # SalesDataset / FilteredSales
+    return None
+
+
+class Profiler:
+    """记录每次运行各阶段的耗时、行数和内存变化，保留最近 history 次运行"""
+
+    def __init__(self, history=20, log_path=PROFILE_LOG_PATH):
+        self.history = deque(maxlen=history)
+        self.log_path = log_path
+        self._run = None
+        self._depth = 0
+
+    def start_run(self, label=None):
+        """开始新的一次运行（未结束的上一次运行直接丢弃），并设为当前线程的分析器"""
+        self._run = {
+            'started_at': datetime.now().isoformat(timespec='seconds'),
+            'label': label,
+            'stages': [],
+            '_start': time.perf_counter(),
+        }
+        self._depth = 0
+        _local.profiler = self
+
+    def finish_run(self):
+        """结束当前运行，加入历史记录并写入日志，返回该次运行的记录"""
+        run, self._run = self._run, None
+        if getattr(_local, 'profiler', None) is self:
+            _local.profiler = None
+        if run is None:
+            return None
+
+        run['total_seconds'] = round(time.perf_counter() - run.pop('_start'), 6)
+        self.history.append(run)
+        if self.log_path:
+            with _log_lock, open(self.log_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(run, ensure_ascii=False) + '\n')
+        return run
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """
+        记录一个阶段；可在 with 块内设置 record['rows_out']。
+        没有进行中的运行时不做记录
+        """
+        record = {'stage': name, 'depth': self._depth, 'rows_in': rows_in, 'rows_out': None}
+        if self._run is None:
+            yield record
+            return
+
+        # 按开始顺序记录，子阶段排在所属阶段之后
+        self._run['stages'].append(record)
+        rss_before = _rss_bytes()
+        start = time.perf_counter()
+        self._depth += 1
+        try:
+            yield record
+        finally:
+            self._depth -= 1
+            record['seconds'] = round(time.perf_counter() - start, 6)
+            rss_after = _rss_bytes()
+            record['memory_delta'] = rss_after - rss_before if rss_before is not None and rss_after is not None \
+                else None
+
+    def runs(self):
+        """最近的运行记录（从旧到新）"""
+        return list(self.history)
+
+
+def current_profiler():
+    """当前线程进行中的分析器，没有时返回 None"""
+    return getattr(_local, 'profiler', None)
+
+
+@contextmanager
+def stage(name, rows_in=None):
+    """在当前线程的分析器中记录一个阶段，没有分析器时不做记录"""
+    profiler = current_profiler()
+    if profiler is None:
+        yield {'stage': name, 'rows_in': rows_in, 'rows_out': None}
+        return
+    with profiler.stage(name, rows_in) as record:
+        yield record
+
+
+def profiled(name=None):
+    """记录函数调用耗时的装饰器，输出行数取自返回值"""
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with stage(stage_name) as record:
+                result = func(*args, **kwargs)
+                record['rows_out'] = row_count(result)
+            return result
+        return wrapper
+    return decorator
+
+
+def stages_frame(run):
+    """一次运行的各阶段明细（按开始顺序，子阶段缩进显示）"""
+    return pd.DataFrame([{
+        '阶段': '　' * record['depth'] + record['stage'],
+        '耗时(ms)': round(record['seconds'] * 1000, 1),
+        '输入行数': record['rows_in'],
+        '输出行数': record['rows_out'],
+        '内存变化(MB)': None if record['memory_delta'] is None else round(record['memory_delta'] / 1024 / 1024, 2),
+    } for record in run['stages']]).astype({'输入行数': 'Int64', '输出行数': 'Int64'})
+
+
+def history_frame(runs):
+    """最近若干次运行中各阶段的耗时（毫秒），每列为一次运行"""
+    columns = {}
+    for i, run in enumerate(runs):
+        label = f"#{i + 1} {run['started_at'][11:]}"
+        column = {}
+        for record in run['stages']:
+            column[record['stage']] = column.get(record['stage'], 0) + round(record['seconds'] * 1000, 1)
+        column['合计'] = round(run['total_seconds'] * 1000, 1)
+        columns[label] = column
+    return pd.DataFrame(columns)
@@ -0,0 +1,212 @@
+"""
+分析报告导出
+
+将各标签页的结果表（由 sales_api.report_tables 逐张产出）导出为一个多工作表的Excel工作簿，
+或打包为CSV/Parquet文件。结果表取得一张写出一张，不在内存中同时保留全部结果。
+
+Excel 由 xlsxwriter 以 constant_memory 模式写出：每行写完即刷新到临时文件，单元格取值按块
+转换，行数再多占用的内存也不变（pandas to_excel 会在内存中保留整个工作簿）。
+单个工作表超过Excel行数上限时拆分为多个工作表。
+CSV/Parquet 逐个文件写入ZIP压缩包（导出到目录时每张表一个文件）。
+"""
+import io
+import math
+import os
+import re
+import zipfile
+
+import numpy as np
+import pandas as pd
+
+try:
+    import xlsxwriter
+except ImportError:  # xlsxwriter 未安装时不提供Excel导出
+    xlsxwriter = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow 未安装时不提供Parquet导出
+    pa = None
+
+# 导出格式 → (说明, 文件扩展名, MIME类型)
+EXPORT_FORMATS = {
+    'xlsx': ('Excel 工作簿（每张表一个工作表）', '.xlsx',
+             'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+    'csv': ('CSV 文件（ZIP 压缩包）', '.zip', 'application/zip'),
+    'parquet': ('Parquet 文件（ZIP 压缩包）', '.zip', 'application/zip'),
+}
+
+# Excel 单个工作表的行数上限（含表头）及工作表名称的长度上限
+EXCEL_MAX_ROWS = 1_048_576
+SHEET_NAME_LENGTH = 31
+# 写出Excel时每次转换的行数
+WRITE_CHUNK_ROWS = 10_000
+_INVALID_SHEET_CHARS = re.compile(r'[\[\]:*?/\\]')
+
+
+def available_formats():
+    """当前环境可用的导出格式"""
+    formats = ['csv']
+    if xlsxwriter is not None:
+        formats.insert(0, 'xlsx')
+    if pa is not None:
+        formats.append('parquet')
+    return formats
+
+
+# ==== 表格规范化 ====
+def _plain_column(values):
+    """
+    将一列转换为便于写出的取值：分类列还原为取值，组合（元组、列表等）以“、”连接为字符串，
+    其余保持原类型
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(values.cat.categories.dtype)
+    if values.dtype == object:
+        values = values.map(lambda v: '、'.join(map(str, v)) if isinstance(v, (tuple, list, set, frozenset)) else v)
+    return values
+
+
+def plain_frame(df):
+    """导出前的规范化：有名称的索引转为普通列（无名称的行号丢弃）、列名为字符串、分类列和组合取值展开为普通取值"""
+    if any(name is not None for name in df.index.names):
+        df = df.reset_index()
+    return pd.DataFrame({str(col): _plain_column(df[col]) for col in df.columns}, index=pd.RangeIndex(len(df)))
+
+
+# ==== Excel ====
+def _sheet_names(name, parts, used):
+    """工作表名称：去除Excel不允许的字符并截断，拆分的工作表依次加序号，与已用名称不重复"""
+    base = _INVALID_SHEET_CHARS.sub('_', name)[:SHEET_NAME_LENGTH] or '数据'
+    names = []
+    for part in range(parts):
+        candidate = base if part == 0 else f"{base[:SHEET_NAME_LENGTH - 4]}_{part + 1}"
+        suffix = 1
+        while candidate.lower() in used:
+            suffix += 1
+            candidate = f"{base[:SHEET_NAME_LENGTH - 4]}~{suffix}"
+        used.add(candidate.lower())
+        names.append(candidate)
+    return names
+
+
+def _cell_values(values):
+    """一列的单元格取值（Python对象列表）及对应的 xlsxwriter 写入方法名，缺失值为 None（不写入）"""
+    if pd.api.types.is_bool_dtype(values):
+        return [None if pd.isna(v) else bool(v) for v in values], 'write_boolean'
+    if pd.api.types.is_numeric_dtype(values):
+        numbers = values.to_numpy(dtype='float64', na_value=np.nan)
+        return [v if math.isfinite(v) else None for v in numbers.tolist()], 'write_number'
+    if pd.api.types.is_datetime64_any_dtype(values):
+        if values.dt.tz is not None:
+            values = values.dt.tz_localize(None)
+        return [None if pd.isna(v) else v.to_pydatetime() for v in values], 'write_datetime'
+    return [None if v is None or (isinstance(v, float) and math.isnan(v)) else str(v)
+            for v in values.tolist()], 'write_string'
+
+
+def _write_sheet(workbook, sheet_name, df, header_format, row_offset, row_count):
+    """按行写出 df 的 [row_offset, row_offset + row_count) 行（constant_memory 模式要求按行顺序写入）"""
+    worksheet = workbook.add_worksheet(sheet_name)
+    columns = list(df.columns)
+    for col, name in enumerate(columns):
+        worksheet.set_column(col, col, min(max(len(name) * 2 + 2, 10), 40))
+    worksheet.freeze_panes(1, 0)
+    worksheet.write_row(0, 0, columns, header_format)
+
+    # 按块转换为Python取值，内存中只保留一块的单元格
+    for start in range(0, row_count, WRITE_CHUNK_ROWS):
+        stop = min(start + WRITE_CHUNK_ROWS, row_count)
+        cells = []
+        for name in columns:
+            values, method = _cell_values(df[name].iloc[row_offset + start:row_offset + stop])
+            cells.append((values, getattr(worksheet, method)))
+
+        for row in range(stop - start):
+            for col, (values, write) in enumerate(cells):
+                value = values[row]
+                if value is not None:
+                    write(start + row + 1, col, value)
+
+
+def write_xlsx(tables, target):
+    """将 (表名, DataFrame) 依次写为工作簿的工作表，target 为文件路径或可写的二进制文件对象"""
+    if xlsxwriter is None:
+        raise RuntimeError("未安装 xlsxwriter，无法导出Excel")
+    workbook = xlsxwriter.Workbook(target, {
+        'constant_memory': True,
+        'default_date_format': 'yyyy-mm-dd',
+        'strings_to_numbers': False,
+        'strings_to_formulas': False,
+        'strings_to_urls': False,
+    })
+    header_format = workbook.add_format({'bold': True, 'bg_color': '#F0F2F6', 'border': 1})
+    used = set()
+    count = 0
+    try:
+        for name, df in tables:
+            df = plain_frame(df)
+            rows_per_sheet = EXCEL_MAX_ROWS - 1
+            parts = max(math.ceil(len(df) / rows_per_sheet), 1)
+            for part, sheet_name in enumerate(_sheet_names(name, parts, used)):
+                offset = part * rows_per_sheet
+                _write_sheet(workbook, sheet_name, df, header_format, offset, min(rows_per_sheet, len(df) - offset))
+                count += 1
+    finally:
+        workbook.close()
+    return count
+
+
+# ==== CSV / Parquet ====
+def _write_table(df, fmt, target):
+    """将一张表写为CSV（带BOM的UTF-8，便于Excel打开）或Parquet"""
+    df = plain_frame(df)
+    if fmt == 'csv':
+        df.to_csv(target, index=False, encoding='utf-8-sig')
+    elif fmt == 'parquet':
+        if pa is None:
+            raise RuntimeError("未安装 pyarrow，无法导出Parquet")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), target, compression='zstd')
+    else:
+        raise ValueError(f"不支持的导出格式: {fmt}")
+
+
+def write_archive(tables, fmt, target):
+    """将各表分别写为CSV或Parquet文件并逐个加入ZIP压缩包，target 为文件路径或可写的二进制文件对象"""
+    count = 0
+    with zipfile.ZipFile(target, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, df in tables:
+            with archive.open(f"{name}.{fmt}", 'w') as entry:
+                # ZIP条目不支持定位，Parquet先写入内存缓冲区
+                if fmt == 'parquet':
+                    buffer = io.BytesIO()
+                    _write_table(df, fmt, buffer)
+                    entry.write(buffer.getvalue())
+                else:
+                    _write_table(df, fmt, entry)
+            count += 1
+    return count
+
+
+def write_directory(tables, fmt, directory):
+    """导出到目录：xlsx 写为一个工作簿，csv/parquet 每张表一个文件，返回写出的文件数"""
+    os.makedirs(directory, exist_ok=True)
+    if fmt == 'xlsx':
+        write_xlsx(tables, os.path.join(directory, '销售分析报告.xlsx'))
+        return 1
+    count = 0
+    for name, df in tables:
+        _write_table(df, fmt, os.path.join(directory, f"{name}.{fmt}"))
+        count += 1
+    return count
+
+
+def export_bytes(tables, fmt):
+    """导出为内存中的文件内容（xlsx 为工作簿，csv/parquet 为ZIP压缩包），供下载使用"""
+    buffer = io.BytesIO()
+    if fmt == 'xlsx':
+        write_xlsx(tables, buffer)
+    else:
+        write_archive(tables, fmt, buffer)
+    return buffer.getvalue()
@@ -0,0 +1,129 @@
+"""
+分析结果缓存
+
+进程内共享的有界LRU缓存，按条目数、存活时间和估算内存占用三种方式淘汰，
+多用户同时使用时缓存不会无限增长。缓存的结果在各会话间共享，调用方不得原地修改。
+"""
+import hashlib
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+
+def fingerprint(*parts):
+    """将任意可repr的参数压缩为简短的哈希字符串"""
+    return hashlib.sha1(repr(parts).encode('utf-8')).hexdigest()[:20]
+
+
+def estimate_size(value):
+    """估算对象占用的内存字节数"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        usage = value.memory_usage(deep=True, index=True)
+        return int(usage.sum() if isinstance(usage, pd.Series) else usage)
+    if isinstance(value, pd.Index):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, np.ndarray):
+        return int(value.nbytes)
+    if hasattr(value, 'data') and hasattr(value, 'indices') and hasattr(value, 'indptr'):
+        # scipy 稀疏矩阵
+        return int(value.data.nbytes + value.indices.nbytes + value.indptr.nbytes)
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    return sys.getsizeof(value)
+
+
+class ResultCache:
+    """按条目数、存活时间和内存上限淘汰的线程安全LRU缓存"""
+
+    def __init__(self, max_entries=128, ttl=None, max_bytes=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size, created_at)
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _expired(self, created_at, now):
+        return self.ttl is not None and now - created_at > self.ttl
+
+    def _pop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._total_bytes -= size
+
+    def get(self, key, default=None):
+        """读取缓存，命中时将条目移到最近使用的位置"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if self._expired(entry[2], time.monotonic()):
+                self._pop(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value):
+        """写入缓存并按需淘汰最久未使用的条目"""
+        size = estimate_size(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return  # 单个结果超过内存上限时不缓存
+
+        now = time.monotonic()
+        with self._lock:
+            if key in self._entries:
+                self._pop(key)
+            self._entries[key] = (value, size, now)
+            self._total_bytes += size
+
+            # 先清理过期条目，再按条目数和内存上限淘汰
+            if self.ttl is not None:
+                for stale_key in [k for k, (_, _, created) in self._entries.items() if self._expired(created, now)]:
+                    self._pop(stale_key)
+            while self._entries and (
+                    (self.max_entries is not None and len(self._entries) > self.max_entries) or
+                    (self.max_bytes is not None and self._total_bytes > self.max_bytes)):
+                self._pop(next(iter(self._entries)))
+
+    def get_or_compute(self, key, func, *args, **kwargs):
+        """命中则返回缓存结果，否则调用 func 计算并写入缓存"""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = func(*args, **kwargs)
+            self.set(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def stats(self):
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# 分析结果的进程级缓存，容量可通过环境变量配置
+ANALYSIS_CACHE = ResultCache(
+    max_entries=int(os.environ.get('SALES_ANALYSIS_CACHE_ENTRIES', 256)),
+    ttl=float(os.environ.get('SALES_ANALYSIS_CACHE_TTL', 3600)),
+    max_bytes=int(float(os.environ.get('SALES_ANALYSIS_CACHE_MB', 512)) * 1024 * 1024),
+)
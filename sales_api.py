@@ -0,0 +1,344 @@
+"""
+无界面的销售分析接口
+
+SalesDataset 对订单数据构建一次聚合立方体、筛选索引和时间索引；各分析函数接收
+数据集（或原始DataFrame）与筛选条件，返回DataFrame，不依赖Streamlit，
+可直接用于定时任务、批量导出和性能分析。仪表盘只负责渲染这些函数的结果。
+
+筛选条件为字典，键为 所属区域/客户简称/产品代码/申请人（取值列表，空列表表示不限）
+以及 发运月份（(起始月份, 结束月份)，'YYYY-MM'，任一端为 None 表示不限）。
+
+用法: python -m sales_api Q1xlsx.xlsx --region 东 --start 2025-02 --output-dir reports
+      python -m sales_api Q1xlsx.xlsx --output-dir reports --format xlsx   （导出为一个多工作表的工作簿）
+      python -m sales_api 东区.xlsx 南区.xlsx 西区.xlsx --workers 8   （多个文件并行导入）
+"""
+import argparse
+import hashlib
+import os
+
+import pandas as pd
+
+import analytics
+import report_export
+from cube import average_price, build_cube
+from data_cache import load_cached_frame, load_cached_stream
+from dimensions import customer_dimension, label_map, product_dimension
+from filter_index import FILTER_COLUMNS, FilterIndex
+from ingest import iter_sales_chunks, read_sales_file, should_stream
+from parallel_ingest import INGEST_WORKERS, load_files
+from product_catalog import NEW_FLAG, load_catalog
+from schema import compact_frame
+from time_index import TimeIndex, sort_by_month
+
+MONTH_FILTER = '发运月份'
+
+
+# ==== 数据集 ====
+def prepare_frame(df, catalog=None):
+    """
+    转为紧凑列类型（分类、int32、float32、月度Period）并按发运月份排序，供时间索引按月份切片；
+    同时连接新品目录（默认为 load_catalog()）得到“是否新品”列
+    """
+    catalog = catalog or load_catalog()
+    return catalog.annotate(sort_by_month(compact_frame(df)))
+
+
+def load_sales(file_path):
+    """读取销售数据文件（优先使用列式磁盘缓存，大文件流式导入）"""
+    if not isinstance(file_path, (str, os.PathLike)):
+        return load_sales_files(file_path)[0]
+    if should_stream(file_path):
+        df = load_cached_stream(file_path, iter_sales_chunks)
+    else:
+        df = load_cached_frame(file_path, read_sales_file)
+    return prepare_frame(df)
+
+
+def load_sales_files(file_paths, max_workers=INGEST_WORKERS, warn=print):
+    """
+    按文件和工作表并行读取多个文件并合并，返回 (数据, 各文件/工作表耗时表)；
+    只有一个文件时按 load_sales 读取（使用磁盘缓存），耗时表为 None
+    """
+    file_paths = list(file_paths)
+    if len(file_paths) == 1:
+        return load_sales(file_paths[0]), None
+    df, timings = load_files(file_paths, max_workers, warn=warn)
+    return prepare_frame(df), timings
+
+
+class FilteredSales:
+    """筛选后的订单行、聚合立方体及其中的新品部分，is_new 为立方体各行是否为新品"""
+
+    def __init__(self, rows, new_rows, cube, new_cube, new_products, is_new=None):
+        self.rows = rows
+        self.new_rows = new_rows
+        self.cube = cube
+        self.new_cube = new_cube
+        self.new_products = list(new_products)
+        self.is_new = cube['产品代码'].isin(self.new_products).to_numpy() if is_new is None else is_new
+
+
+class SalesDataset:
+    """订单数据及其聚合立方体、筛选索引、时间索引和维度表，构建一次后供各分析函数复用"""
+
+    def __init__(self, df, catalog=None):
+        self.catalog = catalog or load_catalog()
+        self.rows = sort_by_month(df)
+        if NEW_FLAG not in self.rows.columns:
+            self.rows = self.catalog.annotate(self.rows)
+        self.cube = sort_by_month(build_cube(self.rows))
+        self.row_index = FilterIndex(self.rows)
+        self.cube_index = FilterIndex(self.cube)
+        self.row_time_index = TimeIndex(self.rows)
+        self.cube_time_index = TimeIndex(self.cube)
+        # 产品、客户维度表及产品代码 → 简化产品名称的标签字典
+        self.products = product_dimension(self.rows)
+        self.customers = customer_dimension(self.rows)
+        self.product_names = label_map(self.products, '简化产品名称')
+        self._version = None
+
+    @property
+    def version(self):
+        """订单数据的内容指纹（首次访问时计算），可作为分析结果缓存的版本号"""
+        if self._version is None:
+            row_hashes = pd.util.hash_pandas_object(self.rows, index=False).to_numpy()
+            self._version = hashlib.sha256(row_hashes.tobytes()).hexdigest()[:16]
+        return self._version
+
+    @staticmethod
+    def _select(frame, index, time_index, selections, date_range, new_products):
+        """
+        按筛选索引和时间索引取出筛选后的数据、其中的新品数据及筛选后各行是否为新品；
+        new_products 为 None 时直接读取“是否新品”列，否则按指定的产品代码判断
+        """
+        mask = index.mask(selections)
+        is_new = frame[NEW_FLAG].to_numpy() if new_products is None else index.value_mask('产品代码', new_products)
+        new_mask = is_new if mask is None else is_new & mask
+
+        # 日期范围通过时间索引直接切片
+        bounds = time_index.bounds(*date_range)
+        if not time_index.is_full(bounds):
+            start, end = bounds
+            frame = frame.iloc[start:end]
+            mask = None if mask is None else mask[start:end]
+            is_new, new_mask = is_new[start:end], new_mask[start:end]
+        return index.take(frame, mask), index.take(frame, new_mask), is_new if mask is None else is_new[mask]
+
+    def filter(self, filters=None, new_products=None):
+        """
+        按筛选条件返回 FilteredSales；new_products 为 None 时按新品目录（含上市月份）判断新品，
+        否则将指定的产品代码在所有月份均视为新品
+        """
+        filters = filters or {}
+        selections = {col: filters.get(col) or [] for col in FILTER_COLUMNS}
+        date_range = tuple(filters.get(MONTH_FILTER) or (None, None))
+
+        rows, new_rows, _ = self._select(self.rows, self.row_index, self.row_time_index,
+                                         selections, date_range, new_products)
+        cube, new_cube, is_new = self._select(self.cube, self.cube_index, self.cube_time_index,
+                                              selections, date_range, new_products)
+        if new_products is None:
+            # 筛选范围内出现过新品记录的目录产品，按目录顺序排列
+            present = set(new_cube['产品代码'].unique())
+            new_products = [code for code in self.catalog.codes if code in present]
+        return FilteredSales(rows, new_rows, cube, new_cube, new_products, is_new)
+
+
+def filter_state(filters=None):
+    """筛选条件的规范化元组，可用作缓存键"""
+    filters = filters or {}
+    state = tuple((col, tuple(sorted(map(str, filters.get(col) or [])))) for col in FILTER_COLUMNS)
+    return state + ((MONTH_FILTER, tuple(filters.get(MONTH_FILTER) or (None, None))),)
+
+
+def select(data, filters=None, new_products=None):
+    """
+    统一各分析函数的输入：data 可以是 FilteredSales（直接使用，忽略筛选参数）、
+    SalesDataset 或订单行DataFrame
+    """
+    if isinstance(data, FilteredSales):
+        return data
+    if isinstance(data, pd.DataFrame):
+        data = SalesDataset(data)
+    return data.filter(filters, new_products)
+
+
+# ==== 分析函数 ====
+def kpis(data, filters=None, new_products=None):
+    """关键指标：总销售额、客户数量、产品数量、平均单价及新品销售指标"""
+    sales = select(data, filters, new_products)
+    total_sales = sales.cube['销售额'].sum()
+    new_products_sales = sales.new_cube['销售额'].sum()
+    return pd.Series({
+        '总销售额': total_sales,
+        '客户数量': sales.cube['客户简称'].nunique(),
+        '产品数量': sales.cube['产品代码'].nunique(),
+        '平均单价': average_price(sales.cube),
+        '新品销售额': new_products_sales,
+        '新品销售占比': new_products_sales / total_sales * 100 if total_sales > 0 else 0,
+        '购买新品客户数': sales.new_cube['客户简称'].nunique(),
+    }, dtype=object)
+
+
+def region_sales(data, filters=None):
+    """各区域销售总额"""
+    return analytics.region_sales(select(data, filters).cube)
+
+
+def packaging_sales(data, filters=None):
+    """各包装类型销售额"""
+    return analytics.packaging_sales(select(data, filters).cube)
+
+
+def applicant_performance(data, filters=None):
+    """申请人销售额、服务客户数和销售产品种类数"""
+    return analytics.applicant_performance(select(data, filters).cube)
+
+
+def new_product_sales(data, filters=None, new_products=None):
+    """各新品销售额"""
+    return analytics.new_product_sales(select(data, filters, new_products).new_cube)
+
+
+def region_new_product_sales(data, filters=None, new_products=None):
+    """各区域各新品销售额"""
+    return analytics.region_new_product_sales(select(data, filters, new_products).new_cube)
+
+
+def region_new_sales_ratio(data, filters=None, new_products=None):
+    """各区域新品销售占比"""
+    sales = select(data, filters, new_products)
+    return analytics.region_new_sales_ratio(sales.cube, sales.new_cube)
+
+
+def customer_features(data, filters=None, new_products=None):
+    """客户特征及新品占比分类"""
+    sales = select(data, filters, new_products)
+    return analytics.customer_features(sales.cube, sales.new_cube)
+
+
+def customer_segment_model(data, filters=None, new_products=None, k=None):
+    """
+    按客户特征矩阵（销售额、产品种类数、数量、平均单价、新品占比、最近购买间隔）拟合客群模型，
+    k 为 None 时自动选择；客户过少时返回 None
+    """
+    sales = select(data, filters, new_products)
+    return analytics.fit_customer_segments(sales.cube, sales.is_new, k)
+
+
+def customer_clusters(data, filters=None, new_products=None, model=None):
+    """客户特征及所属客群；model 为 None 时在这些客户上拟合，客户过少时回退为新品占比三档分类"""
+    sales = select(data, filters, new_products)
+    model = model or analytics.fit_customer_segments(sales.cube, sales.is_new)
+    if model is None:
+        return analytics.customer_features(sales.cube, sales.new_cube)
+    return analytics.customer_clusters(sales.cube, sales.new_cube, sales.is_new, model)
+
+
+def customer_segments(data, filters=None, new_products=None, model=None):
+    """各客户类型（指定 model 时为各客群）的客户数量、平均销售额和平均新品占比"""
+    if model is None:
+        return analytics.customer_segments(customer_features(data, filters, new_products))
+    return analytics.customer_segments(customer_clusters(data, filters, new_products, model))
+
+
+def co_occurrence(data, filters=None):
+    """客户×产品购买矩阵和产品共现矩阵，返回 (购买矩阵, 客户, 产品, 共现矩阵)"""
+    return analytics.co_occurrence(select(data, filters).cube)
+
+
+def association_rules(data, filters=None, new_products=None, min_support=0.02, min_confidence=0.1, max_size=2,
+                      new_only=True):
+    """产品关联规则（支持度、置信度、提升度，max_size 为 3 时包含三项组合），new_only 时只保留涉及新品的规则"""
+    sales = select(data, filters, new_products)
+    focus = sales.new_products if new_only else None
+    return analytics.association_rules(sales.cube, focus, min_support, min_confidence, max_size)
+
+
+def penetration(data, filters=None, new_products=None):
+    """各区域新品渗透率和新品销售额，返回 (渗透率表, 渗透率与销售额合并表)"""
+    sales = select(data, filters, new_products)
+    return analytics.region_penetration(sales.cube, sales.is_new)
+
+
+def monthly_penetration(data, filters=None, new_products=None):
+    """月度新品渗透率和销售占比"""
+    sales = select(data, filters, new_products)
+    return analytics.monthly_penetration(sales.cube, sales.is_new)
+
+
+# ==== 分析报告 ====
+def report_tables(analysis, product_names=None, model=None):
+    """
+    按仪表盘各标签页依次产出结果表 (表名, DataFrame)，供 report_export 导出。
+    analysis(func, **params) 对当前筛选结果调用本模块的分析函数（仪表盘中为带缓存的 cached_analysis）；
+    model 为客群模型时客户特征和客户细分按客群划分，否则按新品占比三档分类；
+    product_names 为产品代码 → 简化名称的字典，用于标注共现矩阵的行
+    """
+    indicators = analysis(kpis)
+    yield '关键指标', pd.DataFrame({'指标': indicators.index, '数值': pd.to_numeric(indicators.to_numpy())})
+    yield '区域销售', analysis(region_sales)
+    yield '包装销售', analysis(packaging_sales)
+    yield '申请人业绩', analysis(applicant_performance)
+    yield '新品销售', analysis(new_product_sales)
+    yield '区域新品销售', analysis(region_new_product_sales)
+    yield '区域新品占比', analysis(region_new_sales_ratio)
+    if model is None:
+        yield '客户特征', analysis(customer_features)
+    else:
+        yield '客户聚类', analysis(customer_clusters, model=model)
+        yield '客群画像', model.profile
+    yield '客户细分', analysis(customer_segments, model=model)
+
+    co_matrix = analysis(co_occurrence)[3]
+    matrix = co_matrix.set_axis(co_matrix.columns.astype(str), axis=1)
+    codes = co_matrix.index.astype(str)
+    matrix.index = pd.Index(codes, name='产品代码')
+    matrix.insert(0, '产品名称', [(product_names or {}).get(code, code) for code in codes])
+    yield '产品共现', matrix.reset_index()
+
+    yield '新品关联规则', analysis(association_rules)
+    yield '区域渗透率', analysis(penetration)[1]
+    yield '月度渗透率', analysis(monthly_penetration)
+
+
+# ==== 命令行批量导出 ====
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('files', nargs='+', help='销售数据文件（xlsx/xls/csv），多个文件并行导入后合并')
+    parser.add_argument('--region', action='append', default=[], help='所属区域，可重复指定')
+    parser.add_argument('--customer', action='append', default=[], help='客户简称，可重复指定')
+    parser.add_argument('--product', action='append', default=[], help='产品代码，可重复指定')
+    parser.add_argument('--applicant', action='append', default=[], help='申请人，可重复指定')
+    parser.add_argument('--start', help='起始月份 YYYY-MM')
+    parser.add_argument('--end', help='结束月份 YYYY-MM')
+    parser.add_argument('--output-dir', help='导出各分析结果的目录')
+    parser.add_argument('--format', choices=['csv', 'xlsx', 'parquet'], default='csv',
+                        help='导出格式：csv/parquet 每个结果一个文件，xlsx 为一个多工作表的工作簿')
+    parser.add_argument('--workers', type=int, default=INGEST_WORKERS, help='并行导入的进程数')
+    args = parser.parse_args()
+
+    filters = {
+        '所属区域': args.region,
+        '客户简称': args.customer,
+        '产品代码': args.product,
+        '申请人': args.applicant,
+        MONTH_FILTER: (args.start, args.end),
+    }
+    df, timings = load_sales_files(args.files, args.workers)
+    if timings is not None:
+        print(timings.to_string(index=False))
+    dataset = SalesDataset(df)
+    sales = select(dataset, filters)
+    print(kpis(sales).to_string())
+
+    if args.output_dir:
+        # 与仪表盘一致，客群模型在全部客户上拟合，客户过少时按新品占比三档分类
+        tables = report_tables(lambda func, **params: func(sales, **params),
+                               dataset.product_names, customer_segment_model(dataset))
+        count = report_export.write_directory(tables, args.format, args.output_dir)
+        print(f"已导出 {count} 个文件到 {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
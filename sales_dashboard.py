@@ -5,12 +5,34 @@ import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 from datetime import datetime, timedelta
-import re
+import io
 import os
 import warnings
 
+import report_export
+import sales_api
+from cooccurrence import customers_with_any, products_per_customer, top_co_occurring
+from data_cache import bytes_content_hash, load_cached_frame, load_cached_stream, load_cached_upload
+from figure_cache import cached_figure
+from figure_data import downsample_points, item_count, limited_title, scatter_render_mode, top_categories
+from dataset_store import (STORE_AVAILABLE, available_months, list_source_files, load_manifest, manifest_version,
+                           month_range, read_partitions, sources_frame, sync_store)
+from dimensions import label_map
+from ingest import MissingColumnsError, iter_sales_chunks, read_sales_file, should_stream
+from product_utils import add_product_columns
+from profiler import Profiler, history_frame, profiled, row_count, stage as profile_stage, stages_frame
+from result_cache import ANALYSIS_CACHE, fingerprint
+from product_catalog import NEW_FLAG, load_catalog
+from sales_api import SalesDataset, prepare_frame
+from schema import memory_report
+from segmentation import MIN_CUSTOMERS
+
 warnings.filterwarnings('ignore')
 
+# 数据集在进程内所有会话间共享：启用写时复制后，对筛选结果的任何修改都只作用于副本，
+# to_numpy() 返回只读数组，共享的订单数据不会被某个会话意外改写
+pd.set_option('mode.copy_on_write', True)
+
 # 在设置页面配置后添加这段代码
 st.set_page_config(
     page_title="销售数据分析仪表盘",
@@ -87,6 +109,9 @@ st.markdown("""
 if 'authenticated' not in st.session_state:
     st.session_state.authenticated = False
 
+# 管理员密码（可查看性能分析面板），通过环境变量配置，未配置时不启用
+ADMIN_PASSWORD = os.environ.get('SALES_ADMIN_PASSWORD')
+
 # 登录界面
 if not st.session_state.authenticated:
     st.markdown('<div style="font-size: 1.5rem; color: #1f3867; text-align: center; margin-bottom: 1rem;">2025新品销售数据分析仪表盘 | 登录</div>', unsafe_allow_html=True)
@@ -109,8 +134,9 @@ if not st.session_state.authenticated:
 
         # 验证密码
         if login_button:
-            if password == 'SAL':
+            if password == 'SAL' or (ADMIN_PASSWORD and password == ADMIN_PASSWORD):
                 st.session_state.authenticated = True
+                st.session_state.is_admin = bool(ADMIN_PASSWORD) and password == ADMIN_PASSWORD
                 st.success("登录成功！")
                 st.rerun()  # 修改这里，使用st.rerun()代替st.experimental_rerun()
             else:
@@ -119,6 +145,10 @@ if not st.session_state.authenticated:
     # 如果未认证，不显示后续内容
     st.stop()
 
+# 记录本次运行各阶段的耗时，每个会话保留最近的运行记录
+profiler = st.session_state.setdefault('profiler', Profiler())
+profiler.start_run(label=st.session_state.get('active_tab'))
+
 # 以下是原有的标题和内容，只有在认证后才会显示
 # 删除此处的重复标题，只保留后面的主标题
 # st.markdown('<div class="main-header">2025新品销售数据分析仪表盘 </div>', unsafe_allow_html=True)
@@ -133,153 +163,118 @@ def format_yuan(value):
         return f"{value:.2f}元"
 
 
-# ==== 工具函数区 ====
-def extract_packaging(product_name):
-    """从产品名称中提取包装类型"""
-    try:
-        # 确保输入是字符串
-        if not isinstance(product_name, str):
-            return "其他"
-
-        # 检查组合类型（优先级最高）
-        if re.search(r'分享装袋装', product_name):
-            return '分享装袋装'
-        elif re.search(r'分享装盒装', product_name):
-            return '分享装盒装'
-
-        # 按包装大小分类（从大到小）
-        elif re.search(r'随手包', product_name):
-            return '随手包'
-        elif re.search(r'迷你包', product_name):
-            return '迷你包'
-        elif re.search(r'分享装', product_name):
-            return '分享装'
-
-        # 按包装形式分类
-        elif re.search(r'袋装', product_name):
-            return '袋装'
-        elif re.search(r'盒装', product_name):
-            return '盒装'
-        elif re.search(r'瓶装', product_name):
-            return '瓶装'
-
-        # 处理特殊规格
-        kg_match = re.search(r'(\d+(?:\.\d+)?)\s*KG', product_name, re.IGNORECASE)
-        if kg_match:
-            weight = float(kg_match.group(1))
-            if weight >= 1.5:
-                return '大包装'
-            return '散装'
-
-        g_match = re.search(r'(\d+(?:\.\d+)?)\s*G', product_name)
-        if g_match:
-            weight = float(g_match.group(1))
-            if weight <= 50:
-                return '小包装'
-            elif weight <= 100:
-                return '中包装'
-            else:
-                return '大包装'
+# ==== 数据加载函数 ====
+# 进程内共享的数据集数量上限（cache_resource 不复制数据，各会话共用同一份），可通过环境变量配置
+SHARED_DATASETS = int(os.environ.get('SALES_SHARED_DATASETS', 4))
 
-        # 默认分类
-        return '其他'
-    except Exception as e:
-        print(f"提取包装类型时出错: {str(e)}, 产品名称: {product_name}")
-        return '其他'  # 捕获任何异常并返回默认值
 
+def load_streamed_data(file_path):
+    """流式导入大文件，在侧边栏显示导入进度"""
+    progress_bar = st.sidebar.progress(0.0, text="正在导入数据...")
 
-# 创建产品代码到简化产品名称的映射函数
-def get_simplified_product_name(product_code, product_name):
-    """从产品名称中提取简化产品名称"""
-    try:
-        # 确保输入是字符串类型
-        if not isinstance(product_name, str):
-            return str(product_code)  # 返回产品代码作为备选
-
-        if '口力' in product_name:
-            # 提取"口力"之后的产品类型
-            name_parts = product_name.split('口力')
-            if len(name_parts) > 1:
-                name_part = name_parts[1]
-                if '-' in name_part:
-                    name_part = name_part.split('-')[0].strip()
-
-                # 进一步简化，只保留主要部分（去掉规格和包装形式）
-                for suffix in ['G分享装袋装', 'G盒装', 'G袋装', 'KG迷你包', 'KG随手包']:
-                    if suffix in name_part:
-                        name_part = name_part.split(suffix)[0]
-                        break
-
-                # 去掉可能的数字和单位
-                simple_name = re.sub(r'\d+\w*\s*', '', name_part).strip()
-
-                if simple_name:  # 确保简化名称不为空
-                    return f"{simple_name} ({product_code})"
-
-        # 如果无法提取或处理中出现错误，则返回产品代码
-        return str(product_code)
-    except Exception as e:
-        # 捕获任何异常，确保函数始终返回一个字符串
-        print(f"简化产品名称时出错: {e}，产品代码: {product_code}")
-        return str(product_code)
-
-
-# ==== 数据加载函数 ====
-@st.cache_data
-def load_data(file_path=None):
-    """从文件加载数据或使用示例数据"""
+    def report_progress(rows_read, total_rows):
+        if total_rows:
+            progress_bar.progress(min(rows_read / total_rows, 1.0), text=f"已导入 {rows_read:,} / {total_rows:,} 行")
+        else:
+            progress_bar.progress(0.0, text=f"已导入 {rows_read:,} 行")
+
+    df = load_cached_stream(
+        file_path,
+        lambda path: iter_sales_chunks(path, progress=report_progress, warn=st.sidebar.warning)
+    )
+    progress_bar.empty()
+    return df
+
+
+def sync_data_store(data_dir):
+    """将数据目录中新增或变化的文件增量（多文件并行）导入分区数据集，在侧边栏显示导入进度"""
+    progress_bar = None
+
+    def report_progress(files_done, total_files, file_path):
+        nonlocal progress_bar
+        if file_path is None:
+            if progress_bar is not None:
+                progress_bar.empty()
+            return
+        if progress_bar is None:
+            progress_bar = st.sidebar.progress(0.0)
+        progress_bar.progress(files_done / total_files,
+                              text=f"已导入 {os.path.basename(file_path)}（{files_done}/{total_files}）")
+
+    with profile_stage('sync_store'):
+        return sync_store(data_dir, iter_sales_chunks, progress=report_progress, warn=st.sidebar.warning)
+
+
+@profiled('load_store_data')
+@st.cache_resource(max_entries=SHARED_DATASETS)
+def load_store_data(store_version, months=None, catalog_version=None):
+    """
+    读取数据集中所选月份的分区，months 为 None 时读取全部；
+    store_version 随分区变化、catalog_version 随新品目录变化使缓存失效
+    """
+    return prepare_frame(read_partitions(load_manifest(), months), catalog)
+
+
+@profiled('load_data')
+@st.cache_resource(max_entries=SHARED_DATASETS)
+def load_data(file_path=None, catalog_version=None):
+    """从文件加载数据或使用示例数据，catalog_version 随新品目录变化使缓存失效"""
     # 如果提供了文件路径，从文件加载
     if file_path and os.path.exists(file_path):
         try:
-            df = pd.read_excel(file_path)
-
-            # 数据预处理
-            # 确保所有必要的列都存在
-            required_columns = ['客户简称', '所属区域', '发运月份', '申请人', '产品代码', '产品名称',
-                                '订单类型', '单价（箱）', '数量（箱）']
-
-            missing_columns = [col for col in required_columns if col not in df.columns]
-            if missing_columns:
-                st.error(f"文件缺少必要的列: {', '.join(missing_columns)}。使用示例数据进行演示。")
-                return load_sample_data()
-
-            # 计算销售额
-            df['销售额'] = df['单价（箱）'] * df['数量（箱）']
-
-            # 确保发运月份是日期类型
-            try:
-                df['发运月份'] = pd.to_datetime(df['发运月份'])
-            except Exception as e:
-                st.warning(f"转换日期格式时出错: {str(e)}。月份分析功能可能受影响。")
-
-            # 确保所有的字符串列都是字符串类型
-            for col in ['客户简称', '所属区域', '申请人', '产品代码', '产品名称', '订单类型']:
-                df[col] = df[col].astype(str)
-
-            # 添加简化产品名称列
-            df['简化产品名称'] = df.apply(
-                lambda row: get_simplified_product_name(row['产品代码'], row['产品名称']),
-                axis=1
-            )
-
-            # 在这里一次性提取包装类型
-            df['包装类型'] = df['产品名称'].apply(extract_packaging)
-
-            return df
+            # 大文件流式导入，逐块写入列式缓存并在侧边栏显示进度
+            if should_stream(file_path):
+                return prepare_frame(load_streamed_data(file_path), catalog)
+
+            # 优先读取列式磁盘缓存，工作簿未变化时跳过Excel解析
+            df = load_cached_frame(file_path, lambda path: read_sales_file(path, warn=st.warning))
+            return prepare_frame(df, catalog)
+        except MissingColumnsError as e:
+            st.error(f"文件缺少必要的列: {', '.join(e.missing_columns)}。使用示例数据进行演示。")
+            return load_sample_data(catalog_version)
         except Exception as e:
             st.error(f"文件加载失败: {str(e)}。使用示例数据进行演示。")
-            return load_sample_data()
+            return load_sample_data(catalog_version)
     else:
         # 没有文件路径或文件不存在，使用示例数据
         if file_path:
             st.warning(f"文件路径不存在: {file_path}。使用示例数据进行演示。")
-        return load_sample_data()
+        return load_sample_data(catalog_version)
+
+
+def upload_content_hash(uploaded_file):
+    """上传文件内容的哈希，每个上传文件在会话中只计算一次"""
+    hashes = st.session_state.setdefault('upload_hashes', {})
+    if uploaded_file.file_id not in hashes:
+        hashes[uploaded_file.file_id] = bytes_content_hash(uploaded_file.getvalue())
+    return hashes[uploaded_file.file_id]
+
+
+@profiled('load_upload')
+@st.cache_resource(max_entries=SHARED_DATASETS)
+def load_upload(_uploaded_file, content_hash, catalog_version=None):
+    """
+    直接从内存中的上传内容解析数据，按内容哈希缓存：进程内共享解析结果，磁盘上保存列式缓存，
+    不同会话上传相同内容的文件或服务重启后都不再重复解析
+    """
+    def parse():
+        return read_sales_file(io.BytesIO(_uploaded_file.getvalue()), warn=st.warning)
+
+    try:
+        return prepare_frame(load_cached_upload(content_hash, parse), catalog)
+    except MissingColumnsError as e:
+        st.error(f"文件缺少必要的列: {', '.join(e.missing_columns)}。使用示例数据进行演示。")
+        return load_sample_data(catalog_version)
+    except Exception as e:
+        st.error(f"文件加载失败: {str(e)}。使用示例数据进行演示。")
+        return load_sample_data(catalog_version)
 
 
 # 创建示例数据（以防用户没有上传文件）
-@st.cache_data
-def load_sample_data():
-    """创建示例数据"""
+@profiled('load_sample_data')
+@st.cache_resource(max_entries=SHARED_DATASETS)
+def load_sample_data(catalog_version=None):
+    """创建示例数据，catalog_version 随新品目录变化使缓存失效"""
     # 产品代码
     product_codes = [
         'F3415D', 'F3421D', 'F0104J', 'F0104L', 'F3411A', 'F01E4B',
@@ -337,16 +332,10 @@ def load_sample_data():
             mask = df['所属区域'] == region
             df.loc[mask, '销售额'] = df.loc[mask, '销售额'] * factor
 
-        # 添加简化产品名称
-        df['简化产品名称'] = df.apply(
-            lambda row: get_simplified_product_name(row['产品代码'], row['产品名称']),
-            axis=1
-        )
+        # 添加简化产品名称和包装类型
+        add_product_columns(df)
 
-        # 添加包装类型
-        df['包装类型'] = df['产品名称'].apply(extract_packaging)
-
-        return df
+        return prepare_frame(df, catalog)
     except Exception as e:
         # 如果示例数据创建失败，创建一个最小化的DataFrame
         st.error(f"创建示例数据时出错: {str(e)}。使用简化版示例数据。")
@@ -367,7 +356,23 @@ def load_sample_data():
             '包装类型': ['盒装', '袋装', '盒装']
         })
 
-        return simple_df
+        return prepare_frame(simple_df, catalog)
+
+
+@profiled('build_dataset')
+@st.cache_resource(max_entries=SHARED_DATASETS)
+def get_dataset(_df, data_source, catalog_version=None):
+    """
+    构建聚合立方体、筛选索引和时间索引，进程内所有会话共享同一个只读数据集；
+    按数据来源（而非对整个数据框计算哈希）查找，catalog_version 随新品目录变化使缓存失效
+    """
+    return SalesDataset(_df, catalog)
+
+
+@st.cache_data
+def get_memory_report(_df, data_source):
+    """各列紧凑类型转换前后的内存占用"""
+    return memory_report(_df)
 
 
 # 添加图表解释
@@ -378,95 +383,202 @@ def add_chart_explanation(explanation_text):
 
 # 定义默认文件路径
 DEFAULT_FILE_PATH = "Q1xlsx.xlsx"
+# 按月或按季度存放工作簿的数据目录，可通过环境变量覆盖
+DATA_DIR = os.environ.get('SALES_DATA_DIR', 'sales_data')
 
 # 标题
 st.markdown('<div class="main-header">2025新品销售数据分析仪表盘</div>', unsafe_allow_html=True)
 
 # 侧边栏 - 上传文件区域
 st.sidebar.header("📂 数据导入")
-use_default_file = st.sidebar.checkbox("使用默认文件", value=True, help="使用指定的本地文件路径")
-uploaded_file = st.sidebar.file_uploader("或上传Excel销售数据文件", type=["xlsx", "xls"], disabled=use_default_file)
+use_data_store = False
+if STORE_AVAILABLE and list_source_files(DATA_DIR):
+    use_data_store = st.sidebar.checkbox(
+        "使用数据目录", value=True,
+        help=f"增量导入 {DATA_DIR} 目录下的全部工作簿，按发运月份分区存储，新文件只导入一次"
+    )
+use_default_file = st.sidebar.checkbox("使用默认文件", value=True, help="使用指定的本地文件路径",
+                                       disabled=use_data_store)
+uploaded_file = st.sidebar.file_uploader("或上传Excel销售数据文件", type=["xlsx", "xls"],
+                                         disabled=use_default_file or use_data_store)
+
+# 新品目录（产品代码及上市月份），目录文件有误时使用默认新品列表
+try:
+    catalog = load_catalog()
+except Exception as e:
+    st.sidebar.error(f"新品目录加载失败: {str(e)}。使用默认新品列表。")
+    catalog = load_catalog(None)
 
 # 加载数据
-if use_default_file:
+if use_data_store:
+    # 同步数据目录后只读取所选月份范围内的分区
+    store_manifest = sync_data_store(DATA_DIR)
+    store_months = available_months(store_manifest)
+    selected_months = None
+    if len(store_months) > 1:
+        start_month, end_month = st.sidebar.select_slider(
+            "发运月份范围", options=store_months, value=(store_months[0], store_months[-1])
+        )
+        if (start_month, end_month) != (store_months[0], store_months[-1]):
+            selected_months = tuple(month_range(store_months, start_month, end_month))
+
+    data_source = ('store', manifest_version(store_manifest), selected_months)
+    df = load_store_data(manifest_version(store_manifest), selected_months, catalog.version)
+    if df.empty:
+        st.sidebar.warning(f"数据目录 {DATA_DIR} 中没有可用的数据。使用示例数据进行演示。")
+        data_source = ('sample',)
+        df = load_sample_data(catalog.version)
+    else:
+        st.sidebar.success(f"已加载数据目录 {DATA_DIR}：{len(store_manifest['sources'])} 个文件，{len(df):,} 行")
+    with st.sidebar.expander("导入明细"):
+        st.dataframe(sources_frame(store_manifest), hide_index=True)
+elif use_default_file:
     # 使用默认文件路径
     if os.path.exists(DEFAULT_FILE_PATH):
-        df = load_data(DEFAULT_FILE_PATH)
+        data_source = ('file', DEFAULT_FILE_PATH)
+        df = load_data(DEFAULT_FILE_PATH, catalog.version)
         st.sidebar.success(f"已成功加载默认文件: {DEFAULT_FILE_PATH}")
     else:
         st.sidebar.error(f"默认文件路径不存在: {DEFAULT_FILE_PATH}")
-        df = load_sample_data()
+        data_source = ('sample',)
+        df = load_sample_data(catalog.version)
         st.sidebar.info("正在使用示例数据。请上传您的数据文件获取真实分析。")
 elif uploaded_file is not None:
-    # 使用上传的文件
-    df = load_data(uploaded_file)
+    # 使用上传的文件（按内容哈希缓存，相同内容的上传共用同一个数据集）
+    content_hash = upload_content_hash(uploaded_file)
+    data_source = ('upload', content_hash)
+    df = load_upload(uploaded_file, content_hash, catalog.version)
 else:
     # 没有文件，使用示例数据
-    df = load_sample_data()
+    data_source = ('sample',)
+    df = load_sample_data(catalog.version)
     st.sidebar.info("正在使用示例数据。请上传您的数据文件获取真实分析。")
 
-# 定义新品产品代码
-new_products = ['F0110C', 'F0183F', 'F01K8A', 'F0183K', 'F0101P']
-new_products_df = df[df['产品代码'].isin(new_products)]
-
-# 创建产品代码到简化名称的映射字典（用于图表显示）
-product_name_mapping = {
-    code: df[df['产品代码'] == code]['简化产品名称'].iloc[0] if len(df[df['产品代码'] == code]) > 0 else code
-    for code in df['产品代码'].unique()
-}
+# 侧边栏 - 内存占用报告
+if st.sidebar.checkbox("显示内存占用", value=False, help="对比各列转换为紧凑类型前后占用的内存"):
+    report = get_memory_report(df, data_source)
+    before_bytes, after_bytes = report['原始字节'].iloc[-1], report['紧凑字节'].iloc[-1]
+    st.sidebar.caption(
+        f"原始 {before_bytes / 1024 / 1024:.2f} MB → 紧凑 {after_bytes / 1024 / 1024:.2f} MB"
+        f"（节省 {(1 - after_bytes / before_bytes) * 100 if before_bytes else 0:.1f}%）"
+    )
+    st.sidebar.caption("数据集在服务进程内只保存一份，各会话共享只读视图，不单独复制")
+    st.sidebar.dataframe(report, hide_index=True, use_container_width=True)
+
+# 按维度组合预聚合，并为订单行和立方体建立筛选索引和时间索引，每个数据集在进程内只计算和保存一次
+dataset = get_dataset(df, data_source, catalog.version)
+row_index = dataset.row_index
+
+# 产品代码 → 简化名称、客户 → 所属区域的标签字典（用于图表和筛选器显示），取自随数据集缓存的维度表
+product_name_mapping = dataset.product_names
+customer_region_mapping = label_map(dataset.customers, '所属区域')
+new_product_codes = set(dataset.products.index[dataset.products[NEW_FLAG]].astype(str))
 
 # 侧边栏 - 筛选器
 st.sidebar.header("🔍 筛选数据")
 
+# 日期范围筛选器（数据目录模式在导入时已按月份范围读取分区）
+date_range = (None, None)
+all_months = dataset.row_time_index.labels()
+if not use_data_store and len(all_months) > 1:
+    start_month, end_month = st.sidebar.select_slider(
+        "发运月份范围", options=all_months, value=(all_months[0], all_months[-1])
+    )
+    if (start_month, end_month) != (all_months[0], all_months[-1]):
+        date_range = (start_month, end_month)
+
 # 区域筛选器
-all_regions = sorted(df['所属区域'].astype(str).unique())
+all_regions = sorted(row_index.values('所属区域').astype(str).unique())
 selected_regions = st.sidebar.multiselect("选择区域", all_regions, default=all_regions)
 
 # 客户筛选器
-all_customers = sorted(df['客户简称'].astype(str).unique())
-selected_customers = st.sidebar.multiselect("选择客户", all_customers, default=[])
+all_customers = sorted(row_index.values('客户简称').astype(str).unique())
+selected_customers = st.sidebar.multiselect(
+    "选择客户",
+    options=all_customers,
+    format_func=lambda x: f"{x} ({customer_region_mapping.get(x, '未知区域')})",
+    default=[]
+)
 
 # 产品代码筛选器
-all_products = sorted(df['产品代码'].astype(str).unique())
+all_products = sorted(row_index.values('产品代码').astype(str).unique())
 selected_products = st.sidebar.multiselect(
     "选择产品",
     options=all_products,
-    format_func=lambda x: f"{x} ({product_name_mapping[x]})",
+    format_func=lambda x: f"{x} ({product_name_mapping.get(x, x)})" + (" 🆕" if x in new_product_codes else ""),
     default=[]
 )
 
 # 申请人筛选器
-all_applicants = sorted(df['申请人'].astype(str).unique())
+all_applicants = sorted(row_index.values('申请人').astype(str).unique())
 selected_applicants = st.sidebar.multiselect("选择申请人", all_applicants, default=[])
 
-# 应用筛选条件
-filtered_df = df.copy()
-
-if selected_regions:
-    filtered_df = filtered_df[filtered_df['所属区域'].isin(selected_regions)]
-
-if selected_customers:
-    filtered_df = filtered_df[filtered_df['客户简称'].isin(selected_customers)]
-
-if selected_products:
-    filtered_df = filtered_df[filtered_df['产品代码'].isin(selected_products)]
-
-if selected_applicants:
-    filtered_df = filtered_df[filtered_df['申请人'].isin(selected_applicants)]
-
-# 根据筛选后的数据筛选新品数据
-filtered_new_products_df = filtered_df[filtered_df['产品代码'].isin(new_products)]
-
-# 创建标签页
-tabs = st.tabs(["📊 销售概览", "🆕 新品分析", "👥 客户细分", "🔄 产品组合", "🌐 市场渗透率"])
-
-with tabs[0]:  # 销售概览
+# 应用筛选条件（通过筛选索引按位组合、时间索引切片，不复制原数据）
+filters = {
+    '所属区域': selected_regions,
+    '客户简称': selected_customers,
+    '产品代码': selected_products,
+    '申请人': selected_applicants,
+    '发运月份': date_range
+}
+with profile_stage('filter', rows_in=len(dataset.rows)) as record:
+    filtered_sales = dataset.filter(filters)
+    record['rows_out'] = len(filtered_sales.rows)
+# 新品由目录按产品代码和发运月份预先标记在“是否新品”列中，此处为筛选范围内出现的新品代码
+new_products = filtered_sales.new_products
+filtered_df, filtered_new_products_df = filtered_sales.rows, filtered_sales.new_rows
+
+# 各标签页的汇总指标均基于聚合立方体计算，不再重复扫描订单行
+filtered_cube, filtered_new_cube = filtered_sales.cube, filtered_sales.new_cube
+
+# ==== 分析计算 ====
+# 分析结果按（数据集版本, 筛选条件, 新品目录版本）的紧凑哈希缓存在进程级有界LRU缓存中，
+# 数据集版本（内容指纹）在共享数据集上只计算一次
+with profile_stage('dataset_version'):
+    dataset_version = dataset.version
+analysis_key = fingerprint(dataset_version, sales_api.filter_state(filters), catalog.version)
+
+
+def cached_analysis(func, **params):
+    """对筛选后的数据调用 sales_api 中的分析函数并缓存结果（params 为附加参数），结果在会话间共享，不得原地修改"""
+    with profile_stage(f"analysis.{func.__name__}", rows_in=len(filtered_cube)) as record:
+        key = (func.__name__, analysis_key, tuple(sorted(params.items())))
+        result = ANALYSIS_CACHE.get_or_compute(key, func, filtered_sales, **params)
+        record['rows_out'] = row_count(result)
+    return result
+
+
+def get_segment_model(k=None):
+    """在全部客户上拟合的客群模型（k 为 None 时自动选择），按数据集版本缓存，各筛选条件共用"""
+    with profile_stage('analysis.customer_segment_model', rows_in=len(dataset.cube)):
+        key = ('customer_segment_model', dataset_version, catalog.version, k)
+        return ANALYSIS_CACHE.get_or_compute(key, sales_api.customer_segment_model, dataset, k=k)
+
+
+def plotly_chart(fig, **kwargs):
+    """渲染Plotly图表并记录耗时，输入行数为各图层数据点数之和"""
+    title = fig.layout.title.text or '未命名图表'
+    points = 0
+    for trace in fig.data:
+        values = next((getattr(trace, attr, None) for attr in ('x', 'labels', 'z')
+                       if getattr(trace, attr, None) is not None), None)
+        points += 0 if values is None else len(values)
+    with profile_stage(f"chart.{title}", rows_in=points):
+        st.plotly_chart(fig, **kwargs)
+
+
+# ==== 标签页渲染函数 ====
+# 每个标签页的内容封装为独立函数，只渲染当前选中的标签页。
+# 各图表由 build_* 函数根据传入的数据构建，经 cached_figure 按数据指纹缓存
+def render_sales_overview():
+    """销售概览"""
     # KPI指标行
     st.subheader("🔑 关键绩效指标")
     col1, col2, col3, col4 = st.columns(4)
+    kpis = cached_analysis(sales_api.kpis)
 
     # 总销售额
-    total_sales = filtered_df['销售额'].sum()
+    total_sales = kpis['总销售额']
     with col1:
         st.markdown(f"""
         <div class="metric-card">
@@ -477,7 +589,7 @@ with tabs[0]:  # 销售概览
         """, unsafe_allow_html=True)
 
     # 客户数量
-    total_customers = filtered_df['客户简称'].nunique()
+    total_customers = kpis['客户数量']
     with col2:
         st.markdown(f"""
         <div class="metric-card">
@@ -488,7 +600,7 @@ with tabs[0]:  # 销售概览
         """, unsafe_allow_html=True)
 
     # 产品数量
-    total_products = filtered_df['产品代码'].nunique()
+    total_products = kpis['产品数量']
     with col3:
         st.markdown(f"""
         <div class="metric-card">
@@ -499,7 +611,7 @@ with tabs[0]:  # 销售概览
         """, unsafe_allow_html=True)
 
     # 平均单价
-    avg_price = filtered_df['单价（箱）'].mean()
+    avg_price = kpis['平均单价']
     with col4:
         st.markdown(f"""
         <div class="metric-card">
@@ -513,45 +625,54 @@ with tabs[0]:  # 销售概览
     st.markdown('<div class="sub-header">📊 区域销售分析</div>', unsafe_allow_html=True)
 
     # 计算区域销售数据
-    region_sales = filtered_df.groupby('所属区域')['销售额'].sum().reset_index()
-    region_sales = region_sales.sort_values(by='销售额', ascending=False)
+    region_sales = cached_analysis(sales_api.region_sales)
+    # 区域过多时只显示前N个，其余合并为“其他”
+    region_chart, region_total = top_categories(region_sales, '所属区域', '销售额')
 
     # 创建区域销售图表
     cols = st.columns(2)
     with cols[0]:
         # 区域销售柱状图
-        fig_region_bar = px.bar(
-            region_sales,
-            x='所属区域',
-            y='销售额',
-            title="各区域销售总额",
-            color='所属区域',
-            text='销售额'
-        )
-        fig_region_bar.update_traces(
-            texttemplate='￥%{text:,.2f}',
-            textposition='outside'
-        )
-        fig_region_bar.update_layout(
-            xaxis_title="区域",
-            yaxis_title="销售总额 (元)",
-            yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元")
-        )
-        st.plotly_chart(fig_region_bar, use_container_width=True)
+        def build_region_bar(region_chart, region_total):
+            fig_region_bar = px.bar(
+                region_chart,
+                x='所属区域',
+                y='销售额',
+                title=limited_title("各区域销售总额", item_count(region_chart, '所属区域'), region_total, '个区域'),
+                color='所属区域',
+                text='销售额'
+            )
+            fig_region_bar.update_traces(
+                texttemplate='￥%{text:,.2f}',
+                textposition='outside'
+            )
+            fig_region_bar.update_layout(
+                xaxis_title="区域",
+                yaxis_title="销售总额 (元)",
+                yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元")
+            )
+            return fig_region_bar
+
+        fig_region_bar = cached_figure('region_bar', build_region_bar, region_chart, region_total)
+        plotly_chart(fig_region_bar, use_container_width=True)
 
     with cols[1]:
         # 区域销售占比饼图
-        fig_region_pie = px.pie(
-            region_sales,
-            values='销售额',
-            names='所属区域',
-            title='各区域销售占比'
-        )
-        fig_region_pie.update_traces(
-            textinfo='percent+label',
-            hovertemplate='%{label}: %{value:,.2f}元 (%{percent})'
-        )
-        st.plotly_chart(fig_region_pie, use_container_width=True)
+        def build_region_pie(region_chart, region_total):
+            fig_region_pie = px.pie(
+                region_chart,
+                values='销售额',
+                names='所属区域',
+                title=limited_title('各区域销售占比', item_count(region_chart, '所属区域'), region_total, '个区域')
+            )
+            fig_region_pie.update_traces(
+                textinfo='percent+label',
+                hovertemplate='%{label}: %{value:,.2f}元 (%{percent})'
+            )
+            return fig_region_pie
+
+        fig_region_pie = cached_figure('region_pie', build_region_pie, region_chart, region_total)
+        plotly_chart(fig_region_pie, use_container_width=True)
 
     # 添加图表解释
     add_chart_explanation("""
@@ -564,49 +685,59 @@ with tabs[0]:  # 销售概览
     st.markdown('<div class="sub-header">📦 产品销售与包装分析</div>', unsafe_allow_html=True)
 
     # 提取包装类型数据
-    packaging_sales = filtered_df.groupby('包装类型')['销售额'].sum().reset_index()
-    packaging_sales = packaging_sales.sort_values(by='销售额', ascending=False)
+    packaging_sales = cached_analysis(sales_api.packaging_sales)
+    packaging_chart, packaging_total = top_categories(packaging_sales, '包装类型', '销售额')
 
     cols = st.columns(2)
     with cols[0]:
         # 包装类型销售柱状图
-        fig_packaging = px.bar(
-            packaging_sales,
-            x='包装类型',
-            y='销售额',
-            title="不同包装类型销售额",
-            color='包装类型',
-            text='销售额'
-        )
-        fig_packaging.update_traces(
-            texttemplate='￥%{text:,.2f}',
-            textposition='outside'
-        )
-        fig_packaging.update_layout(
-            xaxis_title="包装类型",
-            yaxis_title="销售额 (元)",
-            yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元")
-        )
-        st.plotly_chart(fig_packaging, use_container_width=True)
+        def build_packaging(packaging_chart, packaging_total):
+            fig_packaging = px.bar(
+                packaging_chart,
+                x='包装类型',
+                y='销售额',
+                title=limited_title("不同包装类型销售额", item_count(packaging_chart, '包装类型'), packaging_total, '种包装'),
+                color='包装类型',
+                text='销售额'
+            )
+            fig_packaging.update_traces(
+                texttemplate='￥%{text:,.2f}',
+                textposition='outside'
+            )
+            fig_packaging.update_layout(
+                xaxis_title="包装类型",
+                yaxis_title="销售额 (元)",
+                yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元")
+            )
+            return fig_packaging
+
+        fig_packaging = cached_figure('packaging', build_packaging, packaging_chart, packaging_total)
+        plotly_chart(fig_packaging, use_container_width=True)
 
     with cols[1]:
-        # 产品价格-销量散点图
-        fig_price_volume = px.scatter(
-            filtered_df,
-            x='单价（箱）',
-            y='数量（箱）',
-            color='所属区域',
-            size='销售额',
-            hover_name='简化产品名称',
-            title="产品价格-销量关系",
-            size_max=50
-        )
-        fig_price_volume.update_layout(
-            xaxis_title="单价 (元/箱)",
-            yaxis_title="销售数量 (箱)",
-            xaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元")
-        )
-        st.plotly_chart(fig_price_volume, use_container_width=True)
+        # 产品价格-销量散点图（订单行过多时分层抽样）
+        price_volume_points, price_volume_total = downsample_points(filtered_df, '单价（箱）', '数量（箱）')
+        def build_price_volume(price_volume_points, price_volume_total):
+            fig_price_volume = px.scatter(
+                price_volume_points,
+                x='单价（箱）',
+                y='数量（箱）',
+                color='所属区域',
+                size='销售额',
+                hover_name='简化产品名称',
+                title=limited_title("产品价格-销量关系", len(price_volume_points), price_volume_total, '个点'),
+                size_max=50,
+                render_mode=scatter_render_mode(len(price_volume_points))
+            )
+            fig_price_volume.update_layout(
+                xaxis_title="单价 (元/箱)",
+                yaxis_title="销售数量 (箱)",
+                xaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元")
+            )
+            return fig_price_volume
+
+        fig_price_volume = cached_figure('price_volume', build_price_volume, price_volume_points, price_volume_total)
+        plotly_chart(fig_price_volume, use_container_width=True)
 
     # 添加图表解释
     add_chart_explanation("""
@@ -619,69 +750,74 @@ with tabs[0]:  # 销售概览
     st.markdown('<div class="sub-header">👨‍💼 申请人销售业绩分析</div>', unsafe_allow_html=True)
 
     # 计算申请人业绩数据
-    applicant_performance = filtered_df.groupby('申请人').agg({
-        '销售额': 'sum',
-        '客户简称': pd.Series.nunique,
-        '产品代码': pd.Series.nunique
-    }).reset_index()
-
-    applicant_performance.columns = ['申请人', '销售额', '服务客户数', '销售产品种类数']
-    applicant_performance = applicant_performance.sort_values('销售额', ascending=False)
+    applicant_performance = cached_analysis(sales_api.applicant_performance)
+    # 申请人过多时只显示销售额前N名，其余合并为“其他”（覆盖情况无法合并，只显示前N名）
+    applicant_chart, applicant_total = top_categories(applicant_performance, '申请人', '销售额')
+    applicant_coverage = applicant_performance[applicant_performance['申请人'].astype(str).isin(applicant_chart['申请人'])]
 
     cols = st.columns(2)
     with cols[0]:
         # 申请人销售额排名
-        fig_applicant_sales = px.bar(
-            applicant_performance,
-            x='申请人',
-            y='销售额',
-            title="申请人销售额排名",
-            color_discrete_sequence=['royalblue'],  # 使用固定颜色而不是渐变
-            text='销售额'
-        )
-        fig_applicant_sales.update_traces(
-            texttemplate='￥%{text:,.2f}',
-            textposition='outside'
-        )
-        fig_applicant_sales.update_layout(
-            xaxis_title="申请人",
-            yaxis_title="销售额 (元)",
-            yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元"),
-        )
-        st.plotly_chart(fig_applicant_sales, use_container_width=True)
+        def build_applicant_sales(applicant_chart, applicant_total):
+            fig_applicant_sales = px.bar(
+                applicant_chart,
+                x='申请人',
+                y='销售额',
+                title=limited_title("申请人销售额排名", item_count(applicant_chart, '申请人'), applicant_total, '名申请人'),
+                color_discrete_sequence=['royalblue'],  # 使用固定颜色而不是渐变
+                text='销售额'
+            )
+            fig_applicant_sales.update_traces(
+                texttemplate='￥%{text:,.2f}',
+                textposition='outside'
+            )
+            fig_applicant_sales.update_layout(
+                xaxis_title="申请人",
+                yaxis_title="销售额 (元)",
+                yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元"),
+            )
+            return fig_applicant_sales
+
+        fig_applicant_sales = cached_figure('applicant_sales', build_applicant_sales, applicant_chart, applicant_total)
+        plotly_chart(fig_applicant_sales, use_container_width=True)
 
     with cols[1]:
         # 客户与产品覆盖情况
-        fig_applicant_coverage = go.Figure()
-
-        # 服务客户数柱状图
-        fig_applicant_coverage.add_trace(go.Bar(
-            x=applicant_performance['申请人'],
-            y=applicant_performance['服务客户数'],
-            name='服务客户数',
-            marker_color='royalblue',
-            text=applicant_performance['服务客户数'],
-            textposition='outside'
-        ))
-
-        # 销售产品种类数柱状图
-        fig_applicant_coverage.add_trace(go.Bar(
-            x=applicant_performance['申请人'],
-            y=applicant_performance['销售产品种类数'],
-            name='销售产品种类数',
-            marker_color='lightcoral',
-            text=applicant_performance['销售产品种类数'],
-            textposition='outside'
-        ))
-
-        fig_applicant_coverage.update_layout(
-            title="客户与产品覆盖情况",
-            xaxis_title="申请人",
-            yaxis_title="数量",
-            barmode='group',
-            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-        )
-        st.plotly_chart(fig_applicant_coverage, use_container_width=True)
+        def build_applicant_coverage(applicant_coverage, applicant_total):
+            fig_applicant_coverage = go.Figure()
+
+            # 服务客户数柱状图
+            fig_applicant_coverage.add_trace(go.Bar(
+                x=applicant_coverage['申请人'],
+                y=applicant_coverage['服务客户数'],
+                name='服务客户数',
+                marker_color='royalblue',
+                text=applicant_coverage['服务客户数'],
+                textposition='outside'
+            ))
+
+            # 销售产品种类数柱状图
+            fig_applicant_coverage.add_trace(go.Bar(
+                x=applicant_coverage['申请人'],
+                y=applicant_coverage['销售产品种类数'],
+                name='销售产品种类数',
+                marker_color='lightcoral',
+                text=applicant_coverage['销售产品种类数'],
+                textposition='outside'
+            ))
+
+            fig_applicant_coverage.update_layout(
+                title=limited_title("客户与产品覆盖情况", len(applicant_coverage), applicant_total, '名申请人'),
+                xaxis_title="申请人",
+                yaxis_title="数量",
+                barmode='group',
+                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+            )
+            return fig_applicant_coverage
+
+        fig_applicant_coverage = cached_figure('applicant_coverage', build_applicant_coverage,
+                                               applicant_coverage, applicant_total)
+        plotly_chart(fig_applicant_coverage, use_container_width=True)
 
     # 添加图表解释
     add_chart_explanation("""
@@ -694,14 +830,17 @@ with tabs[0]:  # 销售概览
     with st.expander("查看筛选后的原始数据"):
         st.dataframe(filtered_df)
 
-with tabs[1]:  # 新品分析
+def render_new_products():
+    """新品分析"""
+    kpis = cached_analysis(sales_api.kpis)
+
     st.markdown('<div class="sub-header">🆕 新品销售分析</div>', unsafe_allow_html=True)
 
     # 新品KPI指标
     col1, col2, col3 = st.columns(3)
 
     # 新品销售额
-    new_products_sales = filtered_new_products_df['销售额'].sum()
+    new_products_sales = kpis['新品销售额']
     with col1:
         st.markdown(f"""
         <div class="metric-card">
@@ -712,7 +851,7 @@ with tabs[1]:  # 新品分析
         """, unsafe_allow_html=True)
 
     # 新品销售占比
-    new_products_percentage = (new_products_sales / total_sales * 100) if total_sales > 0 else 0
+    new_products_percentage = kpis['新品销售占比']
     with col2:
         st.markdown(f"""
         <div class="metric-card">
@@ -723,7 +862,7 @@ with tabs[1]:  # 新品分析
         """, unsafe_allow_html=True)
 
     # 购买新品的客户数
-    new_products_customers = filtered_new_products_df['客户简称'].nunique()
+    new_products_customers = kpis['购买新品客户数']
     with col3:
         st.markdown(f"""
         <div class="metric-card">
@@ -736,55 +875,61 @@ with tabs[1]:  # 新品分析
     # 新品销售详情
     st.markdown('<div class="sub-header">新品销售表现分析</div>', unsafe_allow_html=True)
 
-    if not filtered_new_products_df.empty:
+    if not filtered_new_cube.empty:
         # 创建新品销售分析图表
         cols = st.columns(2)
 
         with cols[0]:
             # 各新品销售额对比
-            product_sales = filtered_new_products_df.groupby(['产品代码', '简化产品名称'])['销售额'].sum().reset_index()
-            product_sales = product_sales.sort_values('销售额', ascending=False)
+            product_sales = cached_analysis(sales_api.new_product_sales)
+
+            def build_product_sales(product_sales):
+                fig_product_sales = px.bar(
+                    product_sales,
+                    x='简化产品名称',
+                    y='销售额',
+                    title="各新品销售额对比",
+                    color='简化产品名称',
+                    text='销售额'
+                )
+                fig_product_sales.update_traces(
+                    texttemplate='￥%{text:,.2f}',
+                    textposition='outside'
+                )
+                fig_product_sales.update_layout(
+                    xaxis_title="新品名称",
+                    yaxis_title="销售额 (元)",
+                    yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元"),
+                    showlegend=False
+                )
+                return fig_product_sales
 
-            fig_product_sales = px.bar(
-                product_sales,
-                x='简化产品名称',
-                y='销售额',
-                title="各新品销售额对比",
-                color='简化产品名称',
-                text='销售额'
-            )
-            fig_product_sales.update_traces(
-                texttemplate='￥%{text:,.2f}',
-                textposition='outside'
-            )
-            fig_product_sales.update_layout(
-                xaxis_title="新品名称",
-                yaxis_title="销售额 (元)",
-                yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元"),
-                showlegend=False
-            )
-            st.plotly_chart(fig_product_sales, use_container_width=True)
+            fig_product_sales = cached_figure('product_sales', build_product_sales, product_sales)
+            plotly_chart(fig_product_sales, use_container_width=True)
 
         with cols[1]:
             # 各区域新品销售额
-            region_product_sales = filtered_new_products_df.groupby(['所属区域', '简化产品名称'])[
-                '销售额'].sum().reset_index()
+            region_product_sales = cached_analysis(sales_api.region_new_product_sales)
 
-            fig_region_product = px.bar(
-                region_product_sales,
-                x='所属区域',
-                y='销售额',
-                color='简化产品名称',
-                title="各区域新品销售额",
-                barmode='stack'
-            )
-            fig_region_product.update_layout(
-                xaxis_title="区域",
-                yaxis_title="销售额 (元)",
-                yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元"),
-                legend_title="新品名称"
-            )
-            st.plotly_chart(fig_region_product, use_container_width=True)
+            def build_region_product(region_product_sales):
+                fig_region_product = px.bar(
+                    region_product_sales,
+                    x='所属区域',
+                    y='销售额',
+                    color='简化产品名称',
+                    title="各区域新品销售额",
+                    barmode='stack'
+                )
+                fig_region_product.update_layout(
+                    xaxis_title="区域",
+                    yaxis_title="销售额 (元)",
+                    yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元"),
+                    legend_title="新品名称"
+                )
+                return fig_region_product
+
+            fig_region_product = cached_figure('region_product', build_region_product, region_product_sales)
+            plotly_chart(fig_region_product, use_container_width=True)
 
         # 添加图表解释
         add_chart_explanation("""
@@ -799,46 +944,47 @@ with tabs[1]:  # 新品分析
         cols = st.columns(2)
         with cols[0]:
             # 新品与非新品销售占比饼图
-            fig_sales_ratio = px.pie(
-                names=['新品', '非新品'],
-                values=[new_products_sales, total_sales - new_products_sales],
-                title="新品与非新品销售占比"
-            )
-            fig_sales_ratio.update_traces(
-                textinfo='percent+label',
-                hovertemplate='%{label}: %{value:,.2f}元 (%{percent})'
-            )
-            st.plotly_chart(fig_sales_ratio, use_container_width=True)
+            def build_sales_ratio(new_products_sales, total_sales):
+                fig_sales_ratio = px.pie(
+                    names=['新品', '非新品'],
+                    values=[new_products_sales, total_sales - new_products_sales],
+                    title="新品与非新品销售占比"
+                )
+                fig_sales_ratio.update_traces(
+                    textinfo='percent+label',
+                    hovertemplate='%{label}: %{value:,.2f}元 (%{percent})'
+                )
+                return fig_sales_ratio
+
+            fig_sales_ratio = cached_figure('sales_ratio', build_sales_ratio, new_products_sales, kpis['总销售额'])
+            plotly_chart(fig_sales_ratio, use_container_width=True)
 
         with cols[1]:
             # 各区域新品销售占比
-            region_total_sales = filtered_df.groupby('所属区域')['销售额'].sum().reset_index()
-            region_new_sales = filtered_new_products_df.groupby('所属区域')['销售额'].sum().reset_index()
+            region_sales_ratio = cached_analysis(sales_api.region_new_sales_ratio)
 
-            region_sales_ratio = pd.merge(region_total_sales, region_new_sales, on='所属区域', how='left',
-                                          suffixes=('_total', '_new'))
-            region_sales_ratio['new_ratio'] = region_sales_ratio['销售额_new'].fillna(0) / region_sales_ratio[
-                '销售额_total'] * 100
-            region_sales_ratio = region_sales_ratio.sort_values('new_ratio', ascending=False)
+            def build_region_ratio(region_sales_ratio):
+                fig_region_ratio = px.bar(
+                    region_sales_ratio,
+                    x='所属区域',
+                    y='new_ratio',
+                    title="各区域新品销售占比",
+                    color='所属区域',
+                    text='new_ratio'
+                )
+                fig_region_ratio.update_traces(
+                    texttemplate='%{text:.2f}%',
+                    textposition='outside'
+                )
+                fig_region_ratio.update_layout(
+                    xaxis_title="区域",
+                    yaxis_title="新品销售占比 (%)",
+                    showlegend=False
+                )
+                return fig_region_ratio
 
-            fig_region_ratio = px.bar(
-                region_sales_ratio,
-                x='所属区域',
-                y='new_ratio',
-                title="各区域新品销售占比",
-                color='所属区域',
-                text='new_ratio'
-            )
-            fig_region_ratio.update_traces(
-                texttemplate='%{text:.2f}%',
-                textposition='outside'
-            )
-            fig_region_ratio.update_layout(
-                xaxis_title="区域",
-                yaxis_title="新品销售占比 (%)",
-                showlegend=False
-            )
-            st.plotly_chart(fig_region_ratio, use_container_width=True)
+            fig_region_ratio = cached_figure('region_ratio', build_region_ratio, region_sales_ratio)
+            plotly_chart(fig_region_ratio, use_container_width=True)
 
         # 添加图表解释
         add_chart_explanation(f"""
@@ -856,126 +1002,138 @@ with tabs[1]:  # 新品分析
         else:
             st.info("当前筛选条件下没有新品数据。")
 
-with tabs[2]:  # 客户细分
+def render_customer_segments():
+    """客户细分"""
     st.markdown('<div class="sub-header">👥 客户细分分析</div>', unsafe_allow_html=True)
 
-    if not filtered_df.empty:
-        # 计算客户特征
-        customer_features = filtered_df.groupby('客户简称').agg({
-            '销售额': 'sum',  # 总销售额
-            '产品代码': lambda x: len(set(x)),  # 购买的不同产品数量
-            '数量（箱）': 'sum',  # 总购买数量
-            '单价（箱）': 'mean'  # 平均单价
-        }).reset_index()
-
-        # 添加新品购买指标
-        new_products_by_customer = filtered_new_products_df.groupby('客户简称')['销售额'].sum().reset_index()
-        customer_features = customer_features.merge(new_products_by_customer, on='客户简称', how='left',
-                                                    suffixes=('', '_新品'))
-        customer_features['销售额_新品'] = customer_features['销售额_新品'].fillna(0)
-        customer_features['新品占比'] = customer_features['销售额_新品'] / customer_features['销售额'] * 100
-
-        # 简单客户分类
-        customer_features['客户类型'] = pd.cut(
-            customer_features['新品占比'],
-            bins=[0, 10, 30, 100],
-            labels=['保守型客户', '平衡型客户', '创新型客户']
+    if not filtered_cube.empty:
+        # 细分方式：按客户特征聚类得到客群，或按新品占比固定分为三档
+        segment_mode = st.radio(
+            "细分方式", ["聚类分群", "新品占比三档"], horizontal=True, key="segment_mode",
+            help="聚类分群按销售额、产品种类数、采购量、平均单价、新品占比和最近购买间隔自动划分客群"
         )
+        segment_model = None
+        if segment_mode == "聚类分群":
+            cluster_count = st.selectbox("客群数", ['自动', 2, 3, 4, 5, 6], key="cluster_count")
+            segment_model = get_segment_model(None if cluster_count == '自动' else cluster_count)
+            if segment_model is None:
+                st.info(f"客户数量少于 {MIN_CUSTOMERS} 个，无法聚类，使用新品占比三档分类。")
+
+        if segment_model is not None:
+            # 计算客户特征及所属客群
+            customer_features = cached_analysis(sales_api.customer_clusters, model=segment_model)
+
+            # 客群画像：各客群的客户数和特征均值
+            st.markdown("### 客群画像")
+            st.caption(f"客群模型在全部 {segment_model.profile['客户数'].sum():,} 名客户上拟合（k={segment_model.k}，"
+                       f"轮廓系数 {segment_model.silhouette:.2f}），当前筛选范围内的客户按最近的客群中心分配。")
+            st.dataframe(segment_model.profile, hide_index=True, use_container_width=True, column_config={
+                '销售额': st.column_config.NumberColumn(format="¥%.0f"),
+                '数量（箱）': st.column_config.NumberColumn(format="%.0f"),
+                '产品种类数': st.column_config.NumberColumn(format="%.1f"),
+                '平均单价': st.column_config.NumberColumn(format="¥%.2f"),
+                '新品占比': st.column_config.NumberColumn(format="%.2f%%"),
+                '最近购买间隔（月）': st.column_config.NumberColumn(format="%.1f"),
+            })
+        else:
+            # 计算客户特征
+            customer_features = cached_analysis(sales_api.customer_features)
 
-        # 添加客户类型解释
-        st.markdown("""
-        ### 客户类型分类标准
-        - **保守型客户**：新品销售占比在0-10%之间，对新品接受度较低，倾向于购买成熟稳定的产品。
-        - **平衡型客户**：新品销售占比在10-30%之间，对新品有一定接受度，同时保持对现有产品的购买。
-        - **创新型客户**：新品销售占比在30-100%之间，积极尝试新品，是推广新产品的重要客户群体。
-        """)
+            # 添加客户类型解释
+            st.markdown("""
+            ### 客户类型分类标准
+            - **保守型客户**：新品销售占比在0-10%之间，对新品接受度较低，倾向于购买成熟稳定的产品。
+            - **平衡型客户**：新品销售占比在10-30%之间，对新品有一定接受度，同时保持对现有产品的购买。
+            - **创新型客户**：新品销售占比在30-100%之间，积极尝试新品，是推广新产品的重要客户群体。
+            """)
 
         # 客户分类概览
         st.markdown('<div class="sub-header">客户类型分布与特征分析</div>', unsafe_allow_html=True)
 
         # 计算客户类型统计数据
-        customer_segments = customer_features.groupby('客户类型').agg({
-            '客户简称': 'count',
-            '销售额': 'mean',
-            '新品占比': 'mean'
-        }).reset_index()
-
-        customer_segments.columns = ['客户类型', '客户数量', '平均销售额', '平均新品占比']
+        customer_segments = cached_analysis(sales_api.customer_segments, model=segment_model)
 
         # 创建客户类型分析图表
         cols = st.columns(2)
 
         with cols[0]:
             # 客户类型分布
-            fig_customer_dist = px.bar(
-                customer_segments,
-                x='客户类型',
-                y='客户数量',
-                title="客户类型分布",
-                color='客户类型',
-                text='客户数量'
-            )
-            fig_customer_dist.update_traces(
-                textposition='outside'
-            )
-            fig_customer_dist.update_layout(
-                xaxis_title="客户类型",
-                yaxis_title="客户数量",
-                showlegend=False
-            )
-            st.plotly_chart(fig_customer_dist, use_container_width=True)
+            def build_customer_dist(customer_segments):
+                fig_customer_dist = px.bar(
+                    customer_segments,
+                    x='客户类型',
+                    y='客户数量',
+                    title="客户类型分布",
+                    color='客户类型',
+                    text='客户数量'
+                )
+                fig_customer_dist.update_traces(
+                    textposition='outside'
+                )
+                fig_customer_dist.update_layout(
+                    xaxis_title="客户类型",
+                    yaxis_title="客户数量",
+                    showlegend=False
+                )
+                return fig_customer_dist
+
+            fig_customer_dist = cached_figure('customer_dist', build_customer_dist, customer_segments)
+            plotly_chart(fig_customer_dist, use_container_width=True)
 
         with cols[1]:
             # 客户类型特征对比
-            fig_customer_features = make_subplots(specs=[[{"secondary_y": True}]])
-
-            # 平均销售额柱状图
-            fig_customer_features.add_trace(
-                go.Bar(
-                    x=customer_segments['客户类型'],
-                    y=customer_segments['平均销售额'],
-                    name='平均销售额',
-                    marker_color='royalblue',
-                    text=[f"￥{val:,.2f}" for val in customer_segments['平均销售额']],
-                    textposition='outside'
-                ),
-                secondary_y=False
-            )
+            def build_customer_features(customer_segments):
+                fig_customer_features = make_subplots(specs=[[{"secondary_y": True}]])
+
+                # 平均销售额柱状图
+                fig_customer_features.add_trace(
+                    go.Bar(
+                        x=customer_segments['客户类型'],
+                        y=customer_segments['平均销售额'],
+                        name='平均销售额',
+                        marker_color='royalblue',
+                        text=[f"￥{val:,.2f}" for val in customer_segments['平均销售额']],
+                        textposition='outside'
+                    ),
+                    secondary_y=False
+                )
 
-            # 平均新品占比线图
-            fig_customer_features.add_trace(
-                go.Scatter(
-                    x=customer_segments['客户类型'],
-                    y=customer_segments['平均新品占比'],
-                    name='平均新品占比',
-                    mode='lines+markers+text',
-                    line=dict(color='red', width=2),
-                    marker=dict(size=10),
-                    text=[f"{val:.2f}%" for val in customer_segments['平均新品占比']],
-                    textposition='top center'
-                ),
-                secondary_y=True
-            )
+                # 平均新品占比线图
+                fig_customer_features.add_trace(
+                    go.Scatter(
+                        x=customer_segments['客户类型'],
+                        y=customer_segments['平均新品占比'],
+                        name='平均新品占比',
+                        mode='lines+markers+text',
+                        line=dict(color='red', width=2),
+                        marker=dict(size=10),
+                        text=[f"{val:.2f}%" for val in customer_segments['平均新品占比']],
+                        textposition='top center'
+                    ),
+                    secondary_y=True
+                )
 
-            fig_customer_features.update_layout(
-                title="客户类型特征对比",
-                xaxis_title="客户类型",
-                legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-            )
+                fig_customer_features.update_layout(
+                    title="客户类型特征对比",
+                    xaxis_title="客户类型",
+                    legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+                )
 
-            # 更新Y轴
-            fig_customer_features.update_yaxes(
-                title_text="平均销售额 (元)",
-                secondary_y=False,
-                tickprefix="￥",
-                tickformat=",.2f"
-            )
-            fig_customer_features.update_yaxes(
-                title_text="平均新品占比 (%)",
-                secondary_y=True
-            )
+                # 更新Y轴
+                fig_customer_features.update_yaxes(
+                    title_text="平均销售额 (元)",
+                    secondary_y=False,
+                    tickprefix="￥",
+                    tickformat=",.2f"
+                )
+                fig_customer_features.update_yaxes(
+                    title_text="平均新品占比 (%)",
+                    secondary_y=True
+                )
+                return fig_customer_features
 
-            st.plotly_chart(fig_customer_features, use_container_width=True)
+            fig_customer_features = cached_figure('customer_features', build_customer_features, customer_segments)
+            plotly_chart(fig_customer_features, use_container_width=True)
 
         # 添加图表解释
         add_chart_explanation("""
@@ -987,58 +1145,66 @@ with tabs[2]:  # 客户细分
         # 客户销售额和新品占比散点图
         st.markdown('<div class="sub-header">客户销售额与新品占比关系</div>', unsafe_allow_html=True)
 
-        fig_customer_scatter = px.scatter(
-            customer_features,
-            x='销售额',
-            y='新品占比',
-            color='客户类型',
-            size='产品代码',  # 购买的产品种类数量
-            hover_name='客户简称',
-            title='客户销售额与新品占比关系',
-            labels={
-                '销售额': '销售额 (元)',
-                '新品占比': '新品销售占比 (%)',
-                '产品代码': '购买产品种类数',
-                '客户类型': '客户类型'
-            },
-            color_discrete_map={
-                '保守型客户': 'blue',
-                '平衡型客户': 'orange',
-                '创新型客户': 'red'
-            }
-        )
+        # 客户过多时按销售额和新品占比分层抽样
+        customer_points, customer_total = downsample_points(customer_features, '销售额', '新品占比')
+        def build_customer_scatter(customer_points, customer_total, customer_features, three_bin):
+            fig_customer_scatter = px.scatter(
+                customer_points,
+                x='销售额',
+                y='新品占比',
+                color='客户类型',
+                size='产品代码',  # 购买的产品种类数量
+                hover_name='客户简称',
+                title=limited_title('客户销售额与新品占比关系', len(customer_points), customer_total, '名客户'),
+                render_mode=scatter_render_mode(len(customer_points)),
+                labels={
+                    '销售额': '销售额 (元)',
+                    '新品占比': '新品销售占比 (%)',
+                    '产品代码': '购买产品种类数',
+                    '客户类型': '客户类型'
+                },
+                color_discrete_map={
+                    '保守型客户': 'blue',
+                    '平衡型客户': 'orange',
+                    '创新型客户': 'red'
+                } if three_bin else None
+            )
 
-        # 添加分隔线
-        fig_customer_scatter.add_shape(
-            type="line",
-            x0=customer_features['销售额'].min(),
-            x1=customer_features['销售额'].max(),
-            y0=10, y1=10,
-            line=dict(color="orange", width=1, dash="dash")
-        )
+            # 三档分类时添加分隔线
+            if three_bin:
+                fig_customer_scatter.add_shape(
+                    type="line",
+                    x0=customer_features['销售额'].min(),
+                    x1=customer_features['销售额'].max(),
+                    y0=10, y1=10,
+                    line=dict(color="orange", width=1, dash="dash")
+                )
 
-        fig_customer_scatter.add_shape(
-            type="line",
-            x0=customer_features['销售额'].min(),
-            x1=customer_features['销售额'].max(),
-            y0=30, y1=30,
-            line=dict(color="red", width=1, dash="dash")
-        )
+                fig_customer_scatter.add_shape(
+                    type="line",
+                    x0=customer_features['销售额'].min(),
+                    x1=customer_features['销售额'].max(),
+                    y0=30, y1=30,
+                    line=dict(color="red", width=1, dash="dash")
+                )
 
-        fig_customer_scatter.update_layout(
-            xaxis=dict(
-                title="销售额 (元)",
-                tickprefix="￥",
-                tickformat=",.0f",  # 使用,.0f格式而不是默认的格式
-                ticksuffix=" 元"  # 明确指定后缀为" 元"
-            ),
-            yaxis=dict(
-                title="新品销售占比 (%)",
-                range=[0, 100]
+            fig_customer_scatter.update_layout(
+                xaxis=dict(
+                    title="销售额 (元)",
+                    tickprefix="￥",
+                    tickformat=",.0f",  # 使用,.0f格式而不是默认的格式
+                    ticksuffix=" 元"  # 明确指定后缀为" 元"
+                ),
+                yaxis=dict(
+                    title="新品销售占比 (%)",
+                    range=[0, 100]
+                )
             )
-        )
+            return fig_customer_scatter
 
-        st.plotly_chart(fig_customer_scatter, use_container_width=True)
+        fig_customer_scatter = cached_figure('customer_scatter', build_customer_scatter, customer_points,
+                                             customer_total, customer_features, segment_model is None)
+        plotly_chart(fig_customer_scatter, use_container_width=True)
 
         # 添加图表解释
         add_chart_explanation("""
@@ -1053,36 +1219,39 @@ with tabs[2]:  # 客户细分
         # 选取新品占比最高的前10名客户
         top_acceptance = customer_features.sort_values('新品占比', ascending=False).head(10)
 
-        fig_top_acceptance = px.bar(
-            top_acceptance,
-            x='客户简称',
-            y='新品占比',
-            title='新品接受度最高的前10名客户',
-            color='新品占比',
-            text='新品占比',
-            hover_data=['销售额', '销售额_新品']
-        )
-        fig_top_acceptance.update_traces(
-            texttemplate='%{text:.2f}%',
-            textposition='outside'
-        )
-        fig_top_acceptance.update_layout(
-            xaxis_title="客户",
-            yaxis_title="新品销售占比 (%)",
-            coloraxis_showscale=False
-        )
+        def build_top_acceptance(top_acceptance):
+            fig_top_acceptance = px.bar(
+                top_acceptance,
+                x='客户简称',
+                y='新品占比',
+                title='新品接受度最高的前10名客户',
+                color='新品占比',
+                text='新品占比',
+                hover_data=['销售额', '销售额_新品']
+            )
+            fig_top_acceptance.update_traces(
+                texttemplate='%{text:.2f}%',
+                textposition='outside'
+            )
+            fig_top_acceptance.update_layout(
+                xaxis_title="客户",
+                yaxis_title="新品销售占比 (%)",
+                coloraxis_showscale=False
+            )
 
-        # 添加参考线
-        fig_top_acceptance.add_shape(
-            type="line",
-            x0=-0.5,
-            x1=len(top_acceptance) - 0.5,
-            y0=30,
-            y1=30,
-            line=dict(color="red", width=1, dash="dash")
-        )
+            # 添加参考线
+            fig_top_acceptance.add_shape(
+                type="line",
+                x0=-0.5,
+                x1=len(top_acceptance) - 0.5,
+                y0=30,
+                y1=30,
+                line=dict(color="red", width=1, dash="dash")
+            )
+            return fig_top_acceptance
 
-        st.plotly_chart(fig_top_acceptance, use_container_width=True)
+        fig_top_acceptance = cached_figure('top_acceptance', build_top_acceptance, top_acceptance)
+        plotly_chart(fig_top_acceptance, use_container_width=True)
 
         # 添加图表解释
         add_chart_explanation("""
@@ -1096,6 +1265,10 @@ with tabs[2]:  # 客户细分
             display_columns = ['客户简称', '客户类型', '销售额', '销售额_新品', '新品占比', '产品代码', '数量（箱）',
                                '单价（箱）']
             display_df = customer_features[display_columns].copy()
+            # 所属区域和申请人取自客户维度表
+            customer_names = display_df['客户简称'].astype(str)
+            display_df.insert(1, '所属区域', customer_names.map(customer_region_mapping))
+            display_df.insert(2, '申请人', customer_names.map(label_map(dataset.customers, '申请人')))
             # 格式化数值列
             display_df['销售额'] = display_df['销售额'].apply(lambda x: f"¥{x:,.2f}")
             display_df['销售额_新品'] = display_df['销售额_新品'].apply(lambda x: f"¥{x:,.2f}")
@@ -1103,18 +1276,19 @@ with tabs[2]:  # 客户细分
             display_df['单价（箱）'] = display_df['单价（箱）'].apply(lambda x: f"¥{x:.2f}")
 
             # 重命名列以便更好显示
-            display_df.columns = ['客户简称', '客户类型', '总销售额', '新品销售额', '新品占比',
-                                  '购买产品种类数', '总购买数量(箱)', '平均单价(元/箱)']
+            display_df.columns = ['客户简称', '所属区域', '申请人', '客户类型', '总销售额', '新品销售额',
+                                  '新品占比', '购买产品种类数', '总购买数量(箱)', '平均单价(元/箱)']
 
             st.dataframe(display_df, use_container_width=True)
     else:
         st.warning("当前筛选条件下没有客户数据。请调整筛选条件。")
 
-with tabs[3]:  # 产品组合
+def render_product_mix():
+    """产品组合"""
     st.markdown('<div class="sub-header">🔄 产品组合分析</div>', unsafe_allow_html=True)
 
-    if not filtered_df.empty and len(filtered_df['客户简称'].unique()) > 1 and len(
-            filtered_df['产品代码'].unique()) > 1:
+    if not filtered_cube.empty and len(filtered_cube['客户简称'].unique()) > 1 and len(
+            filtered_cube['产品代码'].unique()) > 1:
         # 共现矩阵分析介绍
         st.markdown("""
         ### 共现分析说明
@@ -1122,28 +1296,8 @@ with tabs[3]:  # 产品组合
         这一分析对于产品组合营销、交叉销售和货架陈列优化具有重要指导意义。
         """)
 
-        # 准备数据 - 创建交易矩阵
-        transaction_data = filtered_df.groupby(['客户简称', '产品代码'])['销售额'].sum().unstack().fillna(0)
-        # 转换为二进制格式（是否购买）
-        transaction_binary = transaction_data.applymap(lambda x: 1 if x > 0 else 0)
-
-        # 创建产品共现矩阵
-        co_occurrence = pd.DataFrame(0, index=transaction_binary.columns, columns=transaction_binary.columns)
-
-        # 创建产品代码到简化名称的映射
-        name_mapping = {
-            code: filtered_df[filtered_df['产品代码'] == code]['简化产品名称'].iloc[0]
-            if len(filtered_df[filtered_df['产品代码'] == code]) > 0 else code
-            for code in transaction_binary.columns
-        }
-
-        # 计算共现次数
-        for _, row in transaction_binary.iterrows():
-            bought_products = row.index[row == 1].tolist()
-            for p1 in bought_products:
-                for p2 in bought_products:
-                    if p1 != p2:
-                        co_occurrence.loc[p1, p2] += 1
+        # 准备数据 - 创建客户×产品的稀疏购买矩阵（是否购买）及产品共现矩阵
+        incidence, basket_customers, basket_products, co_occurrence = cached_analysis(sales_api.co_occurrence)
 
         # 筛选新品的共现情况
         valid_new_products = [p for p in new_products if p in co_occurrence.index]
@@ -1155,15 +1309,15 @@ with tabs[3]:  # 产品组合
             # 创建整合后的共现数据
             top_co_products = []
             for np_code in valid_new_products:
-                np_name = name_mapping.get(np_code, np_code)
-                top_co = co_occurrence.loc[np_code].sort_values(ascending=False).head(5)
+                np_name = product_name_mapping.get(np_code, np_code)
+                top_co = top_co_occurring(co_occurrence, np_code, 5)
                 for product_code, count in top_co.items():
                     if count > 0 and product_code not in valid_new_products:  # 只添加有共现且非新品的产品
                         top_co_products.append({
                             '新品代码': np_code,
                             '新品名称': np_name,
                             '共现产品代码': product_code,
-                            '共现产品名称': name_mapping.get(product_code, product_code),
+                            '共现产品名称': product_name_mapping.get(product_code, product_code),
                             '共现次数': count
                         })
 
@@ -1172,32 +1326,35 @@ with tabs[3]:  # 产品组合
 
             if not co_df.empty:
                 # 创建共现分析图表
-                fig_co_analysis = go.Figure()
-
-                # 按新品分组并排序，展示每个新品的前3个共现产品
-                for new_product in co_df['新品名称'].unique():
-                    product_data = co_df[co_df['新品名称'] == new_product].sort_values('共现次数',
-                                                                                       ascending=False).head(3)
-
-                    # 为每个新品创建独立的分组条形图
-                    for i, row in product_data.iterrows():
-                        fig_co_analysis.add_trace(go.Bar(
-                            x=[row['新品名称']],
-                            y=[row['共现次数']],
-                            name=row['共现产品名称'],
-                            text=[row['共现产品名称']],
-                            textposition='auto'
-                        ))
-
-                fig_co_analysis.update_layout(
-                    title="新品与热门产品共现关系 (前3名)",
-                    xaxis_title="新品名称",
-                    yaxis_title="共现次数",
-                    legend_title="共现产品",
-                    barmode='group'
-                )
+                def build_co_analysis(co_df):
+                    fig_co_analysis = go.Figure()
+
+                    # 按新品分组并排序，展示每个新品的前3个共现产品
+                    for new_product in co_df['新品名称'].unique():
+                        product_data = co_df[co_df['新品名称'] == new_product].sort_values('共现次数',
+                                                                                           ascending=False).head(3)
+
+                        # 为每个新品创建独立的分组条形图
+                        for i, row in product_data.iterrows():
+                            fig_co_analysis.add_trace(go.Bar(
+                                x=[row['新品名称']],
+                                y=[row['共现次数']],
+                                name=row['共现产品名称'],
+                                text=[row['共现产品名称']],
+                                textposition='auto'
+                            ))
+
+                    fig_co_analysis.update_layout(
+                        title="新品与热门产品共现关系 (前3名)",
+                        xaxis_title="新品名称",
+                        yaxis_title="共现次数",
+                        legend_title="共现产品",
+                        barmode='group'
+                    )
+                    return fig_co_analysis
 
-                st.plotly_chart(fig_co_analysis, use_container_width=True)
+                fig_co_analysis = cached_figure('co_analysis', build_co_analysis, co_df)
+                plotly_chart(fig_co_analysis, use_container_width=True)
 
                 # 添加图表解释
                 add_chart_explanation("""
@@ -1214,51 +1371,46 @@ with tabs[3]:  # 产品组合
 
                 # 添加与新品高度相关的产品
                 for np_code in valid_new_products:
-                    top_related = co_occurrence.loc[np_code].sort_values(ascending=False).head(3).index.tolist()
+                    top_related = top_co_occurring(co_occurrence, np_code, 3).index.tolist()
                     important_products.update(top_related)
 
                 important_products = list(important_products)
 
                 if len(important_products) > 2:  # 确保有足够的产品进行分析
                     # 创建简化名称映射的列表
-                    important_product_names = [name_mapping.get(code, code) for code in important_products]
+                    important_product_names = [product_name_mapping.get(code, code) for code in important_products]
 
                     # 创建热力图数据
-                    heatmap_data = co_occurrence.loc[important_products, important_products].copy()
+                    heatmap_data = co_occurrence.loc[important_products, important_products]
 
                     # 对角线设为0（产品不与自身共现）
-                    np.fill_diagonal(heatmap_data.values, 0)
+                    heatmap_data = heatmap_data.mask(np.eye(len(heatmap_data), dtype=bool), 0)
 
                     # 创建热力图
-                    fig_heatmap = px.imshow(
-                        heatmap_data,
-                        labels=dict(x="产品", y="产品", color="共现次数"),
-                        x=important_product_names,
-                        y=important_product_names,
-                        color_continuous_scale="Blues",
-                        title="主要产品共现热力图"
-                    )
-
-                    fig_heatmap.update_layout(
-                        xaxis_tickangle=-45
-                    )
-
-                    # 添加数值注释
-                    for i in range(len(important_products)):
-                        for j in range(len(important_products)):
-                            if heatmap_data.iloc[i, j] > 0:  # 只显示非零值
-                                fig_heatmap.add_annotation(
-                                    x=j,
-                                    y=i,
-                                    text=f"{int(heatmap_data.iloc[i, j])}",
-                                    showarrow=False,
-                                    font=dict(
-                                        color="white" if heatmap_data.iloc[
-                                                             i, j] > heatmap_data.max().max() / 2 else "black"
-                                    )
-                                )
-
-                    st.plotly_chart(fig_heatmap, use_container_width=True)
+                    def build_heatmap(heatmap_data, important_product_names):
+                        fig_heatmap = px.imshow(
+                            heatmap_data,
+                            labels=dict(x="产品", y="产品", color="共现次数"),
+                            x=important_product_names,
+                            y=important_product_names,
+                            color_continuous_scale="Blues",
+                            title="主要产品共现热力图"
+                        )
+
+                        fig_heatmap.update_layout(
+                            xaxis_tickangle=-45
+                        )
+
+                        # 数值标注：非零值通过 text/texttemplate 一次性设置，字体颜色由Plotly按格子颜色自动对比
+                        counts = heatmap_data.to_numpy()
+                        fig_heatmap.update_traces(
+                            text=np.where(counts > 0, counts.astype(np.int64).astype(str), ''),
+                            texttemplate='%{text}'
+                        )
+                        return fig_heatmap
+
+                    fig_heatmap = cached_figure('heatmap', build_heatmap, heatmap_data, important_product_names)
+                    plotly_chart(fig_heatmap, use_container_width=True)
 
                     # 添加图表解释
                     add_chart_explanation("""
@@ -1275,7 +1427,8 @@ with tabs[3]:  # 产品组合
             st.markdown('<div class="sub-header">产品购买模式分析</div>', unsafe_allow_html=True)
 
             # 计算平均每单购买的产品种类数
-            avg_products_per_order = transaction_binary.sum(axis=1).mean()
+            customer_product_counts = products_per_customer(incidence, basket_customers)
+            avg_products_per_order = customer_product_counts.mean()
 
             col1, col2 = st.columns(2)
 
@@ -1290,9 +1443,8 @@ with tabs[3]:  # 产品组合
 
             with col2:
                 # 计算含有新品的订单比例
-                orders_with_new_products = transaction_binary[valid_new_products].any(
-                    axis=1).sum() if valid_new_products else 0
-                total_orders = len(transaction_binary)
+                orders_with_new_products = customers_with_any(incidence, basket_products, valid_new_products)
+                total_orders = len(basket_customers)
                 percentage_orders_with_new = (orders_with_new_products / total_orders * 100) if total_orders > 0 else 0
 
                 st.markdown(f"""
@@ -1304,28 +1456,31 @@ with tabs[3]:  # 产品组合
                 """, unsafe_allow_html=True)
 
             # 购买产品种类数分布
-            products_per_order = transaction_binary.sum(axis=1).value_counts().sort_index().reset_index()
+            products_per_order = customer_product_counts.value_counts().sort_index().reset_index()
             products_per_order.columns = ['产品种类数', '客户数']
 
-            fig_products_dist = px.bar(
-                products_per_order,
-                x='产品种类数',
-                y='客户数',
-                title='客户购买产品种类数分布',
-                color='产品种类数',
-                text='客户数'
-            )
-            fig_products_dist.update_traces(
-                textposition='outside'
-            )
-            fig_products_dist.update_layout(
-                xaxis_title="购买产品种类数",
-                yaxis_title="客户数量",
-                xaxis=dict(dtick=1),  # 强制X轴只显示整数
-                coloraxis_showscale=False
-            )
+            def build_products_dist(products_per_order):
+                fig_products_dist = px.bar(
+                    products_per_order,
+                    x='产品种类数',
+                    y='客户数',
+                    title='客户购买产品种类数分布',
+                    color='产品种类数',
+                    text='客户数'
+                )
+                fig_products_dist.update_traces(
+                    textposition='outside'
+                )
+                fig_products_dist.update_layout(
+                    xaxis_title="购买产品种类数",
+                    yaxis_title="客户数量",
+                    xaxis=dict(dtick=1),  # 强制X轴只显示整数
+                    coloraxis_showscale=False
+                )
+                return fig_products_dist
 
-            st.plotly_chart(fig_products_dist, use_container_width=True)
+            fig_products_dist = cached_figure('products_dist', build_products_dist, products_per_order)
+            plotly_chart(fig_products_dist, use_container_width=True)
 
             # 添加购买模式图表解释
             add_chart_explanation("""
@@ -1334,6 +1489,50 @@ with tabs[3]:  # 产品组合
             <b>行动建议：</b> 针对单一产品购买客户，设计阶梯式交叉销售激励方案；对购买2-3种产品的客户，提供组合优惠增强购买意愿；对多种类购买客户，开发更具个性化的产品套餐。
             """)
 
+            # 新品关联规则
+            st.markdown('<div class="sub-header">新品关联规则分析</div>', unsafe_allow_html=True)
+
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                min_support = st.slider("最小支持度 (%)", min_value=0.5, max_value=20.0, value=2.0, step=0.5,
+                                        help="同时购买规则中全部产品的客户占比下限")
+            with col2:
+                min_confidence = st.slider("最小置信度 (%)", min_value=0.0, max_value=100.0, value=10.0, step=5.0,
+                                           help="购买前项的客户中同时购买后项的比例下限")
+            with col3:
+                include_triples = st.checkbox("包含三项组合", value=False, help="挖掘“两个产品 → 第三个产品”的规则")
+
+            rules = cached_analysis(sales_api.association_rules, min_support=min_support / 100,
+                                    min_confidence=min_confidence / 100, max_size=3 if include_triples else 2)
+
+            if not rules.empty:
+                display_rules = pd.DataFrame({
+                    '前项': [' + '.join(product_name_mapping.get(code, code) for code in items) for items in rules['前项']],
+                    '后项': [product_name_mapping.get(code, code) for code in rules['后项']],
+                    '客户数': rules['客户数'],
+                    '支持度 (%)': rules['支持度'] * 100,
+                    '置信度 (%)': rules['置信度'] * 100,
+                    '提升度': rules['提升度'],
+                })
+                st.dataframe(
+                    display_rules,
+                    use_container_width=True,
+                    hide_index=True,
+                    column_config={
+                        '支持度 (%)': st.column_config.NumberColumn(format="%.2f"),
+                        '置信度 (%)': st.column_config.NumberColumn(format="%.2f"),
+                        '提升度': st.column_config.NumberColumn(format="%.2f"),
+                    }
+                )
+
+                add_chart_explanation("""
+                <b>图表解读：</b> 表中每条规则表示“购买前项产品的客户也倾向于购买后项产品”。支持度是同时购买这些产品的客户占比，置信度是购买前项的客户中购买后项的比例，提升度是置信度相对后项整体购买率的倍数。
+                提升度大于1表示两者正相关，且不受热门产品购买率高的影响，比单纯的共现次数更能反映真实的关联关系。点击列名可排序。
+                <b>行动建议：</b> 优先关注提升度高且支持度不过低的规则，将后项产品作为前项购买客户的推荐对象；以新品为后项的规则可用于锁定新品推广的目标客户。
+                """)
+            else:
+                st.info("当前阈值下没有涉及新品的关联规则。可降低最小支持度或最小置信度。")
+
             # 添加产品组合总结
             st.markdown("""
             ### 产品组合分析总结
@@ -1345,19 +1544,23 @@ with tabs[3]:  # 产品组合
             with st.expander("查看产品共现矩阵数据"):
                 # 转换产品代码为简化名称
                 display_co_occurrence = co_occurrence.copy()
-                display_co_occurrence.index = [name_mapping.get(code, code) for code in display_co_occurrence.index]
-                display_co_occurrence.columns = [name_mapping.get(code, code) for code in display_co_occurrence.columns]
+                display_co_occurrence.index = [product_name_mapping.get(code, code)
+                                               for code in display_co_occurrence.index]
+                display_co_occurrence.columns = [product_name_mapping.get(code, code)
+                                                 for code in display_co_occurrence.columns]
                 st.dataframe(display_co_occurrence, use_container_width=True)
         else:
             st.warning("当前筛选条件下的数据不足以进行产品组合分析。请确保有多个客户和产品。")
 
-with tabs[4]:  # 市场渗透率
+def render_penetration():
+    """市场渗透率"""
     st.markdown('<div class="sub-header">🌐 新品市场渗透分析</div>', unsafe_allow_html=True)
 
-    if not filtered_df.empty:
+    if not filtered_cube.empty:
         # 计算总体渗透率
-        total_customers = filtered_df['客户简称'].nunique()
-        new_product_customers = filtered_new_products_df['客户简称'].nunique()
+        kpis = cached_analysis(sales_api.kpis)
+        total_customers = kpis['客户数量']
+        new_product_customers = kpis['购买新品客户数']
         penetration_rate = (new_product_customers / total_customers * 100) if total_customers > 0 else 0
 
         # KPI指标卡
@@ -1393,91 +1596,81 @@ with tabs[4]:  # 市场渗透率
         # 渗透率综合分析
         st.markdown('<div class="sub-header">区域渗透率综合分析</div>', unsafe_allow_html=True)
 
-        if 'selected_regions' in locals() and selected_regions:
-            # 按区域计算渗透率
-            region_customers = filtered_df.groupby('所属区域')['客户简称'].nunique().reset_index()
-            region_customers.columns = ['所属区域', '客户总数']
-
-            new_region_customers = filtered_new_products_df.groupby('所属区域')['客户简称'].nunique().reset_index()
-            new_region_customers.columns = ['所属区域', '购买新品客户数']
-
-            region_penetration = region_customers.merge(new_region_customers, on='所属区域', how='left')
-            region_penetration['购买新品客户数'] = region_penetration['购买新品客户数'].fillna(0)
-            region_penetration['渗透率'] = region_penetration['购买新品客户数'] / region_penetration['客户总数'] * 100
-            region_penetration['渗透率'] = region_penetration['渗透率'].round(2)
-
-            # 计算每个区域的新品销售额
-            region_new_sales = filtered_new_products_df.groupby('所属区域')['销售额'].sum().reset_index()
-            region_new_sales.columns = ['所属区域', '新品销售额']
-
-            # 合并渗透率和销售额数据
-            region_analysis = region_penetration.merge(region_new_sales, on='所属区域', how='left')
-            region_analysis['新品销售额'] = region_analysis['新品销售额'].fillna(0)
+        if selected_regions:
+            # 按区域计算渗透率和新品销售额
+            region_penetration, region_analysis = cached_analysis(sales_api.penetration)
 
             # 创建渗透率柱状图
             cols = st.columns(2)
             with cols[0]:
-                fig_penetration = px.bar(
-                    region_penetration,
-                    x='所属区域',
-                    y='渗透率',
-                    title="各区域新品渗透率",
-                    color='所属区域',
-                    text='渗透率'
-                )
-                fig_penetration.update_traces(
-                    texttemplate='%{text:.2f}%',
-                    textposition='outside'
-                )
-                fig_penetration.update_layout(
-                    xaxis_title="区域",
-                    yaxis_title="渗透率 (%)",
-                    showlegend=False
-                )
-                st.plotly_chart(fig_penetration, use_container_width=True)
+                def build_penetration(region_penetration):
+                    fig_penetration = px.bar(
+                        region_penetration,
+                        x='所属区域',
+                        y='渗透率',
+                        title="各区域新品渗透率",
+                        color='所属区域',
+                        text='渗透率'
+                    )
+                    fig_penetration.update_traces(
+                        texttemplate='%{text:.2f}%',
+                        textposition='outside'
+                    )
+                    fig_penetration.update_layout(
+                        xaxis_title="区域",
+                        yaxis_title="渗透率 (%)",
+                        showlegend=False
+                    )
+                    return fig_penetration
+
+                fig_penetration = cached_figure('penetration', build_penetration, region_penetration)
+                plotly_chart(fig_penetration, use_container_width=True)
 
             with cols[1]:
                 # 渗透率-销售额散点图
-                fig_penetration_sales = px.scatter(
-                    region_analysis,
-                    x='渗透率',
-                    y='新品销售额',
-                    size='客户总数',
-                    color='所属区域',
-                    hover_name='所属区域',
-                    title="渗透率与销售额关系",
-                    labels={
-                        '渗透率': '渗透率 (%)',
-                        '新品销售额': '新品销售额 (元)',
-                        '客户总数': '客户总数'
-                    }
-                )
-                fig_penetration_sales.update_layout(
-                    xaxis_title="渗透率 (%)",
-                    yaxis_title="新品销售额 (元)",
-                    yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元")
-                )
+                def build_penetration_sales(region_analysis):
+                    fig_penetration_sales = px.scatter(
+                        region_analysis,
+                        x='渗透率',
+                        y='新品销售额',
+                        size='客户总数',
+                        color='所属区域',
+                        hover_name='所属区域',
+                        title="渗透率与销售额关系",
+                        labels={
+                            '渗透率': '渗透率 (%)',
+                            '新品销售额': '新品销售额 (元)',
+                            '客户总数': '客户总数'
+                        }
+                    )
+                    fig_penetration_sales.update_layout(
+                        xaxis_title="渗透率 (%)",
+                        yaxis_title="新品销售额 (元)",
+                        yaxis=dict(tickprefix="￥", tickformat=",.2f", ticksuffix=" 元")
+                    )
 
-                # 添加平均值参考线
-                fig_penetration_sales.add_shape(
-                    type="line",
-                    x0=0,
-                    x1=region_analysis['渗透率'].max() * 1.1,
-                    y0=region_analysis['新品销售额'].mean(),
-                    y1=region_analysis['新品销售额'].mean(),
-                    line=dict(color="orange", width=1, dash="dash")
-                )
+                    # 添加平均值参考线
+                    fig_penetration_sales.add_shape(
+                        type="line",
+                        x0=0,
+                        x1=region_analysis['渗透率'].max() * 1.1,
+                        y0=region_analysis['新品销售额'].mean(),
+                        y1=region_analysis['新品销售额'].mean(),
+                        line=dict(color="orange", width=1, dash="dash")
+                    )
 
-                fig_penetration_sales.add_shape(
-                    type="line",
-                    x0=region_analysis['渗透率'].mean(),
-                    x1=region_analysis['渗透率'].mean(),
-                    y0=0,
-                    y1=region_analysis['新品销售额'].max() * 1.1,
-                    line=dict(color="orange", width=1, dash="dash")
-                )
+                    fig_penetration_sales.add_shape(
+                        type="line",
+                        x0=region_analysis['渗透率'].mean(),
+                        x1=region_analysis['渗透率'].mean(),
+                        y0=0,
+                        y1=region_analysis['新品销售额'].max() * 1.1,
+                        line=dict(color="orange", width=1, dash="dash")
+                    )
+                    return fig_penetration_sales
 
-                st.plotly_chart(fig_penetration_sales, use_container_width=True)
+                fig_penetration_sales = cached_figure('penetration_sales', build_penetration_sales, region_analysis)
+                plotly_chart(fig_penetration_sales, use_container_width=True)
 
             # 添加图表解释
             add_chart_explanation("""
@@ -1487,102 +1680,73 @@ with tabs[4]:  # 市场渗透率
             """)
 
             # 渗透率月度趋势分析
-            if '发运月份' in filtered_df.columns and not filtered_df.empty:
+            if '发运月份' in filtered_cube.columns and not filtered_cube.empty:
                 st.markdown('<div class="sub-header">新品渗透率月度趋势</div>', unsafe_allow_html=True)
 
                 try:
-                    # 确保日期类型正确
-                    filtered_df['发运月份'] = pd.to_datetime(filtered_df['发运月份'])
-                    filtered_new_products_df['发运月份'] = pd.to_datetime(filtered_new_products_df['发运月份'])
-
-                    # 计算月度渗透率
-                    monthly_customers = filtered_df.groupby(pd.Grouper(key='发运月份', freq='M'))[
-                        '客户简称'].nunique().reset_index()
-                    monthly_customers.columns = ['月份', '客户总数']
-
-                    monthly_new_customers = filtered_new_products_df.groupby(pd.Grouper(key='发运月份', freq='M'))[
-                        '客户简称'].nunique().reset_index()
-                    monthly_new_customers.columns = ['月份', '购买新品客户数']
-
-                    # 计算月度销售额
-                    monthly_sales = filtered_df.groupby(pd.Grouper(key='发运月份', freq='M'))[
-                        '销售额'].sum().reset_index()
-                    monthly_sales.columns = ['月份', '销售额总计']
-
-                    monthly_new_sales = filtered_new_products_df.groupby(pd.Grouper(key='发运月份', freq='M'))[
-                        '销售额'].sum().reset_index()
-                    monthly_new_sales.columns = ['月份', '新品销售额']
-
-                    # 合并数据
-                    monthly_data = monthly_customers.merge(monthly_new_customers, on='月份', how='left')
-                    monthly_data = monthly_data.merge(monthly_sales, on='月份', how='left')
-                    monthly_data = monthly_data.merge(monthly_new_sales, on='月份', how='left')
-
-                    # 填充缺失值
-                    monthly_data['购买新品客户数'] = monthly_data['购买新品客户数'].fillna(0)
-                    monthly_data['新品销售额'] = monthly_data['新品销售额'].fillna(0)
-
-                    # 计算渗透率和销售占比
-                    monthly_data['渗透率'] = (monthly_data['购买新品客户数'] / monthly_data['客户总数'] * 100).round(2)
-                    monthly_data['销售占比'] = (monthly_data['新品销售额'] / monthly_data['销售额总计'] * 100).round(2)
+                    # 计算月度渗透率和销售占比
+                    monthly_data = cached_analysis(sales_api.monthly_penetration)
 
                     # 创建月度趋势图
-                    fig_monthly_trend = make_subplots(specs=[[{"secondary_y": True}]])
-
-                    # 添加渗透率线
-                    fig_monthly_trend.add_trace(
-                        go.Scatter(
-                            x=monthly_data['月份'],
-                            y=monthly_data['渗透率'],
-                            mode='lines+markers+text',
-                            name='新品渗透率',
-                            line=dict(color='blue', width=3),
-                            marker=dict(size=10),
-                            text=[f"{x:.1f}%" for x in monthly_data['渗透率']],
-                            textposition='top center'
-                        ),
-                        secondary_y=False
-                    )
-
-                    # 添加销售占比线
-                    fig_monthly_trend.add_trace(
-                        go.Scatter(
-                            x=monthly_data['月份'],
-                            y=monthly_data['销售占比'],
-                            mode='lines+markers+text',
-                            name='新品销售占比',
-                            line=dict(color='red', width=3, dash='dot'),
-                            marker=dict(size=10),
-                            text=[f"{x:.1f}%" for x in monthly_data['销售占比']],
-                            textposition='bottom center'
-                        ),
-                        secondary_y=True
-                    )
-
-                    # 更新布局
-                    fig_monthly_trend.update_layout(
-                        title="新品渗透率与销售占比月度趋势",
-                        legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
-                    )
-
-                    # 更新X轴
-                    fig_monthly_trend.update_xaxes(
-                        title_text="月份",
-                        tickformat='%Y-%m'
-                    )
-
-                    # 更新Y轴
-                    fig_monthly_trend.update_yaxes(
-                        title_text="新品渗透率 (%)",
-                        secondary_y=False
-                    )
-
-                    fig_monthly_trend.update_yaxes(
-                        title_text="新品销售占比 (%)",
-                        secondary_y=True
-                    )
-
-                    st.plotly_chart(fig_monthly_trend, use_container_width=True)
+                    def build_monthly_trend(monthly_data):
+                        fig_monthly_trend = make_subplots(specs=[[{"secondary_y": True}]])
+
+                        # 添加渗透率线
+                        fig_monthly_trend.add_trace(
+                            go.Scatter(
+                                x=monthly_data['月份'],
+                                y=monthly_data['渗透率'],
+                                mode='lines+markers+text',
+                                name='新品渗透率',
+                                line=dict(color='blue', width=3),
+                                marker=dict(size=10),
+                                text=[f"{x:.1f}%" for x in monthly_data['渗透率']],
+                                textposition='top center'
+                            ),
+                            secondary_y=False
+                        )
+
+                        # 添加销售占比线
+                        fig_monthly_trend.add_trace(
+                            go.Scatter(
+                                x=monthly_data['月份'],
+                                y=monthly_data['销售占比'],
+                                mode='lines+markers+text',
+                                name='新品销售占比',
+                                line=dict(color='red', width=3, dash='dot'),
+                                marker=dict(size=10),
+                                text=[f"{x:.1f}%" for x in monthly_data['销售占比']],
+                                textposition='bottom center'
+                            ),
+                            secondary_y=True
+                        )
+
+                        # 更新布局
+                        fig_monthly_trend.update_layout(
+                            title="新品渗透率与销售占比月度趋势",
+                            legend=dict(orientation="h", yanchor="bottom", y=1.02, xanchor="right", x=1)
+                        )
+
+                        # 更新X轴
+                        fig_monthly_trend.update_xaxes(
+                            title_text="月份",
+                            tickformat='%Y-%m'
+                        )
+
+                        # 更新Y轴
+                        fig_monthly_trend.update_yaxes(
+                            title_text="新品渗透率 (%)",
+                            secondary_y=False
+                        )
+
+                        fig_monthly_trend.update_yaxes(
+                            title_text="新品销售占比 (%)",
+                            secondary_y=True
+                        )
+                        return fig_monthly_trend
+
+                    fig_monthly_trend = cached_figure('monthly_trend', build_monthly_trend, monthly_data)
+                    plotly_chart(fig_monthly_trend, use_container_width=True)
 
                     # 添加图表解释
                     add_chart_explanation("""
@@ -1605,10 +1769,71 @@ with tabs[4]:  # 市场渗透率
     else:
         st.warning("当前筛选条件下没有数据。请调整筛选条件。")
 
+# 侧边栏 - 导出报告
+# 各结果表取自分析缓存（已浏览过的标签页不再重复计算），生成的文件按（筛选条件, 格式, 客群模型）缓存
+def current_segment_model():
+    """与客户细分标签页当前选择一致的客群模型，选择新品占比三档时为 None"""
+    if st.session_state.get('segment_mode', "聚类分群") != "聚类分群":
+        return None
+    cluster_count = st.session_state.get('cluster_count', '自动')
+    return get_segment_model(None if cluster_count == '自动' else cluster_count)
+
+
+def export_report(export_format, segment_model):
+    """导出全部结果表，返回文件内容"""
+    with profile_stage(f"export.{export_format}", rows_in=len(filtered_cube)):
+        key = ('export_report', analysis_key, export_format, repr(segment_model))
+        tables = sales_api.report_tables(cached_analysis, product_name_mapping, segment_model)
+        return ANALYSIS_CACHE.get_or_compute(key, report_export.export_bytes, tables, export_format)
+
+
+st.sidebar.header("📥 导出报告")
+if not filtered_cube.empty:
+    export_format = st.sidebar.selectbox(
+        "导出格式", report_export.available_formats(), key="export_format",
+        format_func=lambda fmt: report_export.EXPORT_FORMATS[fmt][0]
+    )
+    if st.sidebar.button("生成报告", help="将各标签页的结果表（关键指标、区域销售、客户特征、产品共现、渗透率等）导出为一个文件"):
+        st.session_state.export_request = (analysis_key, export_format)
+    # 下载按钮点击后页面会重新运行，筛选条件和格式未变时继续显示（文件内容取自缓存）
+    if st.session_state.get('export_request') == (analysis_key, export_format):
+        with st.spinner("正在生成报告..."):
+            report_data = export_report(export_format, current_segment_model())
+        _, extension, mime = report_export.EXPORT_FORMATS[export_format]
+        st.sidebar.download_button(
+            f"下载报告（{len(report_data) / 1024 / 1024:.1f} MB）", report_data,
+            file_name=f"销售分析报告{extension}", mime=mime
+        )
+else:
+    st.sidebar.caption("当前筛选条件下没有数据，无法导出。")
+
+# 创建标签页导航，选中状态保存在会话状态中，未选中的标签页不执行任何计算
+TAB_RENDERERS = {
+    "📊 销售概览": render_sales_overview,
+    "🆕 新品分析": render_new_products,
+    "👥 客户细分": render_customer_segments,
+    "🔄 产品组合": render_product_mix,
+    "🌐 市场渗透率": render_penetration
+}
+
+active_tab = st.radio("分析视图", list(TAB_RENDERERS), horizontal=True, key="active_tab",
+                      label_visibility="collapsed")
+with profile_stage(f"render.{active_tab}"):
+    TAB_RENDERERS[active_tab]()
+
 # 添加页脚信息
 st.markdown("""
 <div style="margin-top: 50px; padding-top: 20px; border-top: 1px solid #eee; text-align: center; color: #666; font-size: 0.8rem;">
     <p>销售数据分析仪表盘 | 版本 1.0.0 | 最后更新: 2025年4月</p>
     <p>使用Streamlit和Plotly构建 | 数据更新频率: 每季度</p>
 </div>
-""", unsafe_allow_html=True)
\ No newline at end of file
+""", unsafe_allow_html=True)
+
+# 侧边栏 - 性能分析面板（仅管理员可见）
+last_run = profiler.finish_run()
+if st.session_state.get('is_admin') and last_run is not None:
+    with st.sidebar.expander("⏱️ 性能分析", expanded=False):
+        st.caption(f"本次运行 {last_run['total_seconds'] * 1000:.0f} ms")
+        st.dataframe(stages_frame(last_run), hide_index=True, use_container_width=True)
+        st.caption(f"最近 {len(profiler.runs())} 次运行各阶段耗时（ms）")
+        st.dataframe(history_frame(profiler.runs()), use_container_width=True)
\ No newline at end of file
@@ -0,0 +1,107 @@
+"""
+销售数据的紧凑列类型
+
+文本维度列转为 category，数量转为 int32，单价转为 float32，发运月份转为月度 Period，
+销售额保持 float64 以保证汇总精度。memory_report 对比转换前后每列占用的内存，
+concat_compact 合并分别压缩的多个部分（如并行导入的各文件）。
+"""
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+CATEGORY_COLUMNS = ['客户简称', '所属区域', '申请人', '产品代码', '产品名称', '订单类型',
+                    '简化产品名称', '包装类型']
+QUANTITY_COLUMN = '数量（箱）'
+PRICE_COLUMN = '单价（箱）'
+MONTH_COLUMN = '发运月份'
+
+_INT32_MIN, _INT32_MAX = np.iinfo(np.int32).min, np.iinfo(np.int32).max
+
+
+def _compact_quantity(series):
+    """无空值且在int32范围内的整数数量转为int32，否则转为float32"""
+    values = pd.to_numeric(series, errors='coerce')
+    if values.notna().all() and (values % 1 == 0).all() and \
+            (values.empty or (values.min() >= _INT32_MIN and values.max() <= _INT32_MAX)):
+        return values.astype(np.int32)
+    return values.astype(np.float32)
+
+
+def _compact_month(series):
+    """将发运月份转为月度Period，无法解析时保持原样"""
+    if isinstance(series.dtype, pd.PeriodDtype):
+        return series
+    try:
+        return pd.to_datetime(series).dt.to_period('M')
+    except Exception:
+        return series
+
+
+def compact_frame(df):
+    """返回使用紧凑列类型的新DataFrame，不修改原数据"""
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if col in CATEGORY_COLUMNS:
+            series = series.astype('category')
+        elif col == QUANTITY_COLUMN:
+            series = _compact_quantity(series)
+        elif col == PRICE_COLUMN:
+            series = pd.to_numeric(series, errors='coerce').astype(np.float32)
+        elif col == MONTH_COLUMN:
+            series = _compact_month(series)
+        columns[col] = series
+    return pd.DataFrame(columns, index=df.index)
+
+
+def concat_compact(frames):
+    """
+    合并多个紧凑DataFrame：分类列先统一类别再合并，避免退化为object列；
+    各部分数量列类型不一致（int32/float32）时合并后重新压缩
+    """
+    frames = [frame for frame in frames if len(frame.columns)]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+    frames = [frame.copy(deep=False) for frame in frames]
+    for col in CATEGORY_COLUMNS:
+        if all(col in frame.columns and isinstance(frame[col].dtype, pd.CategoricalDtype) for frame in frames):
+            categories = union_categoricals([frame[col] for frame in frames]).categories
+            for frame in frames:
+                frame[col] = frame[col].cat.set_categories(categories)
+    return compact_frame(pd.concat(frames, ignore_index=True))
+
+
+def _expanded(series):
+    """紧凑类型对应的原始类型（字符串对象、int64、float64、datetime64）"""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.astype(object)
+    if isinstance(series.dtype, pd.PeriodDtype):
+        return series.dt.to_timestamp()
+    if pd.api.types.is_integer_dtype(series.dtype):
+        return series.astype(np.int64)
+    if pd.api.types.is_float_dtype(series.dtype):
+        return series.astype(np.float64)
+    return series
+
+
+def memory_report(df):
+    """每列转换前后的类型和内存占用（字节）"""
+    rows = []
+    for col in df.columns:
+        series = df[col]
+        original = _expanded(series)
+        rows.append({
+            '列名': col,
+            '原始类型': str(original.dtype),
+            '原始字节': int(original.memory_usage(deep=True, index=False)),
+            '紧凑类型': str(series.dtype),
+            '紧凑字节': int(series.memory_usage(deep=True, index=False)),
+        })
+    report = pd.DataFrame(rows)
+    total = {
+        '列名': '合计', '原始类型': '', '原始字节': report['原始字节'].sum(),
+        '紧凑类型': '', '紧凑字节': report['紧凑字节'].sum()
+    }
+    return pd.concat([report, pd.DataFrame([total])], ignore_index=True)
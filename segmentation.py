@@ -0,0 +1,269 @@
+"""
+客户聚类分群
+
+按客户汇总聚合立方体得到特征矩阵（销售额、购买产品种类数、采购数量、平均单价、新品占比、
+距最近一次购买的月数），全部由 bincount 等向量化运算一次算出。特征经对数变换和标准化后
+用 NumPy 实现的 mini-batch k-means 聚类：每轮只抽取一小批客户按累计分配数更新质心，
+10万以上客户也能在数秒内完成。未指定 k 时在候选范围内按抽样轮廓系数选择。
+
+拟合得到的 SegmentModel（标准化参数、k、质心和各客群画像）与具体数据解耦，
+可按数据集版本缓存，再为筛选后的客户分配最近的客群。最近购买间隔以拟合时数据的最后月份为基准，
+模型记录该月份，为筛选后（如只含较早月份）的客户计算特征时沿用同一基准，与训练时的尺度一致。
+"""
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+from cube import PRICE_COUNT, PRICE_SUM
+from time_index import NAT_ORDINAL, month_ordinals
+
+CUSTOMER_COLUMN = '客户简称'
+FEATURE_COLUMNS = ['销售额', '产品种类数', '数量（箱）', '平均单价', '新品占比', '最近购买间隔（月）']
+# 右偏分布的特征先取对数再标准化
+LOG_FEATURES = ['销售额', '产品种类数', '数量（箱）']
+
+# 自动选择 k 的候选范围
+K_RANGE = range(2, 7)
+BATCH_SIZE = 1024
+MAX_ITERATIONS = 200
+# 计算轮廓系数时抽样的客户数
+SILHOUETTE_SAMPLE = 2000
+# 客户数少于该值时不做聚类，由调用方回退到新品占比三档分类
+MIN_CUSTOMERS = 20
+
+# 客群描述中使用的特征简称及标准化质心的显著性阈值
+_FEATURE_NAMES = {
+    '销售额': '销售额', '产品种类数': '品类', '数量（箱）': '采购量',
+    '平均单价': '单价', '新品占比': '新品占比', '最近购买间隔（月）': '购买间隔',
+}
+_NOTABLE_Z = 0.5
+
+
+# ==== 特征矩阵 ====
+def latest_month(cube):
+    """立方体中最后一个发运月份的月度序号，没有有效月份时为 None"""
+    ordinals = month_ordinals(cube['发运月份'])
+    ordinals = ordinals[ordinals != NAT_ORDINAL]
+    return int(ordinals.max()) if len(ordinals) else None
+
+
+def customer_feature_matrix(cube, is_new, reference_month=None):
+    """
+    按客户汇总立方体得到特征矩阵，索引为客户简称；is_new 为立方体各行是否为新品。
+    最近购买间隔为距 reference_month（月度序号，默认为立方体中的最后月份）的月数
+    """
+    codes, customers = pd.factorize(cube[CUSTOMER_COLUMN], sort=True)
+    count = len(customers)
+    valid = codes >= 0
+    codes = codes[valid]
+
+    def total(column, weights=None):
+        values = cube[column].to_numpy(dtype='float64')[valid]
+        return np.bincount(codes, weights=values if weights is None else np.where(weights, values, 0.0),
+                           minlength=count)
+
+    sales = total('销售额')
+    new_sales = total('销售额', np.asarray(is_new, dtype=bool)[valid])
+    price_sum, price_count = total(PRICE_SUM), total(PRICE_COUNT)
+
+    # (客户, 产品) 组合去重后按客户计数即为购买产品种类数
+    product_codes, products = pd.factorize(cube['产品代码'])
+    product_codes = product_codes[valid]
+    has_product = product_codes >= 0
+    pairs = np.unique(codes[has_product].astype(np.int64) * max(len(products), 1) + product_codes[has_product])
+    distinct_products = np.bincount(pairs // max(len(products), 1), minlength=count)
+
+    # 距基准月份的月数
+    ordinals = month_ordinals(cube['发运月份'])[valid]
+    last = np.full(count, NAT_ORDINAL, dtype=np.int64)
+    np.maximum.at(last, codes, ordinals)
+    known = last != NAT_ORDINAL
+    recency = np.full(count, np.nan)
+    if known.any():
+        reference = last[known].max() if reference_month is None else reference_month
+        recency[known] = reference - last[known]
+
+    return pd.DataFrame({
+        '销售额': sales,
+        '产品种类数': distinct_products,
+        '数量（箱）': total('数量（箱）'),
+        '平均单价': np.divide(price_sum, price_count, out=np.full(count, np.nan), where=price_count > 0),
+        '新品占比': np.divide(new_sales, sales, out=np.zeros(count), where=sales != 0) * 100,
+        '最近购买间隔（月）': recency,
+    }, index=pd.Index(np.asarray(customers), name=CUSTOMER_COLUMN))
+
+
+# ==== mini-batch k-means ====
+def _nearest(X, centers):
+    """各点最近质心的编号及平方距离"""
+    distances = (X ** 2).sum(axis=1)[:, None] - 2 * X @ centers.T + (centers ** 2).sum(axis=1)[None, :]
+    labels = distances.argmin(axis=1)
+    return labels, np.maximum(distances[np.arange(len(X)), labels], 0)
+
+
+def _init_centers(X, k, rng):
+    """k-means++ 初始化"""
+    centers = [X[rng.integers(len(X))]]
+    closest = ((X - centers[0]) ** 2).sum(axis=1)
+    for _ in range(1, k):
+        total = closest.sum()
+        index = rng.choice(len(X), p=closest / total) if total > 0 else rng.integers(len(X))
+        centers.append(X[index])
+        closest = np.minimum(closest, ((X - X[index]) ** 2).sum(axis=1))
+    return np.array(centers)
+
+
+def minibatch_kmeans(X, k, batch_size=BATCH_SIZE, max_iterations=MAX_ITERATIONS, seed=0, tol=1e-4):
+    """
+    mini-batch k-means（Sculley 2010）：每轮随机抽取 batch_size 个点，各质心以
+    1/累计分配数 为学习率向批内分配给它的点移动；质心最大位移小于 tol 时提前结束。
+    返回 (质心, 各点所属客群编号, 各点到质心的平方距离之和)
+    """
+    rng = np.random.default_rng(seed)
+    sample = X if len(X) <= 10 * batch_size else X[rng.choice(len(X), 10 * batch_size, replace=False)]
+    centers = _init_centers(sample, k, rng)
+    counts = np.zeros(k)
+
+    for _ in range(max_iterations):
+        batch = X if len(X) <= batch_size else X[rng.integers(0, len(X), batch_size)]
+        labels, _ = _nearest(batch, centers)
+        batch_counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centers)
+        np.add.at(sums, labels, batch)
+
+        counts += batch_counts
+        moved = batch_counts > 0
+        rate = (batch_counts[moved] / counts[moved])[:, None]
+        shift = rate * (sums[moved] / batch_counts[moved][:, None] - centers[moved])
+        centers[moved] += shift
+        if len(shift) == 0 or np.abs(shift).max() < tol:
+            break
+
+    labels, distances = _nearest(X, centers)
+    return centers, labels, float(distances.sum())
+
+
+def silhouette_score(X, labels, sample_size=SILHOUETTE_SAMPLE, seed=0):
+    """抽样计算的平均轮廓系数（-1~1，越大表示客群之间区分越清晰）"""
+    if len(X) > sample_size:
+        index = np.random.default_rng(seed).choice(len(X), sample_size, replace=False)
+        X, labels = X[index], labels[index]
+    clusters, labels = np.unique(labels, return_inverse=True)
+    if len(clusters) < 2:
+        return 0.0
+
+    squared = (X ** 2).sum(axis=1)
+    distances = np.sqrt(np.maximum(squared[:, None] - 2 * X @ X.T + squared[None, :], 0))
+    members = np.eye(len(clusters))[labels]
+    sizes = members.sum(axis=0)
+    # 每个点到各客群的平均距离，本客群不含自身
+    sums = distances @ members
+    own = np.arange(len(X)), labels
+    own_size = sizes[labels] - 1
+    a = np.divide(sums[own], own_size, out=np.zeros(len(X)), where=own_size > 0)
+    mean_to = sums / sizes
+    mean_to[own] = np.inf
+    b = mean_to.min(axis=1)
+    spread = np.maximum(a, b)
+    scores = np.divide(b - a, spread, out=np.zeros(len(X)), where=(own_size > 0) & (spread > 0))
+    return float(scores.mean())
+
+
+# ==== 客群模型 ====
+class SegmentModel:
+    """
+    客户聚类模型：缺失值填充与标准化参数、质心（标准化空间）、客群名称及画像，
+    reference_month 为计算最近购买间隔的基准月份（月度序号）
+    """
+
+    def __init__(self, medians, center, scale, centroids, names, profile, silhouette, reference_month=None):
+        self.medians = medians
+        self.center = center
+        self.scale = scale
+        self.centroids = centroids
+        self.names = names
+        self.profile = profile
+        self.silhouette = silhouette
+        self.reference_month = reference_month
+        digest = hashlib.sha1(np.concatenate([medians, center, scale, centroids.ravel()]).tobytes())
+        digest.update(repr(reference_month).encode('utf-8'))
+        self.version = digest.hexdigest()[:16]
+
+    @property
+    def k(self):
+        return len(self.centroids)
+
+    def __repr__(self):
+        # 用作结果缓存键的一部分
+        return f"SegmentModel(k={self.k}, version={self.version})"
+
+    def features(self, cube, is_new):
+        """按拟合时的基准月份计算立方体中各客户的特征矩阵"""
+        return customer_feature_matrix(cube, is_new, self.reference_month)
+
+    def transform(self, features):
+        """特征矩阵 → 标准化空间（缺失值按拟合时的中位数填充）"""
+        X = _log_features(features)
+        return (np.where(np.isnan(X), self.medians, X) - self.center) / self.scale
+
+    def assign(self, features):
+        """为客户分配最近的客群，返回以客户为索引的客群名称（分类类型，类别顺序与画像一致）"""
+        labels = _nearest(self.transform(features), self.centroids)[0] if len(features) else np.array([], dtype=int)
+        return pd.Series(pd.Categorical.from_codes(labels, categories=self.names), index=features.index)
+
+
+def _log_features(features):
+    """按 FEATURE_COLUMNS 取出特征矩阵，右偏特征取符号对数"""
+    X = features[FEATURE_COLUMNS].to_numpy(dtype='float64', copy=True)
+    for i, column in enumerate(FEATURE_COLUMNS):
+        if column in LOG_FEATURES:
+            X[:, i] = np.sign(X[:, i]) * np.log1p(np.abs(X[:, i]))
+    return X
+
+
+def _describe(z):
+    """按标准化质心中最显著的两个特征描述客群，如“高销售额·低新品占比”"""
+    order = np.argsort(-np.abs(z))[:2]
+    parts = [f"{'高' if z[i] > 0 else '低'}{_FEATURE_NAMES[FEATURE_COLUMNS[i]]}" for i in order
+             if abs(z[i]) >= _NOTABLE_Z]
+    return '·'.join(parts) or '均衡'
+
+
+def fit_segments(features, k=None, k_range=K_RANGE, seed=0, reference_month=None):
+    """
+    在客户特征矩阵上拟合聚类模型，k 为 None 时在 k_range 中按轮廓系数选择；
+    reference_month 为特征矩阵计算最近购买间隔所用的基准月份，记录在模型中。
+    客户数少于 MIN_CUSTOMERS 时返回 None
+    """
+    if len(features) < MIN_CUSTOMERS:
+        return None
+
+    X = _log_features(features)
+    # 缺失值（无单价或无月份）以中位数填充，再标准化（常数列的尺度记为1）
+    medians = np.nanmedian(np.where(np.isnan(X).all(axis=0), 0.0, X), axis=0)
+    X = np.where(np.isnan(X), medians, X)
+    center, scale = X.mean(axis=0), X.std(axis=0)
+    scale[scale == 0] = 1.0
+    X = (X - center) / scale
+
+    candidates = [k] if k is not None else [c for c in k_range if c < len(X)]
+    best = None
+    for candidate in candidates:
+        centroids, labels, _ = minibatch_kmeans(X, candidate, seed=seed)
+        score = silhouette_score(X, labels, seed=seed)
+        if best is None or score > best[0]:
+            best = (score, centroids, labels)
+    score, centroids, labels = best
+
+    # 按平均新品占比从低到高为客群编号，画像为各客群的特征均值
+    profile = features[FEATURE_COLUMNS].groupby(labels).mean()
+    profile = profile.reindex(range(len(centroids)))
+    order = np.argsort(profile['新品占比'].fillna(-np.inf).to_numpy(), kind='stable')
+    centroids = centroids[order]
+    names = [f"客群{i + 1}（{_describe(z)}）" for i, z in enumerate(centroids)]
+    profile = profile.iloc[order].set_axis(names)
+    profile.insert(0, '客户数', np.bincount(labels, minlength=len(order))[order])
+    profile.index.name = '客群'
+
+    return SegmentModel(medians, center, scale, centroids, names, profile.reset_index(), score, reference_month)
@@ -0,0 +1,77 @@
+"""
+发运月份时间索引
+
+数据按发运月份稳定排序后，记录每个月份的起始行号。按日期范围筛选时只需对月份数组
+二分查找得到 [起始行, 结束行) 并切片，不必对整列计算布尔掩码。
+"""
+import numpy as np
+import pandas as pd
+
+MONTH_COLUMN = '发运月份'
+
+# 月度序号中表示空值的取值（与 pandas 的 NaT 一致，排序时位于最前）
+NAT_ORDINAL = np.iinfo(np.int64).min
+
+
+def month_ordinals(series):
+    """将发运月份转为月度序号（自1970-01起的月数），空值或无法解析的记为 NAT_ORDINAL"""
+    if not isinstance(series.dtype, pd.PeriodDtype):
+        series = pd.to_datetime(series, errors='coerce').dt.to_period('M')
+    elif series.dtype != pd.PeriodDtype('M'):
+        series = series.dt.asfreq('M')
+    return series.array.asi8.copy()
+
+
+def _is_sorted(ordinals):
+    return bool((ordinals[1:] >= ordinals[:-1]).all())
+
+
+def sort_by_month(df, column=MONTH_COLUMN):
+    """按发运月份稳定排序（空月份在前），已有序时原样返回"""
+    if column not in df.columns or df.empty:
+        return df
+    ordinals = month_ordinals(df[column])
+    if _is_sorted(ordinals):
+        return df
+    return df.iloc[np.argsort(ordinals, kind='stable')].reset_index(drop=True)
+
+
+class TimeIndex:
+    """已按发运月份排序的数据的月份边界"""
+
+    def __init__(self, df, column=MONTH_COLUMN):
+        self.size = len(df)
+        ordinals = month_ordinals(df[column]) if column in df.columns else np.array([], dtype=np.int64)
+        if not _is_sorted(ordinals):
+            raise ValueError("数据未按发运月份排序，请先调用 sort_by_month")
+
+        valid = ordinals[ordinals != NAT_ORDINAL]
+        # 各月份序号及其在数据中的起始行号，offsets 末尾追加结束行号
+        self.ordinals = np.unique(valid)
+        self.offsets = np.append(np.searchsorted(ordinals, self.ordinals, side='left'), self.size)
+
+    @property
+    def months(self):
+        """数据中出现的全部月份（升序）"""
+        return pd.PeriodIndex.from_ordinals(self.ordinals, freq='M')
+
+    def labels(self):
+        """月份标签 YYYY-MM，用于日期范围选择控件"""
+        return [str(month) for month in self.months]
+
+    def bounds(self, start=None, end=None):
+        """
+        月份范围 [start, end]（含两端，可为 'YYYY-MM' 或 Period）对应的行号区间 [起始行, 结束行)；
+        两端均为 None 时返回全部行（包括发运月份为空的行）
+        """
+        if start is None and end is None:
+            return 0, self.size
+        lo = 0 if start is None else np.searchsorted(self.ordinals, pd.Period(start, freq='M').ordinal, side='left')
+        hi = len(self.ordinals) if end is None else \
+            np.searchsorted(self.ordinals, pd.Period(end, freq='M').ordinal, side='right')
+        if lo >= hi:
+            return 0, 0
+        return int(self.offsets[lo]), int(self.offsets[hi])
+
+    def is_full(self, bounds):
+        return tuple(bounds) == (0, self.size)